@@ -17,9 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from tasks.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
+    # Prometheus metrics
+    path('metrics', MetricsView.as_view(), name='metrics'),
+
     # Include the tasks app urls
     path('api/', include('tasks.urls'), name='tasks'),
 
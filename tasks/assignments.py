@@ -0,0 +1,113 @@
+# Set-based task assignment.
+#
+# Assigning or unassigning any number of (task, user) pairs costs a fixed
+# handful of queries: one each to load the tasks, the users and the existing
+# assignment rows, then one bulk INSERT or DELETE on the assignment table.
+# The through rows are written directly, so m2m_changed is sent here by hand,
+# once per task, with the same arguments as task.assigned_users.add/remove.
+# The updated_at of every changed task is moved in a single UPDATE as well, the
+# change log gets its entries in a single INSERT, and the user task summaries
+# are moved a batch of users per UPDATE.
+from collections import defaultdict
+from itertools import product
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from . import changes, counters, summaries
+from .bulk import UPDATE_BATCH_SIZE
+from .exports import iter_chunks
+from .models import Task, User
+
+
+Assignment = Task.assigned_users.through
+
+
+def expand_pairs(task_ids=None, user_ids=None, pairs=None):
+    """Return the requested (task_id, user_id) pairs, explicit or as a cartesian product."""
+    if pairs is not None:
+        return {(pair['task_id'], pair['user_id']) for pair in pairs}
+    return set(product(task_ids, user_ids))
+
+
+def resolve(pairs):
+    """Load the tasks and users referenced by pairs, and report the missing ids."""
+    task_ids = {task_id for task_id, _ in pairs}
+    user_ids = {user_id for _, user_id in pairs}
+    tasks = Task.objects.in_bulk(task_ids)
+    found_user_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    summary = {
+        'missing_task_ids': sorted(task_ids - tasks.keys()),
+        'missing_user_ids': sorted(user_ids - found_user_ids),
+    }
+    valid = {(task_id, user_id) for task_id, user_id in pairs if task_id in tasks and user_id in found_user_ids}
+    return tasks, valid, summary
+
+
+def existing_pairs(pairs):
+    if not pairs:
+        return {}
+    task_ids = {task_id for task_id, _ in pairs}
+    user_ids = {user_id for _, user_id in pairs}
+    rows = Assignment.objects.filter(task_id__in=task_ids, user_id__in=user_ids)
+    return {(task_id, user_id): row_id for row_id, task_id, user_id in rows.values_list('id', 'task_id', 'user_id')
+            if (task_id, user_id) in pairs}
+
+
+def group_by_task(pairs):
+    users_by_task = defaultdict(set)
+    for task_id, user_id in pairs:
+        users_by_task[task_id].add(user_id)
+    return users_by_task
+
+
+def send_m2m_changed(action, tasks, users_by_task):
+    for task_id, user_ids in users_by_task.items():
+        m2m_changed.send(
+            sender=Assignment, instance=tasks[task_id], action=action, reverse=False,
+            model=User, pk_set=set(user_ids), using=Assignment.objects.db, tasks_touched=True
+        )
+
+
+def touch(tasks, task_ids):
+    if not task_ids:
+        return
+    now = timezone.now()
+    for chunk in iter_chunks(sorted(task_ids), UPDATE_BATCH_SIZE):
+        Task.objects.filter(id__in=chunk).update(updated_at=now)
+    for task_id in task_ids:
+        tasks[task_id].updated_at = now
+    changes.record(task_ids, 'assigned')
+
+
+@transaction.atomic
+def assign(pairs):
+    tasks, valid, summary = resolve(pairs)
+    new_pairs = valid - existing_pairs(valid).keys()
+    users_by_task = group_by_task(new_pairs)
+    send_m2m_changed('pre_add', tasks, users_by_task)
+    Assignment.objects.bulk_create(
+        [Assignment(task_id=task_id, user_id=user_id) for task_id, user_id in sorted(new_pairs)],
+        ignore_conflicts=True
+    )
+    touch(tasks, users_by_task.keys())
+    summaries.record_assigned(new_pairs, {task_id: counters.snapshot(tasks[task_id]) for task_id in users_by_task})
+    send_m2m_changed('post_add', tasks, users_by_task)
+    summary.update(assigned=len(new_pairs), already_assigned=len(valid) - len(new_pairs))
+    return summary
+
+
+@transaction.atomic
+def unassign(pairs):
+    tasks, valid, summary = resolve(pairs)
+    rows = existing_pairs(valid)
+    users_by_task = group_by_task(rows)
+    send_m2m_changed('pre_remove', tasks, users_by_task)
+    for chunk in iter_chunks(rows.values(), UPDATE_BATCH_SIZE):
+        Assignment.objects.filter(id__in=chunk).delete()
+    touch(tasks, users_by_task.keys())
+    summaries.record_unassigned(rows, {task_id: counters.snapshot(tasks[task_id]) for task_id in users_by_task})
+    send_m2m_changed('post_remove', tasks, users_by_task)
+    summary.update(unassigned=len(rows), not_assigned=len(valid) - len(rows))
+    return summary
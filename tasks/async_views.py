@@ -0,0 +1,246 @@
+# Async versions of the read APIs, for serving under ASGI.
+#
+# These are plain Django class-based views with async handlers, so under an
+# ASGI server a request never occupies a worker thread while it waits on the
+# database: queries go through the async ORM (aget, async iteration). Results
+# are serialized with the same serializers and rendered with the same renderer
+# as the DRF views in tasks/views.py, so both return identical bodies.
+#
+# The async views skip the response cache and conditional GET of their sync
+# counterparts.
+#
+# The push channel for task events (see tasks/events.py) is async only: a
+# server-sent events stream, and a long poll for clients that cannot keep a
+# stream open. Both wait on the event loop rather than on a thread, so they
+# need an ASGI server to scale; under WSGI a long poll holds a worker thread
+# while it waits, and a stream is buffered until it ends.
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+
+from . import changes, counters, events
+from .models import Task, User
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .search import filter_tasks
+from .serializers import TaskDetailSerializer, UserDetailSerializer, UserSerializer
+
+
+# Base class for async read APIs.
+class AsyncAPIView(View):
+    http_method_names = ['get', 'head', 'options']
+    renderer_class = FastJSONRenderer
+
+    def render(self, data, status=status.HTTP_200_OK):
+        content = self.renderer_class().render(data)
+        return HttpResponse(content, status=status, content_type=self.renderer_class.media_type)
+
+    def get_field_options(self, request, serializer_class):
+        try:
+            return serializer_class.get_field_options(request.GET), None
+        except ValidationError as exc:
+            return None, self.render({'message': exc.detail[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Base class for async list APIs, which return one keyset page per request.
+class AsyncPaginatedAPIView(AsyncAPIView):
+    pagination_class = KeysetPagination
+
+    async def paginated_response(self, request, queryset, serializer_class):
+        options, error_response = self.get_field_options(request, serializer_class)
+        if error_response:
+            return error_response
+        paginator = self.pagination_class()
+        ordering = [name for name, _ in paginator.get_ordering(queryset)]
+        queryset = serializer_class.setup_eager_loading(queryset, extra=ordering, **options)
+        try:
+            page = await paginator.apaginate_queryset(queryset, Request(request), view=self)
+        except NotFound as exc:
+            return self.render({'detail': exc.detail}, status=exc.status_code)
+        serializer = serializer_class(page, many=True, **options)
+        return self.render(paginator.get_paginated_data(serializer.data))
+
+
+# API to get all tasks.
+class AsyncTaskListView(AsyncPaginatedAPIView):
+    async def get(self, request):
+        return await self.paginated_response(request, Task.objects.all(), TaskDetailSerializer)
+
+
+# API to get all users.
+class AsyncUserListView(AsyncPaginatedAPIView):
+    async def get(self, request):
+        return await self.paginated_response(request, User.objects.all(), UserSerializer)
+
+
+# API to filter tasks by status, task type and search term.
+class AsyncTaskFilterView(AsyncPaginatedAPIView):
+    async def get(self, request):
+        tasks = filter_tasks(Task.objects.all(), request.GET)
+        return await self.paginated_response(request, tasks, TaskDetailSerializer)
+
+
+# API to get a task by ID.
+class AsyncTaskDetailView(AsyncAPIView):
+    async def get(self, request, task_id):
+        options, error_response = self.get_field_options(request, TaskDetailSerializer)
+        if error_response:
+            return error_response
+        try:
+            task = await TaskDetailSerializer.setup_eager_loading(Task.objects, **options).aget(id=task_id)
+        except Task.DoesNotExist:
+            return self.render({'message': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+        return self.render(TaskDetailSerializer(task, **options).data)
+
+
+# API to get a user by ID.
+class AsyncUserDetailView(AsyncAPIView):
+    async def get(self, request, user_id):
+        options, error_response = self.get_field_options(request, UserDetailSerializer)
+        if error_response:
+            return error_response
+        try:
+            user = await UserDetailSerializer.setup_eager_loading(User.objects, **options).aget(id=user_id)
+        except User.DoesNotExist:
+            return self.render({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return self.render(UserDetailSerializer(user, **options).data)
+
+
+# API to get task statistics.
+class AsyncTaskStatsView(AsyncAPIView):
+    async def get(self, request):
+        return self.render(await counters.aget_stats())
+
+
+# Milliseconds a disconnected EventSource waits before reconnecting
+EVENTS_RETRY = 3000
+
+
+def sse_event(event):
+    """Format an event as a server-sent event."""
+    data = FastJSONRenderer().render(event).decode()
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+
+# Base class for the push channel, which reads the event filter, since and timeout of a request.
+class AsyncEventsView(AsyncAPIView):
+    http_method_names = ['get', 'options']
+    # Name of the setting with the longest timeout, read per request
+    max_timeout_setting = None
+
+    def get_params(self, request, since):
+        max_timeout = getattr(settings, self.max_timeout_setting)
+        try:
+            event_filter = events.EventFilter.from_query(request.GET)
+            since = int(since) if since is not None else None
+            timeout = float(request.GET.get('timeout', max_timeout))
+        except ValueError:
+            return None, self.render(
+                {'message': 'Invalid task_id, user_id, status, since or timeout'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if (since is not None and since < 0) or not 0 <= timeout <= max_timeout:
+            return None, self.render(
+                {'message': f'since must not be negative, and timeout between 0 and {max_timeout}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return (event_filter, since, timeout), None
+
+
+# API to wait for task events after a token (long poll).
+class AsyncTaskEventsPollView(AsyncEventsView):
+    max_timeout_setting = 'EVENTS_LONG_POLL_TIMEOUT'
+
+    async def get(self, request):
+        params, error_response = self.get_params(request, request.GET.get('since'))
+        if error_response:
+            return error_response
+        event_filter, since, timeout = params
+        if since is None:
+            since = await sync_to_async(changes.head)()
+        # Subscribed before the replay, so that nothing committed in between is missed
+        subscription = events.get_hub().subscribe(event_filter, since)
+        try:
+            try:
+                found, next_id, has_more = await sync_to_async(events.replay)(event_filter, since)
+            except changes.TokenExpired:
+                return self.render(
+                    {'message': 'Token expired, resync and start from tasks/changes/'}, status=status.HTTP_410_GONE
+                )
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while not found and not has_more and (remaining := deadline - loop.time()) > 0:
+                found = [event for event in await subscription.get(remaining) if event['id'] > next_id]
+                if found:
+                    next_id = found[-1]['id']
+            return self.render({'events': found, 'next': next_id, 'has_more': has_more})
+        finally:
+            subscription.close()
+
+
+# API to stream task events (server-sent events).
+class AsyncTaskEventsStreamView(AsyncEventsView):
+    max_timeout_setting = 'EVENTS_STREAM_TIMEOUT'
+
+    async def get(self, request):
+        # EventSource reconnects with the id of the last event it got
+        params, error_response = self.get_params(
+            request, request.headers.get('Last-Event-ID', request.GET.get('since'))
+        )
+        if error_response:
+            return error_response
+        event_filter, since, timeout = params
+        if since is None:
+            since = await sync_to_async(changes.head)()
+        subscription = events.get_hub().subscribe(event_filter, since)
+        response = StreamingHttpResponse(
+            self.stream(subscription, event_filter, since, timeout), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Unbuffered through nginx
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, subscription, event_filter, last_id, timeout):
+        try:
+            yield f'retry: {EVENTS_RETRY}\n\n'
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            catch_up = True
+            while True:
+                if catch_up:
+                    # From the change log: at the start, and when the subscription fell behind
+                    subscription.reset()
+                    catch_up = False
+                    has_more = True
+                    while has_more:
+                        try:
+                            found, last_id, has_more = await sync_to_async(events.replay)(event_filter, last_id)
+                        except changes.TokenExpired:
+                            # The id moves the client's Last-Event-ID to the head, to start over from there
+                            head = await sync_to_async(changes.head)()
+                            yield f'id: {head}\nevent: reset\ndata: {{"message": "Token expired, resync"}}\n\n'
+                            return
+                        for event in found:
+                            yield sse_event(event)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                live = await subscription.get(min(remaining, settings.EVENTS_HEARTBEAT))
+                if subscription.overflowed:
+                    catch_up = True
+                    continue
+                found = [event for event in live if event['id'] > last_id]
+                for event in found:
+                    yield sse_event(event)
+                if found:
+                    last_id = found[-1]['id']
+                elif not live and deadline - loop.time() > 0:
+                    yield ': keepalive\n\n'
+        finally:
+            subscription.close()
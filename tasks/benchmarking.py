@@ -0,0 +1,221 @@
+# Benchmarking helpers for the benchmark_* management commands.
+#
+# HTTP requests are fed straight into the project's WSGI or ASGI application, with
+# no network server in between, so results compare the two request paths of
+# Django itself (and the views behind them), not web servers.
+#
+# WSGI runs the application on a fixed pool of worker threads, like a threaded
+# WSGI server; clients beyond the pool size wait in its queue. ASGI runs every
+# request as a task on a single event loop. In both cases ``concurrency``
+# requests are kept in flight, and latency is measured from the moment a
+# client sends its request until the response is complete.
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+HOST = 'localhost'
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of values."""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(index)]
+
+
+def best_time(func, repeat=3):
+    """Return the fastest of repeat runs of func(), in seconds, and its last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Summarize latencies (seconds) of requests completed in elapsed seconds, times in ms."""
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'mean_ms': round(sum(ms) / len(ms), 2) if ms else None,
+        'p50_ms': round(percentile(ms, 50), 2) if ms else None,
+        'p95_ms': round(percentile(ms, 95), 2) if ms else None,
+        'p99_ms': round(percentile(ms, 99), 2) if ms else None,
+    }
+
+
+def wsgi_environ(url, method='GET', body=b'', headers=None):
+    parts = urlsplit(url)
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+
+def request_wsgi(application, url, method='GET', data=None, headers=None):
+    """
+    Run one request, with data as its JSON body and headers as request
+    headers, through a WSGI application; return the status code and the
+    response headers.
+    """
+    result = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        result['status'] = int(status.split()[0])
+        result['headers'] = dict(response_headers)
+
+    content = json.dumps(data).encode() if data is not None else b''
+    body = application(wsgi_environ(url, method, content, headers), start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return result['status'], result['headers']
+
+
+def call_wsgi(application, url, method='GET', data=None, headers=None):
+    """Run one request through a WSGI application and return the status code, see request_wsgi()."""
+    return request_wsgi(application, url, method, data, headers)[0]
+
+
+def run_serial(application, urls):
+    """Send every url in urls to a WSGI application one after the other, from this thread."""
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for url in urls:
+        sent = time.perf_counter()
+        if call_wsgi(application, *((url,) if isinstance(url, str) else url)) < 400:
+            latencies.append(time.perf_counter() - sent)
+        else:
+            errors += 1
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def run_wsgi(application, urls, concurrency, threads):
+    """
+    Send every url in urls to a WSGI application from ``concurrency`` clients,
+    served by ``threads`` worker threads. Besides GET urls, urls can hold
+    ``(url, method, data[, headers])`` requests.
+    """
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    in_flight = threading.Semaphore(concurrency)
+
+    def request(url, sent):
+        nonlocal errors
+        try:
+            ok = call_wsgi(application, *((url,) if isinstance(url, str) else url)) < 400
+        except Exception:
+            ok = False
+        with lock:
+            if ok:
+                latencies.append(time.perf_counter() - sent)
+            else:
+                errors += 1
+        in_flight.release()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for url in urls:
+            in_flight.acquire()
+            executor.submit(request, url, time.perf_counter())
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def call_asgi(application, url):
+    """Run one GET through an ASGI application and return the status code."""
+    parts = urlsplit(url)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(),
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+    done = asyncio.Event()
+    result = {}
+
+    async def receive():
+        if 'requested' not in result:
+            result['requested'] = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Django waits for the client to disconnect while it handles the request.
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    await application(scope, receive, send)
+    done.set()
+    return result['status']
+
+
+def run_asgi(application, urls, concurrency):
+    """Send every url in urls to an ASGI application from ``concurrency`` clients."""
+    latencies, errors = [], 0
+
+    async def client(queue):
+        nonlocal errors
+        while queue:
+            url = queue.pop()
+            sent = time.perf_counter()
+            try:
+                ok = await call_asgi(application, url) < 400
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - sent)
+            else:
+                errors += 1
+
+    async def main():
+        queue = list(reversed(urls))
+        await asyncio.gather(*(client(queue) for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return summarize(latencies, time.perf_counter() - start, errors)
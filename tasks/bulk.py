@@ -0,0 +1,92 @@
+# Bulk task writes.
+#
+# Items are validated one by one so that every invalid item can be reported
+# with its index, then all valid items are written with set-based queries
+# inside one transaction. bulk_create and QuerySet.update bypass model
+# signals, so the stats counters, the user task summaries, the response cache
+# and the change log are updated here explicitly.
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import cache, changes, counters, rollups, summaries
+from .exports import iter_chunks
+from .models import Task
+from .serializers import TaskCreateSerializer, TaskStatusUpdateSerializer
+
+
+# Ids per UPDATE ... WHERE id IN (...), below SQLite's bound parameter limit
+UPDATE_BATCH_SIZE = 500
+
+
+def validate_items(serializer, items):
+    """Return ``(validated items as (index, data) pairs, errors)``."""
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, serializer.child.run_validation(item)))
+        except ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.detail})
+    return valid, errors
+
+
+def create_tasks(items):
+    """Create tasks from a list of TaskCreateSerializer payloads."""
+    valid, errors = validate_items(TaskCreateSerializer(many=True), items)
+    tasks = [Task(**data) for _, data in valid]
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks)
+        counters.record_created(tasks)
+        rollups.record_created(tasks)
+        changes.record([task.id for task in tasks], 'created')
+    return tasks, errors
+
+
+def update_statuses(items):
+    """
+    Apply a list of ``{id, status}`` updates.
+
+    Tasks are updated with one UPDATE per target status rather than one per
+    task. completed_at is stamped as in Task.set_status. When the same task
+    appears more than once the last update wins.
+    """
+    valid, errors = validate_items(TaskStatusUpdateSerializer(many=True), items)
+    statuses, indexes = {}, {}
+    for index, data in valid:
+        statuses[data['id']] = data['status']
+        indexes.setdefault(data['id'], index)
+
+    with transaction.atomic():
+        tasks = Task.objects.select_for_update().only(
+            'id', 'status', 'task_type', 'created_at', 'completed_at'
+        ).in_bulk(list(statuses))
+        errors.extend(
+            {'index': indexes[task_id], 'errors': {'id': ['Task not found']}}
+            for task_id in statuses if task_id not in tasks
+        )
+        now = timezone.now()
+        counted, completions, ids_by_status = [], [], defaultdict(list)
+        for task in tasks.values():
+            counted.append((counters.snapshot(task), task))
+            previous = task.completed_at
+            task.set_status(statuses[task.id], now)
+            if task.status == 'completed':
+                completions.append((task, previous))
+            ids_by_status[task.status].append(task.id)
+
+        for status, ids in ids_by_status.items():
+            fields = {'status': status, 'updated_at': now}
+            if status == 'completed':
+                fields['completed_at'] = now
+            for chunk in iter_chunks(ids, UPDATE_BATCH_SIZE):
+                Task.objects.filter(id__in=chunk).update(**fields)
+        counters.record_changed(counted)
+        summaries.record_changed(counted)
+        rollups.record_completed(completions)
+        cache.invalidate(task_ids=tasks)
+        changes.record(tasks, 'updated')
+
+    errors.sort(key=lambda error: error['index'])
+    return sorted(tasks), errors
@@ -0,0 +1,177 @@
+# Read-through response cache for the detail and relation APIs.
+#
+# Every task and user has a version token in the cache. A cached response
+# stores, next to its data, the versions of every task and user it rendered
+# (including nested assigned users), and is only served while all of them are
+# unchanged. Writes replace the version tokens of the tasks and users they
+# touch (see tasks/signals.py), so no response key ever has to be found and
+# deleted. Tokens are random rather than counters, so a token evicted from the
+# cache can never come back with an old value.
+#
+# Within a process a response is not stored if any invalidation happened
+# while it was being computed, so a write is never followed by a stale read.
+# Neither are responses read from a replica (see tasks/routers.py): a lagging
+# replica could store data older than the versions it is stored under, and
+# clients pinned to default after a write would then be served it.
+# Across processes, staleness is bounded by RESPONSE_CACHE_TIMEOUT with a
+# per-process cache, and absent with a shared one (file, Redis).
+#
+# The ETag and Last-Modified headers set by tasks/conditional.py are stored
+# with the response, so a hit can also answer 304 without any query.
+import hashlib
+import threading
+import uuid
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import read_from_replica
+
+
+stats = Counter()
+_lock = threading.Lock()
+_invalidations = 0
+
+
+# LocMemCache already evicts least recently used keys; this counts them.
+class LRUCache(LocMemCache):
+    def _cull(self):
+        size = len(self._cache)
+        super()._cull()
+        record('evictions', size - len(self._cache))
+
+
+def record(name, count=1):
+    with _lock:
+        stats[name] += count
+
+
+def get_stats():
+    with _lock:
+        return {name: stats[name] for name in ('hits', 'misses', 'evictions', 'invalidations')}
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def version_key(kind, pk):
+    return f'tasks:version:{kind}:{pk}'
+
+
+def bump(task_ids=(), user_ids=()):
+    global _invalidations
+    tokens = {version_key('task', pk): uuid.uuid4().hex for pk in task_ids}
+    tokens.update({version_key('user', pk): uuid.uuid4().hex for pk in user_ids})
+    if not tokens:
+        return
+    with _lock:
+        _invalidations += 1
+        stats['invalidations'] += len(tokens)
+    get_cache().set_many(tokens, timeout=None)
+
+
+def invalidate(task_ids=(), user_ids=()):
+    """
+    Invalidate every cached response that rendered one of the given tasks or users.
+
+    Runs now, and again once the current transaction commits, so that a
+    response computed from not yet committed data is not served afterwards.
+    """
+    task_ids, user_ids = set(task_ids), set(user_ids)
+    bump(task_ids, user_ids)
+    transaction.on_commit(lambda: bump(task_ids, user_ids))
+
+
+def get_versions(keys):
+    """Return the current version of every key, creating the missing ones."""
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def collect_dependencies(kind, pk, item_kind, data):
+    """Return the version keys of the tasks and users rendered in data, or None if unknown."""
+    keys = {version_key(kind, pk)}
+    items = data['results'] if 'results' in data else [data]
+    for item in items:
+        if 'id' not in item:
+            return None
+        keys.add(version_key(item_kind, item['id']))
+        for user in item.get('assigned_users', ()):
+            # Embedded users, or only their ids with a sparse fieldset
+            if isinstance(user, int):
+                keys.add(version_key('user', user))
+            elif 'id' in user:
+                keys.add(version_key('user', user['id']))
+            else:
+                return None
+    return keys
+
+
+# Validator headers stored with a cached response
+STORED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def cached(request, entry):
+    response = Response(entry['data'], status=status.HTTP_200_OK, headers=entry['headers'])
+    return get_conditional_response(
+        request,
+        etag=entry['headers'].get('ETag'),
+        last_modified=parse_http_date_safe(entry['headers'].get('Last-Modified')),
+        response=response
+    )
+
+
+def response_key(request):
+    uri = request.build_absolute_uri()
+    return 'tasks:response:' + hashlib.md5(uri.encode()).hexdigest()
+
+
+def cached_response(kind, lookup, item_kind=None):
+    """
+    Cache the 200 responses of an APIView GET method.
+
+    kind ('task' or 'user') and the ``lookup`` URL kwarg identify the object
+    the view is about; item_kind is the kind of the objects it renders, when
+    those are not the object itself (e.g. the tasks of a user).
+    """
+    item_kind = item_kind or kind
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, **kwargs):
+            cache = get_cache()
+            key = response_key(request)
+            entry = cache.get(key)
+            if entry is not None and cache.get_many(entry['versions'].keys()) == entry['versions']:
+                record('hits')
+                return cached(request, entry)
+            record('misses')
+
+            invalidations = _invalidations
+            response = method(view, request, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                keys = collect_dependencies(kind, kwargs[lookup], item_kind, response.data)
+                if keys is not None:
+                    versions = get_versions(list(keys))
+                    if invalidations == _invalidations and not read_from_replica():
+                        headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+                        entry = {'versions': versions, 'data': response.data, 'headers': headers}
+                        cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,128 @@
+# Task change feed.
+#
+# Every write path appends a TaskChange row per task it creates, changes,
+# (un)assigns users to, deletes or restores, next to the place where it moves
+# the task's updated_at: model signals for single saves, and the set-based
+# modules (bulk, assignments, deletion, datagen) for everything they write
+# without signals. changes_recorded is sent with the new entries once they
+# commit (see the push channel in tasks/events.py).
+#
+# Clients sync with tasks/changes/?since=<token>: they get the tasks changed
+# after the token, each once, in the order of its last change, and the token
+# to pass next. Entry ids are the tokens; they are in commit order on SQLite,
+# where writes are serialized. (On databases with concurrent writers a
+# transaction may commit after one that took a later id.)
+#
+# The log is kept small in two ways (see the compact_changes command):
+# compact() drops old entries superseded by a later entry of the same task,
+# which no client can tell apart (creations stay, so that tasks created after a
+# token are still reported as created); expire() drops all entries older than a
+# cutoff, turning the newest of them into an 'expired' marker. A client whose
+# token is older than a marker has missed changes and must resync in full.
+import time
+
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.dispatch import Signal
+
+from .models import TaskChange
+
+
+EXPIRED = 'expired'
+
+# Entries deleted per transaction by compact() and expire()
+COMPACT_BATCH_SIZE = 1000
+
+
+# Sent on commit with the new entries, as (id, task_id, action) tuples
+changes_recorded = Signal()
+
+
+class TokenExpired(Exception):
+    pass
+
+
+def record(task_ids, action):
+    """Append an entry for each of the given tasks."""
+    created = TaskChange.objects.bulk_create(
+        [TaskChange(task_id=task_id, action=action) for task_id in sorted(task_ids)]
+    )
+    # Ids are only known where bulk_create can return them (SQLite 3.35+, PostgreSQL)
+    if created and created[0].id is not None and changes_recorded.has_listeners(TaskChange):
+        entries = [(entry.id, entry.task_id, entry.action) for entry in created]
+        # Robust: the writes are committed already, receivers must not fail them
+        transaction.on_commit(lambda: changes_recorded.send_robust(sender=TaskChange, entries=entries))
+
+
+def head():
+    """Return the token of the latest entry, 0 when the log is empty."""
+    # MAX(id), which SQLite reads off the end of the primary key
+    return TaskChange.objects.aggregate(head=Max('id'))['head'] or 0
+
+
+def entries_after(since, limit):
+    """Return up to limit ``(id, task_id, action)`` entries after since, raise TokenExpired past a marker."""
+    entries = list(
+        TaskChange.objects.filter(id__gt=since).order_by('id').values_list('id', 'task_id', 'action')[:limit]
+    )
+    if any(action == EXPIRED for _, _, action in entries):
+        raise TokenExpired
+    return entries
+
+
+def read(since, limit):
+    """
+    Return ``(changes, next token, has_more)`` for up to limit entries after
+    since. changes holds one ``(task_id, action)`` per task, in the order of its
+    last change; a task created in the range is reported as 'created' unless
+    it was deleted since. Raises TokenExpired when entries after since were
+    expired.
+    """
+    entries = entries_after(since, limit + 1)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    latest, created = {}, set()
+    for _, task_id, action in entries:
+        if action == 'created':
+            created.add(task_id)
+        latest.pop(task_id, None)
+        latest[task_id] = action
+    changed = [
+        (task_id, 'created' if task_id in created and action != 'deleted' else action)
+        for task_id, action in latest.items()
+    ]
+    return changed, entries[-1][0] if entries else since, has_more
+
+
+def delete_batches(queryset, batch_size, pause):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+            if ids:
+                TaskChange.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def compact(before, batch_size=COMPACT_BATCH_SIZE, pause=0):
+    """Delete entries but creations older than before with a later entry for the same task, return how many."""
+    later = TaskChange.objects.filter(task_id=OuterRef('task_id'), id__gt=OuterRef('id'))
+    superseded = TaskChange.objects.filter(created_at__lt=before).exclude(action__in=['created', EXPIRED]).filter(
+        Exists(later)
+    )
+    return delete_batches(superseded, batch_size, pause)
+
+
+def expire(before, batch_size=COMPACT_BATCH_SIZE, pause=0):
+    """Delete all entries older than before, leaving an expired marker; return how many were deleted."""
+    cutoff = TaskChange.objects.filter(created_at__lt=before).order_by('-created_at', '-id').values_list(
+        'id', flat=True
+    ).first()
+    if cutoff is None:
+        return 0
+    # The marker goes in first, so that readers never skip deleted entries unnoticed
+    TaskChange.objects.filter(id=cutoff).update(action=EXPIRED)
+    return delete_batches(TaskChange.objects.filter(id__lt=cutoff), batch_size, pause)
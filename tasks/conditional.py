@@ -0,0 +1,101 @@
+# Conditional GET (ETag / Last-Modified) for the read APIs.
+#
+# Validators are computed from updated_at and row counts with a few indexed
+# aggregate queries, before the view runs, so an unchanged resource is
+# answered with 304 Not Modified without loading or serializing anything.
+#
+# Lists are validated by their ETag only, built from version values read in
+# constant time rather than aggregates over the listed rows: the change log
+# head, which moves on every task write, and the users version below. A
+# max(updated_at) misses rows leaving a list (soft deletes) and, at the one
+# second resolution of Last-Modified, writes in the same second, so lists send
+# no Last-Modified. The ETag also covers the query string, so each filter and
+# page has its own.
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from . import changes
+from .models import Task, User
+
+
+def latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def conditional(validator):
+    """
+    Add ETag and Last-Modified handling to an APIView GET method.
+
+    validator(request, **kwargs) returns ``(last_modified, state)``, where
+    last_modified is None when it is not exact, and state is anything that
+    changes whenever the response would, or None when the object does not
+    exist (the view then runs and returns its 404).
+    """
+    def get_validators(request, kwargs):
+        if not hasattr(request, '_conditional_validators'):
+            request._conditional_validators = validator(request, **kwargs)
+        return request._conditional_validators
+
+    def etag_func(request, *args, **kwargs):
+        validators = get_validators(request, kwargs)
+        if validators is None:
+            return None
+        key = repr((request.get_full_path(), request.META.get('HTTP_ACCEPT'), validators))
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        validators = get_validators(request, kwargs)
+        return validators[0] if validators is not None else None
+
+    return method_decorator(condition(etag_func=etag_func, last_modified_func=last_modified_func))
+
+
+def task_detail(request, task_id):
+    row = Task.objects.filter(id=task_id).aggregate(
+        updated_at=Max('updated_at'), users=Count('assigned_users'), users_updated_at=Max('assigned_users__updated_at')
+    )
+    if row['updated_at'] is None:
+        return None
+    return latest(row['updated_at'], row['users_updated_at']), (row['users'],)
+
+
+def user_detail(request, user_id):
+    row = User.objects.filter(id=user_id).values_list('updated_at', 'task_summary__updated_at').first()
+    if row is None:
+        return None
+    # The summary of the user's tasks is part of the response
+    return latest(*row), ()
+
+
+def users_version():
+    """
+    Return a value that changes on every user write: the latest updated_at of
+    the live users and deleted_at of the deleted ones, each read off the end
+    of its partial index.
+    """
+    live = User.objects.aggregate(updated_at=Max('updated_at'))['updated_at']
+    deleted = User.all_objects.filter(is_deleted=True).aggregate(deleted_at=Max('deleted_at'))['deleted_at']
+    return live, deleted
+
+
+def user_tasks(request, user_id):
+    if not User.objects.filter(id=user_id).exists():
+        return None
+    # Assignments are task changes too; the users version covers the users rendered inside the tasks
+    return None, (changes.head(), users_version())
+
+
+def task_list(request):
+    return None, (changes.head(), users_version())
+
+
+def task_filter(request):
+    return None, (changes.head(), users_version())
+
+
+def user_list(request):
+    return None, users_version()
@@ -0,0 +1,124 @@
+# Counters behind TaskStatsView.
+#
+# Single-object saves and deletes are picked up by the signal receivers in
+# tasks/signals.py. Code that bypasses model signals (bulk_create, bulk_update,
+# QuerySet.update) must call record_created/record_changed/record_deleted itself,
+# inside the same transaction as the write.
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Task, TaskCounter
+
+
+# Task fields that have a counter per distinct value.
+COUNTED_FIELDS = ('status', 'task_type')
+
+
+def snapshot(task):
+    """Return the counted field values of task, to diff against later."""
+    return {name: getattr(task, name) for name in COUNTED_FIELDS}
+
+
+def record_created(tasks):
+    deltas = Counter()
+    for task in tasks:
+        for name in COUNTED_FIELDS:
+            deltas[name, getattr(task, name)] += 1
+    apply_deltas(deltas)
+
+
+def record_deleted(tasks):
+    deltas = Counter()
+    for task in tasks:
+        for name in COUNTED_FIELDS:
+            deltas[name, getattr(task, name)] -= 1
+    apply_deltas(deltas)
+
+
+def record_changed(changes):
+    """
+    Update counters for tasks whose counted fields may have changed.
+
+    changes is an iterable of ``(snapshot_before, task_after)`` pairs.
+    """
+    deltas = Counter()
+    for before, task in changes:
+        for name in COUNTED_FIELDS:
+            if before[name] != getattr(task, name):
+                deltas[name, before[name]] -= 1
+                deltas[name, getattr(task, name)] += 1
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    # Sorted so that concurrent writers lock counter rows in the same order.
+    with transaction.atomic():
+        for (dimension, value), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            counters = TaskCounter.objects.filter(dimension=dimension, value=value)
+            if not counters.update(count=F('count') + delta):
+                TaskCounter.objects.get_or_create(dimension=dimension, value=value)
+                counters.update(count=F('count') + delta)
+
+
+def count_tasks(queryset=None):
+    """Count tasks per counted field value straight from the Task table."""
+    queryset = Task.objects.all() if queryset is None else queryset
+    counts = {}
+    for name in COUNTED_FIELDS:
+        rows = queryset.values(name).annotate(count=Count('id')).values_list(name, 'count')
+        counts.update({(name, value): count for value, count in rows})
+    return counts
+
+
+def stored_counts():
+    return {
+        (dimension, value): count
+        for dimension, value, count in TaskCounter.objects.values_list('dimension', 'value', 'count')
+    }
+
+
+def rebuild():
+    """Recompute every counter from the Task table."""
+    with transaction.atomic():
+        TaskCounter.objects.all().delete()
+        TaskCounter.objects.bulk_create(
+            TaskCounter(dimension=dimension, value=value, count=count)
+            for (dimension, value), count in count_tasks().items()
+        )
+
+
+def verify():
+    """Return ``{(dimension, value): (stored, actual)}`` for every counter that has drifted."""
+    stored, actual = stored_counts(), count_tasks()
+    return {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in stored.keys() | actual.keys()
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
+
+
+def get_stats():
+    """Return task statistics in the TaskStatsView shape, read from the counters only."""
+    return build_stats(stored_counts())
+
+
+async def aget_stats():
+    rows = TaskCounter.objects.values_list('dimension', 'value', 'count')
+    return build_stats({(dimension, value): count async for dimension, value, count in rows})
+
+
+def build_stats(counts):
+    stats = {'total_tasks': 0, 'by_status': {}, 'by_type': {}}
+    for (dimension, value), count in sorted(counts.items()):
+        if count <= 0:
+            continue
+        if dimension == 'status':
+            stats['total_tasks'] += count
+            stats['by_status'][value] = count
+        else:
+            stats['by_type'][value] = count
+    return stats
@@ -0,0 +1,140 @@
+# Synthetic datasets for benchmarks and load tests.
+#
+# Users, tasks and assignments are written with bulk_create in batches, which
+# bypasses the model signals: the task counters, the summaries of the new users
+# and today's rollups are rebuilt at the end, the change log gets its entries
+# explicitly, and the SQLite full-text index follows through its triggers. Runs
+# with the same seed generate the same rows, apart from the user emails.
+#
+# Each task gets a number of assigned users drawn from a distribution with the
+# given mean; with a user skew, users are picked with Zipf weights (the k-th
+# user weighted 1 / k ** skew), so a few users hold most assignments.
+import math
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import changes, counters, rollups, summaries
+from .models import Task, User
+
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'poisson')
+
+STATUS_WEIGHTS = {'pending': 50, 'in_progress': 30, 'completed': 20}
+TYPE_WEIGHTS = {'task': 40, 'bug': 25, 'feature': 20, 'improvement': 15}
+
+FIRST_NAMES = ['Asha', 'Ben', 'Chen', 'Dara', 'Elif', 'Farid', 'Grace', 'Hiro', 'Ines', 'Jonas', 'Kavya', 'Luis']
+LAST_NAMES = ['Silva', 'Okafor', 'Novak', 'Patel', 'Kim', 'Larsen', 'Moreau', 'Haddad', 'Ito', 'Reyes']
+VERBS = ['Fix', 'Add', 'Refactor', 'Document', 'Review', 'Migrate', 'Optimize', 'Test', 'Remove', 'Update']
+SUBJECTS = [
+    'login flow', 'search results', 'export job', 'billing page', 'user settings', 'task filters', 'API client',
+    'email alerts', 'dashboard', 'mobile layout', 'cache layer', 'audit log', 'onboarding', 'permissions',
+]
+DETAILS = [
+    'Steps to reproduce are in the linked ticket.', 'Customers reported this twice this week.',
+    'Needs a migration for existing rows.', 'Keep the old behaviour behind a flag.',
+    'Check the query plan before merging.', 'Add tests for the edge cases.', 'Blocked on the design review.',
+    'Coordinate the release with support.', 'The current implementation times out on large accounts.',
+]
+
+
+def sample_count(rng, distribution, mean):
+    if distribution == 'fixed':
+        return round(mean)
+    if distribution == 'uniform':
+        return rng.randint(0, round(2 * mean))
+    # Poisson, by Knuth's method
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def sample_users(rng, user_ids, cum_weights, count):
+    """Return count distinct user ids, picked with the given cumulative weights."""
+    count = min(count, len(user_ids))
+    if count * 2 > len(user_ids):
+        return rng.sample(user_ids, count)
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(rng.choices(user_ids, cum_weights=cum_weights, k=count - len(chosen)))
+    return list(chosen)
+
+
+def accumulate_weights(count, skew):
+    """Yield the cumulative Zipf weights of count users."""
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank ** skew
+        yield total
+
+
+def generate(users=100, tasks=1000, assignments=2.0, distribution='poisson', user_skew=0.0, seed=0,
+             batch_size=1000):
+    """
+    Add users, tasks and assignments to the database.
+
+    Returns ``{'users': [ids], 'tasks': [ids], 'assignments': count}``.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f'Unknown distribution {distribution!r}')
+    rng = random.Random(seed)
+    # Emails get a prefix per run, so that runs can be repeated on one database
+    run = uuid.uuid4().hex[:8]
+    # Hashing a password per user would dominate the run
+    password = make_password('password')
+    statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+    types, type_weights = zip(*TYPE_WEIGHTS.items())
+    now = timezone.now()
+
+    with transaction.atomic():
+        created_users = User.objects.bulk_create(
+            (
+                User(
+                    name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    email=f'user-{run}-{i}@example.com',
+                    mobile=f'{rng.randrange(10 ** 9, 10 ** 10)}',
+                    password=password,
+                )
+                for i in range(users)
+            ),
+            batch_size=batch_size,
+        )
+        user_ids = [user.id for user in created_users]
+
+        created_tasks = []
+        for i in range(tasks):
+            status = rng.choices(statuses, status_weights)[0]
+            created_tasks.append(Task(
+                title=f'{rng.choice(VERBS)} {rng.choice(SUBJECTS)} #{i}',
+                description=' '.join(rng.sample(DETAILS, rng.randint(1, 3))),
+                status=status,
+                task_type=rng.choices(types, type_weights)[0],
+                completed_at=now if status == 'completed' else None,
+            ))
+        created_tasks = Task.objects.bulk_create(created_tasks, batch_size=batch_size)
+        task_ids = [task.id for task in created_tasks]
+        changes.record(task_ids, 'created')
+
+        Assignment = Task.assigned_users.through
+        cum_weights = list(accumulate_weights(len(user_ids), user_skew))
+        batch, assigned = [], 0
+        for task_id in task_ids if user_ids else ():
+            count = sample_count(rng, distribution, assignments)
+            for user_id in sample_users(rng, user_ids, cum_weights, count):
+                batch.append(Assignment(task_id=task_id, user_id=user_id))
+            if len(batch) >= batch_size:
+                Assignment.objects.bulk_create(batch)
+                assigned += len(batch)
+                batch = []
+        Assignment.objects.bulk_create(batch)
+        assigned += len(batch)
+
+        counters.rebuild()
+        summaries.rebuild(user_ids)
+        rollups.rebuild(rollups.day_of(now), rollups.day_of(now))
+    return {'users': user_ids, 'tasks': task_ids, 'assignments': assigned}
@@ -0,0 +1,113 @@
+# Soft deletes.
+#
+# Deleting a task or user only marks it is_deleted and stamps deleted_at. It
+# leaves the default managers (Task.objects, User.objects), and with them every
+# API, but nothing cascades: its assignment rows stay where they are, and it can
+# be restored. purge() removes tombstones for good, a bounded batch per
+# transaction, once they are old enough (see the purge_deleted command).
+#
+# Rows are changed with set-based UPDATEs, which bypass model signals, so the
+# stats counters, the user task summaries, the response cache, the change log
+# and the updated_at of tasks whose assigned users change are maintained here.
+# Soft deleted users keep their summaries; their tasks do not count in anyone's.
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, changes, counters, summaries
+from .bulk import UPDATE_BATCH_SIZE
+from .exports import iter_chunks
+from .models import Task, User
+
+
+Assignment = Task.assigned_users.through
+
+# Tombstones removed per transaction by purge()
+PURGE_BATCH_SIZE = 500
+
+
+def update_in_chunks(queryset, ids, **values):
+    for chunk in iter_chunks(sorted(ids), UPDATE_BATCH_SIZE):
+        queryset.filter(id__in=chunk).update(**values)
+
+
+def set_tasks_deleted(task_ids, deleted):
+    """Soft delete (or restore) the tasks with the given ids, return the ids that changed."""
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = []
+        for chunk in iter_chunks(sorted(set(task_ids)), UPDATE_BATCH_SIZE):
+            tasks += Task.all_objects.select_for_update().filter(id__in=chunk, is_deleted=not deleted).only(
+                'id', *counters.COUNTED_FIELDS
+            )
+        ids = [task.id for task in tasks]
+        update_in_chunks(Task.all_objects, ids, is_deleted=deleted, deleted_at=now if deleted else None, updated_at=now)
+        if deleted:
+            counters.record_deleted(tasks)
+            summaries.record_deleted(tasks)
+        else:
+            counters.record_created(tasks)
+            summaries.record_restored(tasks)
+        cache.invalidate(task_ids=ids)
+        changes.record(ids, 'deleted' if deleted else 'restored')
+    return ids
+
+
+def set_users_deleted(user_ids, deleted):
+    """Soft delete (or restore) the users with the given ids, return the ids that changed."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = []
+        for chunk in iter_chunks(sorted(set(user_ids)), UPDATE_BATCH_SIZE):
+            ids += User.all_objects.select_for_update().filter(id__in=chunk, is_deleted=not deleted).values_list(
+                'id', flat=True
+            )
+        update_in_chunks(User.all_objects, ids, is_deleted=deleted, deleted_at=now if deleted else None, updated_at=now)
+
+        # The users appear in (or disappear from) the assigned users of their tasks
+        task_ids = set()
+        for chunk in iter_chunks(ids, UPDATE_BATCH_SIZE):
+            task_ids.update(Assignment.objects.filter(user_id__in=chunk).values_list('task_id', flat=True))
+        update_in_chunks(Task.all_objects, task_ids, updated_at=now)
+        cache.invalidate(task_ids=task_ids, user_ids=ids)
+        changes.record(task_ids, 'assigned')
+    return ids
+
+
+def delete_tasks(task_ids):
+    return set_tasks_deleted(task_ids, True)
+
+
+def restore_tasks(task_ids):
+    return set_tasks_deleted(task_ids, False)
+
+
+def delete_users(user_ids):
+    return set_users_deleted(user_ids, True)
+
+
+def restore_users(user_ids):
+    return set_users_deleted(user_ids, False)
+
+
+def purge(model, before, batch_size=PURGE_BATCH_SIZE, pause=0):
+    """
+    Delete the tombstones of model deleted before ``before``, batch_size rows
+    per transaction with ``pause`` seconds between batches. Returns the number
+    of rows purged.
+    """
+    purged = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                model.all_objects.filter(is_deleted=True, deleted_at__lt=before)
+                .order_by('deleted_at').values_list('id', flat=True)[:batch_size]
+            )
+            if ids:
+                # Assignment rows go in one DELETE per batch
+                model.all_objects.filter(id__in=ids).delete()
+        purged += len(ids)
+        if len(ids) < batch_size:
+            return purged
+        time.sleep(pause)
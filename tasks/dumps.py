@@ -0,0 +1,201 @@
+# Table dumps for backups and warehouse loads, see the export_tasks command.
+#
+# Tasks, users and the assignment table are written as NDJSON or CSV files,
+# optionally gzipped, one file per table. Rows are read in primary key order a
+# chunk at a time, each chunk a keyset query (id > the last id written) built
+# with values_list(), so memory stays bounded by the chunk size whatever the
+# table size. Soft deleted rows are included, with their is_deleted flag; user
+# password hashes are left out.
+#
+# Chunks are read through a cursor rather than QuerySet.iterator(): parsing
+# datetimes into objects, by Django's converters and on SQLite by the sqlite3
+# module too, costs more than the rest of the dump together. SQLite datetime
+# columns are selected as text, and every datetime is written as the API
+# writes it (ISO 8601, UTC as Z) with a few string operations.
+#
+# After every chunk the file is synced to disk, then a checkpoint records, per
+# table, the last id written, the rows written and the file size. An
+# interrupted export resumes from there: each file is cut back to its
+# checkpointed size and reading restarts after the last id. A file shorter
+# than its checkpoint lost data the checkpoint counts as written, and is not
+# resumed. Gzipped files are written as one
+# gzip member per chunk, which gzip readers concatenate, so that every
+# checkpointed size ends on a complete member. Rows are read as they are when
+# their chunk is, so a dump taken while the API is writing is not a snapshot.
+import csv
+import gzip
+import io
+import json
+import os
+
+from django.db import connections, models
+from django.db.models import F
+from django.db.models.functions import Cast
+
+from .models import Task, User
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+FORMATS = ('ndjson', 'csv')
+
+# Rows per chunk, i.e. per query and checkpoint
+DUMP_CHUNK_SIZE = 10000
+GZIP_LEVEL = 6
+
+CHECKPOINT_NAME = 'checkpoint.json'
+
+Assignment = Task.assigned_users.through
+
+# Dumped tables, in dump order: the rows of each and their columns
+TABLES = {
+    'tasks': (Task.all_objects.all(), [field.attname for field in Task._meta.concrete_fields]),
+    'users': (User.all_objects.all(), [
+        'id', 'name', 'email', 'mobile', 'created_at', 'updated_at', 'is_active', 'is_staff', 'is_deleted',
+        'deleted_at',
+    ]),
+    'assignments': (Assignment.objects.all(), ['id', 'task_id', 'user_id']),
+}
+
+
+def format_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        # SQLite keeps datetimes as UTC text, e.g. '2024-05-01 10:00:00.123456'
+        return value.replace(' ', 'T') + 'Z'
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def format_boolean(value):
+    return None if value is None else bool(value)
+
+
+def get_columns(queryset, columns, connection):
+    """
+    Return the annotations selecting columns, in order, and ``(index, converter)``
+    of the columns whose database values need converting.
+    """
+    selected, converters = {}, []
+    for index, name in enumerate(columns):
+        field = queryset.model._meta.get_field(name)
+        # Annotations only: values_list() would select plain fields before expressions
+        selected[f'column_{index}'] = F(name)
+        if isinstance(field, models.DateTimeField):
+            if connection.vendor == 'sqlite':
+                # As stored, without the sqlite3 module's datetime parsing
+                selected[f'column_{index}'] = Cast(name, models.TextField())
+            converters.append((index, format_datetime))
+        elif isinstance(field, models.BooleanField):
+            converters.append((index, format_boolean))
+    return selected, converters
+
+
+def iter_chunks(queryset, columns, after=0, chunk_size=DUMP_CHUNK_SIZE):
+    """Yield the rows of queryset with an id above after, in id order, a list of value lists per chunk."""
+    connection = connections[queryset.db]
+    selected, converters = get_columns(queryset, columns, connection)
+    queryset = queryset.annotate(**selected).values_list(*selected)
+    with connection.cursor() as cursor:
+        while True:
+            chunk = queryset.filter(id__gt=after).order_by('id')[:chunk_size]
+            cursor.execute(*chunk.query.sql_with_params())
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            after = rows[-1][0]
+            if converters:
+                rows = [list(row) for row in rows]
+                for row in rows:
+                    for index, converter in converters:
+                        row[index] = converter(row[index])
+            yield rows
+
+
+def encode_ndjson(columns, rows):
+    if orjson is not None:
+        return b''.join(orjson.dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+    return ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows).encode()
+
+
+def encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def file_name(table, fmt, compress):
+    return f'{table}.{fmt}.gz' if compress else f'{table}.{fmt}'
+
+
+def new_checkpoint(tables, fmt, compress):
+    return {
+        'format': fmt,
+        'gzip': compress,
+        'tables': {table: {'last_id': 0, 'rows': 0, 'size': 0, 'done': False} for table in tables},
+    }
+
+
+def load_checkpoint(directory):
+    """Return the checkpoint of an unfinished dump in directory, None when there is none."""
+    try:
+        with open(os.path.join(directory, CHECKPOINT_NAME), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(directory, checkpoint):
+    path = os.path.join(directory, CHECKPOINT_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    # Atomic, so that a crash leaves either checkpoint whole
+    os.replace(path + '.tmp', path)
+
+
+def dump_table(directory, table, checkpoint, chunk_size=DUMP_CHUNK_SIZE, on_chunk=None):
+    """Write (or finish writing) the file of table, moving its checkpoint state after every chunk."""
+    fmt, compress, state = checkpoint['format'], checkpoint['gzip'], checkpoint['tables'][table]
+    queryset, columns = TABLES[table]
+    path = os.path.join(directory, file_name(table, fmt, compress))
+    if state['size'] and not os.path.exists(path):
+        raise FileNotFoundError(f'{path} is missing, the dump cannot be resumed')
+    if state['size'] and os.path.getsize(path) < state['size']:
+        raise OSError(f'{path} is shorter than its checkpoint, the dump cannot be resumed')
+
+    def write(raw, data):
+        raw.write(gzip.compress(data, compresslevel=GZIP_LEVEL) if compress else data)
+        raw.flush()
+        # On disk before a checkpoint counts it as written
+        os.fsync(raw.fileno())
+
+    with open(path, 'r+b' if state['size'] else 'wb') as raw:
+        # Anything past the checkpoint was written after it, and is written again
+        raw.truncate(state['size'])
+        raw.seek(state['size'])
+        if fmt == 'csv' and not state['size']:
+            write(raw, encode_csv([columns]))
+        for rows in iter_chunks(queryset, columns, state['last_id'], chunk_size):
+            write(raw, encode_csv(rows) if fmt == 'csv' else encode_ndjson(columns, rows))
+            state.update(last_id=rows[-1][0], rows=state['rows'] + len(rows), size=raw.tell())
+            save_checkpoint(directory, checkpoint)
+            if on_chunk is not None:
+                on_chunk(table, state)
+    state['done'] = True
+    save_checkpoint(directory, checkpoint)
+
+
+def dump(directory, checkpoint, chunk_size=DUMP_CHUNK_SIZE, on_chunk=None):
+    """Dump the unfinished tables of checkpoint into directory, then drop the checkpoint."""
+    os.makedirs(directory, exist_ok=True)
+    save_checkpoint(directory, checkpoint)
+    for table, state in checkpoint['tables'].items():
+        if not state['done']:
+            dump_table(directory, table, checkpoint, chunk_size, on_chunk)
+    os.remove(os.path.join(directory, CHECKPOINT_NAME))
@@ -0,0 +1,264 @@
+# Push channel for task changes.
+#
+# Clients subscribe to task events (created, updated, assigned, deleted,
+# restored) over server-sent events or long polling (see tasks/async_views.py)
+# instead of polling the read APIs. An event carries the task's current status,
+# type and assigned users, and subscribers filter on task ids, user ids and
+# statuses.
+#
+# Events are the entries of the change log (tasks/changes.py) and their ids
+# are change log tokens, so a client that reconnects with the last id it saw
+# is first replayed what it missed from the log. Live events come from a hub,
+# which fans them out to the subscribers of this process:
+#
+# - LocalHub (the default) publishes the changes made by this process as they
+#   commit. Enough when one ASGI process serves both the writes and the streams.
+# - ChangeLogHub reads the change log every EVENTS_POLL_INTERVAL seconds, on
+#   one thread per process, and so sees the writes of every process (other
+#   servers, run_worker jobs, management commands) with one query per interval
+#   rather than one per client. A failed poll (e.g. the database restarting) is
+#   logged and retried, backing off up to EVENTS_MAX_BACKOFF seconds.
+#
+# Other transports (e.g. Redis pub/sub) plug in as Hub subclasses named by
+# EVENTS_HUB.
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from . import changes
+from .bulk import UPDATE_BATCH_SIZE
+from .exports import iter_chunks
+from .models import Task, TaskChange
+
+
+logger = logging.getLogger(__name__)
+
+Assignment = Task.assigned_users.through
+
+# Change log entries read per query when replaying or polling
+EVENTS_BATCH_SIZE = 500
+
+# Longest wait, in seconds, between the retries of a failing change log poll
+EVENTS_MAX_BACKOFF = 30
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def build_events(entries):
+    """Return the events of change log entries ``(id, task_id, action)``, with the current state of their tasks."""
+    task_ids = sorted({task_id for _, task_id, _ in entries})
+    tasks, users = {}, defaultdict(list)
+    for chunk in iter_chunks(task_ids, UPDATE_BATCH_SIZE):
+        for task_id, status, task_type in Task.all_objects.filter(id__in=chunk).values_list('id', 'status', 'task_type'):
+            tasks[task_id] = (status, task_type)
+        rows = Assignment.objects.filter(task_id__in=chunk, user__is_deleted=False).order_by('user_id')
+        for task_id, user_id in rows.values_list('task_id', 'user_id'):
+            users[task_id].append(user_id)
+    events = []
+    for entry_id, task_id, action in entries:
+        # Purged tasks have no state left
+        status, task_type = tasks.get(task_id, (None, None))
+        events.append({
+            'id': entry_id, 'event': f'task.{action}', 'task_id': task_id, 'status': status, 'task_type': task_type,
+            'user_ids': users.get(task_id, []),
+        })
+    return events
+
+
+def replay(event_filter, since, limit=EVENTS_BATCH_SIZE):
+    """
+    Return ``(events, next id, has_more)``: the events matching event_filter
+    among the next limit change log entries after since. Raises
+    changes.TokenExpired when entries after since were expired.
+    """
+    entries = changes.entries_after(since, limit)
+    events = [event for event in build_events(entries) if event_filter.matches(event)]
+    return events, entries[-1][0] if entries else since, len(entries) == limit
+
+
+class EventFilter:
+    """Matches events of any of task_ids, assigned to any of user_ids, in any of statuses (all when empty)."""
+
+    def __init__(self, task_ids=(), user_ids=(), statuses=()):
+        self.task_ids = frozenset(task_ids)
+        self.user_ids = frozenset(user_ids)
+        self.statuses = frozenset(statuses)
+
+    @classmethod
+    def from_query(cls, params):
+        """Build a filter from comma separated task_id, user_id and status parameters; raises ValueError."""
+        def values(name):
+            return [value for value in params.get(name, '').split(',') if value]
+
+        statuses = values('status')
+        if not set(statuses) <= {status for status, _ in Task.TASK_STATUS}:
+            raise ValueError('Invalid status')
+        return cls([int(value) for value in values('task_id')], [int(value) for value in values('user_id')], statuses)
+
+    def matches(self, event):
+        return (
+            (not self.task_ids or event['task_id'] in self.task_ids)
+            and (not self.user_ids or not self.user_ids.isdisjoint(event['user_ids']))
+            and (not self.statuses or event['status'] in self.statuses)
+        )
+
+
+class Subscription:
+    """Events matching a filter, queued on the event loop of the subscriber."""
+
+    def __init__(self, hub, event_filter):
+        self.hub = hub
+        self.filter = event_filter
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        # Set when the subscriber fell behind and events were dropped
+        self.overflowed = False
+
+    def deliver(self, events):
+        for event in events:
+            if self.filter.matches(event):
+                try:
+                    self.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self.overflowed = True
+
+    async def get(self, timeout):
+        """Wait up to timeout seconds for events, and return all that are queued (possibly none)."""
+        try:
+            events = [await asyncio.wait_for(self.queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    def reset(self):
+        """Drop the queued events, before catching up from the change log."""
+        self.overflowed = False
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    """In-process fan-out of events to subscribers, which may be on any thread and event loop."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    def subscribe(self, event_filter, since):
+        """
+        Subscribe the running event loop to events matching event_filter.
+        Subscribers replay the change log from since themselves, after
+        subscribing, so events may come twice but none go missing.
+        """
+        subscription = Subscription(self, event_filter)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, events):
+        if not events:
+            return
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, events)
+            except RuntimeError:
+                # Its event loop is closed
+                self.unsubscribe(subscription)
+
+
+class LocalHub(Hub):
+    """Publishes the changes committed by this process."""
+
+    def __init__(self):
+        super().__init__()
+        changes.changes_recorded.connect(self.changes_recorded, sender=TaskChange, weak=False)
+
+    def changes_recorded(self, sender, entries, **kwargs):
+        if self.subscribers:
+            self.publish(build_events(entries))
+
+
+class ChangeLogHub(Hub):
+    """Publishes the changes of every process, read from the change log by a thread while there are subscribers."""
+
+    def __init__(self):
+        super().__init__()
+        self.thread = None
+        self.last_id = None
+
+    def subscribe(self, event_filter, since):
+        subscription = super().subscribe(event_filter, since)
+        with self.lock:
+            if self.thread is None:
+                # Not from the head, which may be past where the subscriber's replay stops
+                self.last_id = since
+                self.thread = threading.Thread(target=self.run, name='change-log-hub', daemon=True)
+                self.thread.start()
+        return subscription
+
+    def poll(self):
+        """Publish the entries added since the last poll, returns how many there were."""
+        try:
+            entries = changes.entries_after(self.last_id, EVENTS_BATCH_SIZE)
+        except changes.TokenExpired:
+            # Compacted past the last poll: there is nothing left to send
+            self.last_id = changes.head()
+            return 0
+        if entries:
+            self.last_id = entries[-1][0]
+            self.publish(build_events(entries))
+        return len(entries)
+
+    def run(self):
+        backoff = settings.EVENTS_POLL_INTERVAL
+        try:
+            while True:
+                with self.lock:
+                    if not self.subscribers:
+                        self.thread = self.last_id = None
+                        return
+                try:
+                    polled = self.poll()
+                except Exception:
+                    logger.exception('Polling the change log failed, retrying in %s seconds', backoff)
+                    # Reconnect on the next poll, in case the connection broke
+                    connections.close_all()
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, EVENTS_MAX_BACKOFF)
+                    continue
+                backoff = settings.EVENTS_POLL_INTERVAL
+                if polled < EVENTS_BATCH_SIZE:
+                    time.sleep(settings.EVENTS_POLL_INTERVAL)
+        finally:
+            with self.lock:
+                # Whatever stopped this thread, let the next subscriber start another
+                if self.thread is threading.current_thread():
+                    self.thread = self.last_id = None
+            connections.close_all()
+
+
+def get_hub():
+    """Return the hub of this process, an instance of EVENTS_HUB."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = import_string(settings.EVENTS_HUB)()
+        return _hub
@@ -0,0 +1,65 @@
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+from .fast_serializers import get_values_serializer
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_serialized(queryset, serializer_class, chunk_size, options=None):
+    """
+    Yield the rendered JSON of every row in queryset, one chunk at a time.
+
+    Rows are read with a server-side iterator, in the ``(created_at, id)``
+    order and index of the list endpoints, and relations declared by the
+    serializer are fetched once per chunk, so memory stays bounded by
+    chunk_size no matter how large the table is. options are the serializer's
+    sparse fieldset arguments, see SparseFieldsMixin.
+    """
+    options = options or {}
+    renderer = FastJSONRenderer()
+    values_serializer = get_values_serializer(serializer_class, **options)
+    if values_serializer is not None:
+        queryset = values_serializer.values(queryset.order_by(*KeysetPagination.ordering))
+        for chunk in iter_chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            yield [renderer.render(item) for item in values_serializer.serialize(chunk)]
+        return
+
+    queryset = serializer_class.setup_eager_loading(queryset, **options).order_by(*KeysetPagination.ordering)
+    for chunk in iter_chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield [renderer.render(item) for item in serializer_class(chunk, many=True, **options).data]
+
+
+def stream_json_array(rows):
+    yield b'['
+    separator = b''
+    for chunk in rows:
+        yield separator + b','.join(chunk)
+        separator = b','
+    yield b']'
+
+
+def stream_ndjson(rows):
+    for chunk in rows:
+        yield b''.join(row + b'\n' for row in chunk)
+
+
+def export_response(queryset, serializer_class, output, chunk_size, filename, options=None):
+    rows = iter_serialized(queryset, serializer_class, chunk_size, options)
+    content = stream_ndjson(rows) if output == 'ndjson' else stream_json_array(rows)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[output])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+    return response
@@ -0,0 +1,220 @@
+# Bulk task import from CSV or JSONL files.
+#
+# Files are read as a stream and handled a chunk of rows at a time, so memory
+# stays bounded by the chunk size whatever the file size. Each row is validated
+# with the TaskCreateSerializer rules (title, description, task_type), plus an
+# optional status and the emails of its assignees; invalid rows are reported
+# with their row number and skipped. Parsing and validation can be spread over
+# worker processes, while this process stays the only writer.
+#
+# Every chunk is written in its own transaction: one bulk INSERT of tasks, one
+# of assignment rows, and the stats counters, rollups, change log and user task
+# summaries updated explicitly, as in tasks/bulk.py. An interrupted import
+# keeps the chunks written before it. Assignees are resolved by User.email
+# against an in-memory map, filled with one query per chunk for the emails not
+# seen yet.
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import re
+import time
+from collections import deque
+from functools import partial
+
+import django
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import changes, counters, rollups, summaries
+from .exports import iter_chunks
+from .models import Task, User
+from .serializers import TaskCreateSerializer
+
+
+FORMATS = ('csv', 'jsonl')
+
+# Rows per chunk, i.e. per transaction
+IMPORT_BATCH_SIZE = 1000
+
+# Assignees are a JSON array of emails, or a string of emails separated by commas, semicolons or spaces
+ASSIGNEE_SEPARATORS = re.compile(r'[,;\s]+')
+
+Assignment = Task.assigned_users.through
+
+
+def detect_format(path):
+    """Guess the format from the file name, ignoring a .gz suffix."""
+    name = path.lower().removesuffix('.gz')
+    for fmt in FORMATS:
+        if name.endswith(f'.{fmt}'):
+            return fmt
+    return 'jsonl' if name.endswith('.ndjson') else None
+
+
+def open_text(path):
+    """Open path for reading as text, decompressing .gz files on the fly."""
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(file, fmt):
+    """
+    Return ``(fieldnames, records)``: records yields ``(row number, record)``
+    pairs, JSONL lines as text and CSV rows as lists of values. fieldnames is
+    the CSV header, None for JSONL.
+    """
+    if fmt == 'jsonl':
+        records = ((number, line) for number, line in enumerate(file, 1) if line.strip())
+        return None, records
+    reader = csv.reader(file)
+    fieldnames = next(reader, None) or []
+    return [name.strip() for name in fieldnames], enumerate(reader, 1)
+
+
+def parse_record(record, fieldnames):
+    if fieldnames is not None:
+        return dict(zip(fieldnames, record))
+    try:
+        item = json.loads(record)
+    except ValueError:
+        raise ValidationError({'row': ['Invalid JSON.']})
+    if not isinstance(item, dict):
+        raise ValidationError({'row': ['Expected a JSON object.']})
+    return item
+
+
+def parse_emails(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        return [email for email in ASSIGNEE_SEPARATORS.split(value) if email]
+    if isinstance(value, list) and all(isinstance(email, str) for email in value):
+        return [email.strip() for email in value if email.strip()]
+    raise ValidationError({'assignees': ['Expected a list of emails.']})
+
+
+def validate_record(serializer, record, fieldnames):
+    item = parse_record(record, fieldnames)
+    data = serializer.run_validation(item)
+    task_status = item.get('status') or 'pending'
+    if task_status not in dict(Task.TASK_STATUS):
+        raise ValidationError({'status': [f'"{task_status}" is not a valid choice.']})
+    data['status'] = task_status
+    data['assignees'] = list(dict.fromkeys(parse_emails(item.get('assignees'))))
+    return data
+
+
+def parse_chunk(chunk, fieldnames):
+    """
+    Validate a chunk of ``(row number, record)`` pairs; return the valid rows
+    as ``(row number, data)`` pairs and the errors of the others. Runs in the
+    worker processes, so it returns plain data only.
+    """
+    serializer = TaskCreateSerializer()
+    valid, errors = [], []
+    for number, record in chunk:
+        try:
+            valid.append((number, validate_record(serializer, record, fieldnames)))
+        except ValidationError as exc:
+            # ErrorDetail strings do not survive pickling, plain ones do
+            errors.append({'row': number, 'errors': json.loads(json.dumps(exc.detail))})
+    return valid, errors
+
+
+def parse_chunks(chunks, fieldnames, workers):
+    """Yield parse_chunk() of every chunk, in order, from up to workers processes."""
+    parse = partial(parse_chunk, fieldnames=fieldnames)
+    if workers <= 1:
+        yield from map(parse, chunks)
+        return
+    # Workers only validate, they never query the database
+    with multiprocessing.get_context().Pool(workers, initializer=django.setup) as pool:
+        # A bounded number of chunks in flight: Pool.imap would read the whole file ahead
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(parse, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def resolve_emails(emails, user_ids):
+    """Add the ids of the live users among emails to the user_ids map, None for unknown emails."""
+    missing = sorted(email for email in emails if email not in user_ids)
+    for chunk in iter_chunks(missing, 500):
+        user_ids.update(dict.fromkeys(chunk))
+        user_ids.update(User.objects.filter(email__in=chunk).values_list('email', 'id'))
+
+
+def write_chunk(valid, user_ids):
+    """
+    Create the tasks of a chunk of validated rows and assign their users;
+    return ``(tasks created, assignments created, errors)``. Rows with an
+    unknown assignee are rejected.
+    """
+    resolve_emails({email for _, data in valid for email in data['assignees']}, user_ids)
+    rows, errors = [], []
+    for number, data in valid:
+        unknown = [email for email in data['assignees'] if user_ids[email] is None]
+        if unknown:
+            errors.append({'row': number, 'errors': {'assignees': [f'Unknown user email: {", ".join(unknown)}.']}})
+        else:
+            rows.append(data)
+    if not rows:
+        return 0, 0, errors
+
+    now = timezone.now()
+    tasks = [
+        Task(
+            **{name: value for name, value in data.items() if name != 'assignees'},
+            completed_at=now if data['status'] == 'completed' else None,
+        )
+        for data in rows
+    ]
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks)
+        pairs = [(task.id, user_ids[email]) for task, data in zip(tasks, rows) for email in data['assignees']]
+        Assignment.objects.bulk_create([Assignment(task_id=task_id, user_id=user_id) for task_id, user_id in pairs])
+        counters.record_created(tasks)
+        rollups.record_created(tasks)
+        rollups.record_completed((task, None) for task in tasks if task.status == 'completed')
+        changes.record([task.id for task in tasks], 'created')
+        summaries.record_assigned(pairs, {task.id: counters.snapshot(task) for task in tasks})
+    return len(tasks), len(pairs), errors
+
+
+def import_file(file, fmt, batch_size=IMPORT_BATCH_SIZE, workers=1, on_error=None, on_progress=None):
+    """
+    Import the tasks of an open CSV or JSONL file.
+
+    on_error is called with the ``{'row', 'errors'}`` of every rejected row,
+    on_progress with the running totals after every chunk. Returns the totals:
+    ``{'rows', 'imported', 'rejected', 'assignments', 'seconds'}``.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}')
+    started = time.perf_counter()
+    totals = {'rows': 0, 'imported': 0, 'rejected': 0, 'assignments': 0, 'seconds': 0.0}
+    fieldnames, records = read_records(file, fmt)
+    if fieldnames is not None and 'title' not in fieldnames:
+        raise ValueError('The CSV header must name the columns, title at least')
+    user_ids = {}
+    for valid, errors in parse_chunks(iter_chunks(records, batch_size), fieldnames, workers):
+        imported, assigned, rejected = write_chunk(valid, user_ids)
+        if on_error is not None:
+            for error in sorted(errors + rejected, key=lambda error: error['row']):
+                on_error(error)
+        totals['rows'] += len(valid) + len(errors)
+        totals['imported'] += imported
+        totals['rejected'] += len(errors) + len(rejected)
+        totals['assignments'] += assigned
+        totals['seconds'] = time.perf_counter() - started
+        if on_progress is not None:
+            on_progress(totals)
+    totals['seconds'] = time.perf_counter() - started
+    return totals
@@ -0,0 +1,325 @@
+# Background jobs.
+#
+# Operations too long for a request (bulk imports, mass reassignment, stats
+# rebuilds) are queued as Job rows and run by workers started with
+# ``manage.py run_worker``. The database is the broker: a worker claims a
+# queued job with a conditional UPDATE (or SELECT ... FOR UPDATE SKIP LOCKED
+# where the database has it), so any number of worker threads and processes
+# can share one queue on one box.
+#
+# A job kind is a handler registered with @register, called with the Job. It
+# returns a JSON result, and can report progress with progress(job, done,
+# total, partial result), which also tells the queue the worker is alive.
+# Handlers work in chunks and report progress in the same transaction as each
+# chunk, so a retried job resumes after the last chunk it committed (from
+# job.progress_done and job.result) instead of redoing it.
+#
+# A failing job is retried max_attempts times in all, with an exponential
+# delay; raising PermanentJobError fails it at once. Jobs whose worker died
+# are requeued once they have made no progress for JOB_TIMEOUT seconds, so
+# every handler reports progress (or a heartbeat) more often than that. A
+# worker that finds at its next progress() that its job was requeued meanwhile
+# gets JobLockLost: the chunk in hand rolls back and the handler stops, leaving
+# the job to its new owner.
+#
+# Kinds registered with heartbeat=False run one statement that cannot report
+# progress midway (rebuilding the full-text index), and are never requeued as
+# stale: a second worker would run the same rebuild next to the first. If the
+# worker of one dies, set the job back to queued by hand.
+import logging
+import os
+import socket
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import assignments, bulk, counters, search, summaries
+from .models import Job, Task, User
+from .serializers import BulkAssignSerializer, JobItemsSerializer, ReassignTasksSerializer
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+
+# Queued jobs tried per claim when two workers race for the same one
+CLAIM_CANDIDATES = 10
+
+JobKind = namedtuple('JobKind', ['handler', 'serializer', 'heartbeat'])
+
+# Registered job kinds by name
+JOB_KINDS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for a job that would fail again if retried."""
+
+
+class JobLockLost(Exception):
+    """Raised by progress() for a job no longer running on its worker, e.g. requeued as stale."""
+
+
+def register(name, serializer=None, heartbeat=True):
+    """
+    Register the decorated function as the handler of jobs of kind name, with
+    a payload serializer. heartbeat=False exempts jobs whose handler cannot
+    report progress from being requeued as stale.
+    """
+    def decorator(handler):
+        JOB_KINDS[name] = JobKind(handler, serializer, heartbeat)
+        return handler
+    return decorator
+
+
+def enqueue(kind, payload=None, max_attempts=None, run_after=None):
+    """Queue a job, returns the Job. The payload must already be valid for kind."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def worker_name(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def claim(worker, kinds=None):
+    """Mark the next ready job as running on worker and return it, or None if there is none."""
+    now = timezone.now()
+    ready = Job.objects.filter(status=QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    if kinds:
+        ready = ready.filter(kind__in=kinds)
+    values = {
+        'status': RUNNING, 'attempts': F('attempts') + 1, 'locked_by': worker, 'locked_at': now, 'started_at': now,
+        'updated_at': now,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_id = ready.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            Job.objects.filter(id=job_id).update(**values)
+    else:
+        # Whoever changes the status first owns the job
+        for job_id in ready.values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+            if Job.objects.filter(id=job_id, status=QUEUED).update(**values):
+                break
+        else:
+            return None
+    return Job.objects.get(id=job_id)
+
+
+def progress(job, done, total=None, result=None):
+    """
+    Record the progress (and partial result) of a running job. Raises
+    JobLockLost if the job is no longer running on this worker, to roll back
+    the transaction of the chunk being reported.
+    """
+    job.progress_done = done
+    if total is not None:
+        job.progress_total = total
+    if result is not None:
+        job.result = result
+    job.locked_at = job.updated_at = timezone.now()
+    updated = Job.objects.filter(id=job.id, status=RUNNING, locked_by=job.locked_by).update(
+        progress_done=job.progress_done, progress_total=job.progress_total, result=job.result,
+        locked_at=job.locked_at, updated_at=job.updated_at,
+    )
+    if not updated:
+        raise JobLockLost(f'Job {job.id} is no longer running on {job.locked_by}')
+
+
+def heartbeat(job):
+    """Tell the queue that the worker of job is alive, with no progress to report."""
+    progress(job, job.progress_done)
+
+
+def finish(job, values):
+    now = timezone.now()
+    values = {'locked_by': '', 'locked_at': None, 'updated_at': now, **values}
+    if values['status'] in (SUCCEEDED, FAILED):
+        values['finished_at'] = now
+    # A job requeued as stale meanwhile belongs to another worker now
+    Job.objects.filter(id=job.id, status=RUNNING, locked_by=job.locked_by).update(**values)
+    for name, value in values.items():
+        setattr(job, name, value)
+
+
+def execute(job):
+    """Run a claimed job, then record its result, or schedule its retry."""
+    kind = JOB_KINDS.get(job.kind)
+    try:
+        if kind is None:
+            raise PermanentJobError(f'Unknown job kind {job.kind!r}')
+        result = kind.handler(job)
+    except JobLockLost:
+        # The job and its state belong to another worker now
+        logger.warning('Job %s (%s) was requeued while running on %s, stopped', job.id, job.kind, job.locked_by)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %s of %s', job.id, job.kind, job.attempts, job.max_attempts)
+        error = f'{type(exc).__name__}: {exc}'
+        if isinstance(exc, PermanentJobError) or job.attempts >= job.max_attempts:
+            finish(job, {'status': FAILED, 'error': error})
+        else:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            finish(job, {'status': QUEUED, 'error': error, 'run_after': timezone.now() + timedelta(seconds=delay)})
+    else:
+        if job.progress_total is not None:
+            job.progress_done = job.progress_total
+        finish(job, {'status': SUCCEEDED, 'result': result, 'error': '', 'progress_done': job.progress_done})
+    return job
+
+
+def requeue_stale(timeout=None):
+    """Requeue (or fail, when out of attempts) running jobs without progress for timeout seconds."""
+    now = timezone.now()
+    stale = Job.objects.filter(status=RUNNING, locked_at__lt=now - timedelta(seconds=timeout or settings.JOB_TIMEOUT))
+    stale = stale.exclude(kind__in=[name for name, kind in JOB_KINDS.items() if not kind.heartbeat])
+    released = {'locked_by': '', 'locked_at': None, 'updated_at': now}
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=FAILED, error='Worker timed out', finished_at=now, **released
+    )
+    requeued = stale.update(status=QUEUED, run_after=now, **released)
+    return requeued, failed
+
+
+def work(worker, stop, kinds=None, burst=False, max_jobs=None, poll_interval=1.0):
+    """
+    Run jobs until the stop event is set, or max_jobs have run, or with burst
+    as soon as no job is ready. Returns the number of jobs run.
+    """
+    done = 0
+    while not stop.is_set() and (max_jobs is None or done < max_jobs):
+        # Drop broken connections, and those past CONN_MAX_AGE, as between requests
+        if not connection.in_atomic_block:
+            close_old_connections()
+        job = claim(worker, kinds)
+        if job is None:
+            requeue_stale()
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+        execute(job)
+        done += 1
+    return done
+
+
+def chunk_ranges(job, total):
+    """Yield (start, end) of the chunks of total items not yet done by job."""
+    for start in range(job.progress_done, total, settings.JOB_CHUNK_SIZE):
+        yield start, min(start + settings.JOB_CHUNK_SIZE, total)
+
+
+def merge_summary(total, summary):
+    """Add an assignment summary to total: counts are summed, id lists merged."""
+    for key, value in summary.items():
+        if isinstance(value, list):
+            total[key] = sorted(set(total.get(key, [])) | set(value))
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+@register('noop')
+def noop(job):
+    """Does nothing, or sleeps for payload["seconds"]: for benchmarks and health checks."""
+    deadline = time.monotonic() + job.payload.get('seconds', 0)
+    while (remaining := deadline - time.monotonic()) > 0:
+        time.sleep(min(remaining, settings.JOB_TIMEOUT / 10))
+        heartbeat(job)
+    return {}
+
+
+@register('bulk_create_tasks', JobItemsSerializer)
+def bulk_create_tasks(job):
+    items = job.payload['items']
+    result = job.result or {'created': 0, 'ids': [], 'errors': []}
+    for start, end in chunk_ranges(job, len(items)):
+        with transaction.atomic():
+            tasks, errors = bulk.create_tasks(items[start:end])
+            result['created'] += len(tasks)
+            result['ids'] += [task.id for task in tasks]
+            result['errors'] += [{**error, 'index': error['index'] + start} for error in errors]
+            progress(job, end, len(items), result)
+    return result
+
+
+@register('bulk_update_tasks', JobItemsSerializer)
+def bulk_update_tasks(job):
+    items = job.payload['items']
+    result = job.result or {'updated': 0, 'ids': [], 'errors': []}
+    for start, end in chunk_ranges(job, len(items)):
+        with transaction.atomic():
+            task_ids, errors = bulk.update_statuses(items[start:end])
+            result['updated'] += len(task_ids)
+            result['ids'] += task_ids
+            result['errors'] += [{**error, 'index': error['index'] + start} for error in errors]
+            progress(job, end, len(items), result)
+    return result
+
+
+def run_assignments(job, action):
+    pairs = sorted(assignments.expand_pairs(**job.payload))
+    result = job.result or {}
+    for start, end in chunk_ranges(job, len(pairs)):
+        with transaction.atomic():
+            merge_summary(result, action(set(pairs[start:end])))
+            progress(job, end, len(pairs), result)
+    return result
+
+
+@register('bulk_assign_tasks', BulkAssignSerializer)
+def bulk_assign_tasks(job):
+    return run_assignments(job, assignments.assign)
+
+
+@register('bulk_unassign_tasks', BulkAssignSerializer)
+def bulk_unassign_tasks(job):
+    return run_assignments(job, assignments.unassign)
+
+
+@register('reassign_tasks', ReassignTasksSerializer)
+def reassign_tasks(job):
+    """Move every task of one user to another; a retry picks up the tasks not moved yet."""
+    from_user_id, to_user_id = job.payload['from_user_id'], job.payload['to_user_id']
+    if not User.objects.filter(id=to_user_id).exists():
+        raise PermanentJobError(f'User {to_user_id} not found')
+    remaining = Task.objects.filter(assigned_users=from_user_id).order_by('id').values_list('id', flat=True)
+    total = job.progress_total or (job.progress_done + remaining.count())
+    result = job.result or {'reassigned': 0}
+    while True:
+        with transaction.atomic():
+            task_ids = list(remaining[:settings.JOB_CHUNK_SIZE])
+            if not task_ids:
+                return result
+            assignments.assign({(task_id, to_user_id) for task_id in task_ids})
+            assignments.unassign({(task_id, from_user_id) for task_id in task_ids})
+            result['reassigned'] += len(task_ids)
+            progress(job, job.progress_done + len(task_ids), total, result)
+
+
+@register('rebuild_task_stats')
+def rebuild_task_stats(job):
+    # Each rebuild commits on its own, then reports; a retry skips the counters if they were rebuilt
+    if job.progress_done < 1:
+        counters.rebuild()
+        progress(job, 1, 2)
+    summaries.rebuild()
+    progress(job, 2, 2)
+    return counters.get_stats()
+
+
+@register('rebuild_search_index', heartbeat=False)
+def rebuild_search_index(job):
+    search.rebuild()
+    return {}
@@ -0,0 +1,73 @@
+import json
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from tasks import benchmarking
+from tasks.models import Task, User
+
+
+# endpoint: (sync url name, async url name, kwargs lookup)
+ENDPOINTS = {
+    'tasks': ('all_tasks', 'async_all_tasks', None),
+    'task': ('task_detail', 'async_task_detail', 'task_id'),
+    'filter': ('filter_tasks', 'async_filter_tasks', None),
+    'stats': ('task_stats', 'async_task_stats', None),
+    'users': ('all_users', 'async_all_users', None),
+    'user': ('user_detail', 'async_user_detail', 'user_id'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/sec and latency of the read APIs under WSGI (sync views on a thread pool) '
+        'and ASGI (sync and async views), in process, against the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint', action='append', choices=sorted(ENDPOINTS),
+            help='Endpoint to benchmark, can be repeated (default: all).'
+        )
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and mode.')
+        parser.add_argument('--concurrency', type=int, default=500, help='Requests kept in flight.')
+        parser.add_argument('--threads', type=int, default=32, help='WSGI worker threads.')
+        parser.add_argument('--query', default='', help='Query string added to every request, e.g. page_size=100.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['threads'] < 1:
+            raise CommandError('--requests, --concurrency and --threads must be positive.')
+        ids = {
+            'task_id': Task.objects.values_list('id', flat=True).first(),
+            'user_id': User.objects.values_list('id', flat=True).first(),
+        }
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+        query = '?' + options['query'] if options['query'] else ''
+        results = {}
+
+        for endpoint in options['endpoint'] or list(ENDPOINTS):
+            sync_name, async_name, lookup = ENDPOINTS[endpoint]
+            if lookup and ids[lookup] is None:
+                raise CommandError(f'The {endpoint} endpoint needs at least one row in the database.')
+            kwargs = {lookup: ids[lookup]} if lookup else {}
+            sync_urls = [reverse(sync_name, kwargs=kwargs) + query] * options['requests']
+            async_urls = [reverse(async_name, kwargs=kwargs) + query] * options['requests']
+
+            results[endpoint] = {
+                'wsgi': benchmarking.run_wsgi(wsgi, sync_urls, options['concurrency'], options['threads']),
+                'asgi_sync_views': benchmarking.run_asgi(asgi, sync_urls, options['concurrency']),
+                'asgi': benchmarking.run_asgi(asgi, async_urls, options['concurrency']),
+            }
+            for mode, summary in results[endpoint].items():
+                self.stdout.write(
+                    f"{endpoint:<8} {mode:<16} {summary['requests_per_second']:>9} req/s  "
+                    f"p50 {summary['p50_ms']} ms  p99 {summary['p99_ms']} ms  errors {summary['errors']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
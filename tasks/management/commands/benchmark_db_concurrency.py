@@ -0,0 +1,139 @@
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from tasks import benchmarking
+from tasks.models import Task
+
+
+# Journal modes compared, with the pragmas that go with them
+MODES = {
+    'delete': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'wal': {},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent readers against a constant stream of writers on scratch SQLite databases, '
+        'once with the rollback journal and once with the configured WAL settings, and compare read latency '
+        'and stalls.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes.')
+        parser.add_argument('--writers', type=int, default=1, help='Writer processes.')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run.')
+        parser.add_argument('--tasks', type=int, default=5000, help='Tasks in the scratch databases.')
+        parser.add_argument(
+            '--batch', type=int, default=20000,
+            help='Tasks inserted per write transaction. Large ones spill out of the page cache before they commit.'
+        )
+        parser.add_argument('--stall-ms', type=float, default=100, help='Reads slower than this count as stalled.')
+        parser.add_argument(
+            '--mode', action='append', choices=sorted(MODES), help='Journal mode to run, can be repeated (default: all).'
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in options['mode'] or list(MODES):
+                pragmas = {**settings.SQLITE_PRAGMAS, **MODES[mode]}
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    alias = self.create_database(Path(directory) / f'{mode}.sqlite3', options['tasks'])
+                    try:
+                        result = self.run(alias, options)
+                    finally:
+                        connections[alias].close()
+                        del connections.databases[alias]
+                self.stdout.write(
+                    f"{mode:<7} reads {result['reads']['requests_per_second']:>8}/s  "
+                    f"p50 {result['reads']['p50_ms']} ms  p99 {result['reads']['p99_ms']} ms  "
+                    f"max {result['max_read_ms']} ms  stalled {result['stalled_reads']}  "
+                    f"read errors {result['reads']['errors']}  "
+                    f"writes {result['writes_per_second']}/s  write errors {result['write_errors']}"
+                )
+
+    def create_database(self, path, count):
+        alias = f'benchmark_{path.stem}'
+        database = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(path),
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        }
+        connections.databases[alias] = connections.configure_settings({'default': database})['default']
+        call_command('migrate', database=alias, verbosity=0)
+        Task.objects.using(alias).bulk_create(
+            Task(title=f'Task {i}', description='Concurrency benchmark') for i in range(count)
+        )
+        return alias
+
+    def run(self, alias, options):
+        # Readers and writers run in separate processes, like the workers of
+        # an application server, so that they only contend on the database.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop, results = context.Event(), context.Queue()
+        workers = [
+            context.Process(target=write, args=(alias, number, options, stop, results))
+            for number in range(options['writers'])
+        ]
+        workers += [context.Process(target=read, args=(alias, stop, results)) for _ in range(options['readers'])]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        outcomes = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - start
+        for worker in workers:
+            worker.join()
+
+        read_latencies = [latency for kind, latencies, _ in outcomes if kind == 'read' for latency in latencies]
+        read_errors = sum(errors for kind, _, errors in outcomes if kind == 'read')
+        return {
+            'reads': benchmarking.summarize(read_latencies, elapsed, read_errors),
+            'max_read_ms': round(max(read_latencies, default=0) * 1000, 2),
+            'stalled_reads': sum(latency * 1000 > options['stall_ms'] for latency in read_latencies),
+            'writes_per_second': round(sum(len(done) for kind, done, _ in outcomes if kind == 'write') / elapsed, 1),
+            'write_errors': sum(errors for kind, _, errors in outcomes if kind == 'write'),
+        }
+
+
+# Signals are bypassed (bulk_create, update), so nothing outside the scratch
+# database is touched.
+def write(alias, number, options, stop, results):
+    done, errors = [], 0
+    task_ids = list(Task.objects.using(alias).values_list('id', flat=True)[:1000])
+    while not stop.is_set():
+        try:
+            with transaction.atomic(using=alias):
+                Task.objects.using(alias).bulk_create(
+                    Task(title=f'Writer {number} task {len(done)}-{j}', description='Written')
+                    for j in range(options['batch'])
+                )
+                Task.objects.using(alias).filter(id=task_ids[len(done) % len(task_ids)]).update(status='in_progress')
+            done.append(True)
+        except OperationalError:
+            errors += 1
+    connections[alias].close()
+    results.put(('write', done, errors))
+
+
+def read(alias, stop, results):
+    latencies, errors = [], 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            list(Task.objects.using(alias).order_by('created_at', 'id')[:50])
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors += 1
+    connections[alias].close()
+    results.put(('read', latencies, errors))
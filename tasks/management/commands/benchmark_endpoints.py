@@ -0,0 +1,377 @@
+import json
+import platform
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connection, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from tasks import benchmarking, datagen, jobs
+
+
+STATUSES = ['pending', 'in_progress', 'completed']
+
+
+# Requests of every endpoint in tasks/urls.py, by url name: func(ids, i)
+# returns the method, url kwargs, query string and JSON body of the i-th
+# request. Reads, updates and bulk deletes use the first half of the generated
+# rows, deletes the second half, from the end. Writes come after the reads,
+# deletes last.
+ENDPOINTS = {
+    'all_tasks': lambda ids, i: ('GET', {}, 'page_size=50', None),
+    'task_detail': lambda ids, i: ('GET', {'task_id': ids.task(i)}, '', None),
+    'task_users': lambda ids, i: ('GET', {'task_id': ids.task(i)}, '', None),
+    'filter_tasks': lambda ids, i: ('GET', {}, f'status={STATUSES[i % 3]}&task_type=bug&page_size=50', None),
+    'task_stats': lambda ids, i: ('GET', {}, '', None),
+    'task_timeseries': lambda ids, i: ('GET', {}, 'bucket=week', None),
+    'task_changes': lambda ids, i: ('GET', {}, 'since=0&page_size=50', None),
+    'export_tasks': lambda ids, i: ('GET', {}, 'output=ndjson', None),
+    'all_users': lambda ids, i: ('GET', {}, 'page_size=50', None),
+    'user_detail': lambda ids, i: ('GET', {'user_id': ids.user(i)}, '', None),
+    'user_tasks': lambda ids, i: ('GET', {'user_id': ids.user(i)}, 'page_size=50', None),
+    'user_summary': lambda ids, i: ('GET', {}, 'user_ids=' + ','.join(str(ids.user(i + j)) for j in range(100)), None),
+    'export_users': lambda ids, i: ('GET', {}, 'output=ndjson', None),
+    'cache_stats': lambda ids, i: ('GET', {}, '', None),
+    'job_detail': lambda ids, i: ('GET', {'job_id': ids.job(i)}, '', None),
+    'async_all_tasks': lambda ids, i: ('GET', {}, 'page_size=50', None),
+    'async_task_detail': lambda ids, i: ('GET', {'task_id': ids.task(i)}, '', None),
+    'async_filter_tasks': lambda ids, i: ('GET', {}, f'status={STATUSES[i % 3]}&task_type=bug&page_size=50', None),
+    'async_task_stats': lambda ids, i: ('GET', {}, '', None),
+    'async_all_users': lambda ids, i: ('GET', {}, 'page_size=50', None),
+    'async_user_detail': lambda ids, i: ('GET', {'user_id': ids.user(i)}, '', None),
+    # Replays without waiting for live events
+    'events_poll': lambda ids, i: ('GET', {}, 'since=0&timeout=0', None),
+    'events_stream': lambda ids, i: ('GET', {}, 'since=0&timeout=0', None),
+    'create_task': lambda ids, i: ('POST', {}, '', {
+        'title': f'Benchmark task {i}', 'description': 'Created by benchmark_endpoints', 'task_type': 'bug'
+    }),
+    'update_task': lambda ids, i: ('PATCH', {'task_id': ids.task(i)}, '', {'status': STATUSES[i % 3]}),
+    'bulk_create_tasks': lambda ids, i: ('POST', {}, '', [
+        {'title': f'Benchmark task {i}-{j}', 'description': 'Created by benchmark_endpoints', 'task_type': 'task'}
+        for j in range(10)
+    ]),
+    'bulk_update_tasks': lambda ids, i: ('PATCH', {}, '', [
+        {'id': ids.task(i * 10 + j), 'status': STATUSES[(i + j) % 3]} for j in range(10)
+    ]),
+    'assign_task': lambda ids, i: ('POST', {}, '', {'task_id': ids.task(i), 'user_ids': [ids.user(i), ids.user(i + 1)]}),
+    'assign_user': lambda ids, i: ('POST', {}, '', {'user_id': ids.user(i), 'task_ids': [ids.task(i + j) for j in range(3)]}),
+    'bulk_assign_tasks': lambda ids, i: ('POST', {}, '', {
+        'task_ids': [ids.task(i * 5 + j) for j in range(5)], 'user_ids': [ids.user(i), ids.user(i + 1)]
+    }),
+    'bulk_unassign_tasks': lambda ids, i: ('POST', {}, '', {
+        'task_ids': [ids.task(i * 5 + j) for j in range(5)], 'user_ids': [ids.user(i), ids.user(i + 1)]
+    }),
+    'create_user': lambda ids, i: ('POST', {}, '', {
+        'name': f'Benchmark User {i}', 'email': f'benchmark-endpoints-{i}@example.com', 'mobile': '1234567890',
+        'password': 'password'
+    }),
+    'update_user': lambda ids, i: ('PUT', {'user_id': ids.user(i)}, '', {'name': f'Benchmark User {i}'}),
+    'create_job': lambda ids, i: ('POST', {}, '', {'kind': 'noop'}),
+    # Restores bring back what the bulk deletes before them deleted
+    'bulk_delete_tasks': lambda ids, i: ('POST', {}, '', {'ids': [ids.tasks[i * 5 + j] for j in range(5)]}),
+    'bulk_restore_tasks': lambda ids, i: ('POST', {}, '', {'ids': [ids.tasks[i * 5 + j] for j in range(5)]}),
+    'bulk_delete_users': lambda ids, i: ('POST', {}, '', {'ids': [ids.users[i * 5 + j] for j in range(5)]}),
+    'bulk_restore_users': lambda ids, i: ('POST', {}, '', {'ids': [ids.users[i * 5 + j] for j in range(5)]}),
+    'delete_task': lambda ids, i: ('DELETE', {'task_id': ids.deletable_task(i)}, '', None),
+    'delete_user': lambda ids, i: ('DELETE', {'user_id': ids.deletable_user(i)}, '', None),
+}
+
+# More requests of the endpoints above, by name: (url name, func(ids, i)).
+# Searches look for a verb of the generated titles, found in about a tenth of
+# the tasks.
+VARIANTS = {
+    'filter_tasks_search': ('filter_tasks', lambda ids, i: ('GET', {}, f'search={search_term(i)}&page_size=50', None)),
+    'async_filter_tasks_search': (
+        'async_filter_tasks', lambda ids, i: ('GET', {}, f'search={search_term(i)}&page_size=50', None)
+    ),
+}
+# Endpoints and variants also run as '<name>_revalidated': every request sends
+# If-None-Match with the ETag of an earlier response, so only the conditional
+# GET validator runs and the answer is a 304.
+REVALIDATED = {'all_tasks', 'task_detail', 'filter_tasks', 'filter_tasks_search', 'all_users', 'user_tasks'}
+
+
+def search_term(i):
+    return datagen.VERBS[i % len(datagen.VERBS)].lower()
+
+
+def get_benchmarks():
+    """Return every benchmark by name, in run order: (url name, func(ids, i), revalidated)."""
+    benchmarks = {}
+    for url_name, func in ENDPOINTS.items():
+        variants = {url_name: func, **{name: v for name, (of, v) in VARIANTS.items() if of == url_name}}
+        for name, variant in variants.items():
+            benchmarks[name] = (url_name, variant, False)
+            if name in REVALIDATED:
+                benchmarks[f'{name}_revalidated'] = (url_name, variant, True)
+    return benchmarks
+
+
+BENCHMARKS = get_benchmarks()
+
+# Endpoints that read every row, run --export-requests times
+EXPORTS = {'export_tasks', 'export_users'}
+# Endpoints that use up rows: (kind, rows per request). They make at most as
+# many requests as half the rows allow.
+CONSUMERS = {
+    'delete_task': ('tasks', 1),
+    'delete_user': ('users', 1),
+    'bulk_delete_tasks': ('tasks', 5),
+    'bulk_restore_tasks': ('tasks', 5),
+    'bulk_delete_users': ('users', 5),
+    'bulk_restore_users': ('users', 5),
+}
+
+
+class Ids:
+    def __init__(self, generated):
+        self.tasks = generated['tasks']
+        self.users = generated['users']
+        self.jobs = generated['jobs']
+
+    def task(self, i):
+        return self.tasks[i % (len(self.tasks) // 2)]
+
+    def user(self, i):
+        return self.users[i % (len(self.users) // 2)]
+
+    def job(self, i):
+        return self.jobs[i % len(self.jobs)]
+
+    def deletable_task(self, i):
+        return self.tasks[-1 - i]
+
+    def deletable_user(self, i):
+        return self.users[-1 - i]
+
+
+# Counts queries (CaptureQueriesContext would lose them: every request resets
+# the query log)
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate datasets of several sizes and measure requests/sec, p50/p95/p99 latency and query counts of '
+        'every API endpoint, in process. Results can be written to JSON and compared with an earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000',
+            help='Comma separated task counts of the datasets to run against.'
+        )
+        parser.add_argument('--users-per-task', type=float, default=0.1, help='Users generated per task.')
+        parser.add_argument('--assignments', type=float, default=2, help='Mean assigned users per task.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the generated data.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--export-requests', type=int, default=5, help='Requests per export endpoint.')
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Requests kept in flight, on as many WSGI threads. 1 runs them one by one.'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', choices=sorted(BENCHMARKS),
+            help='Endpoint, variant or revalidation to benchmark, can be repeated (default: all).'
+        )
+        parser.add_argument(
+            '--in-place', action='store_true',
+            help='Use the configured database, in a transaction that is rolled back afterwards, instead of a '
+                 'scratch database per size. Needs --concurrency 1.'
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='Compare with the results in this JSON file.')
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help='With --compare, p50 latency increase (percent) reported as a regression.'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='With --compare, exit with an error if any endpoint regressed.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of task counts.')
+        if min(sizes) < 1 or options['requests'] < 1 or options['export_requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--sizes, --requests, --export-requests and --concurrency must be positive.')
+        if options['in_place'] and options['concurrency'] > 1:
+            raise CommandError('--in-place runs in a transaction that other threads cannot see, use --concurrency 1.')
+        endpoints = [name for name in BENCHMARKS if name in (options['endpoint'] or BENCHMARKS)]
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        results = {'environment': environment(), 'options': options_summary(options), 'sizes': {}}
+        # A private response cache, and no read replicas: everything runs on the benchmark data
+        response_cache = {'BACKEND': 'tasks.cache.LRUCache', 'OPTIONS': {'MAX_ENTRIES': 10000}}
+        with override_settings(
+            CACHES={**settings.CACHES, settings.RESPONSE_CACHE_ALIAS: response_cache}, DATABASE_ROUTERS=[]
+        ):
+            for size in sizes:
+                self.stdout.write(f'{size} tasks')
+                if options['in_place']:
+                    with transaction.atomic(), keep_connections():
+                        results['sizes'][str(size)] = self.run(size, endpoints, options)
+                        transaction.set_rollback(True)
+                else:
+                    with scratch_database():
+                        results['sizes'][str(size)] = self.run(size, endpoints, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+        if baseline is not None:
+            regressions = self.compare(baseline, results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} endpoint(s) regressed.')
+
+    def run(self, size, endpoints, options):
+        generated = datagen.generate(
+            users=max(20, round(size * options['users_per_task'])),
+            tasks=size,
+            assignments=options['assignments'],
+            seed=options['seed'],
+        )
+        # Queued, never run: job_detail reads them
+        generated['jobs'] = [jobs.enqueue('noop').id for _ in range(10)]
+        ids = Ids(generated)
+        application = get_wsgi_application()
+        results = {}
+        for name in endpoints:
+            count = options['export_requests'] if name in EXPORTS else options['requests']
+            if name in CONSUMERS:
+                kind, rows = CONSUMERS[name]
+                count = min(count, len(generated[kind]) // 2 // rows - 1)
+                if count < 1:
+                    raise CommandError(f'{name} needs more {kind} than {size} tasks give.')
+            url_name, func, revalidated = BENCHMARKS[name]
+            requests = []
+            for i in range(count + 1):
+                method, kwargs, query, data = func(ids, i)
+                requests.append((reverse(url_name, kwargs=kwargs) + ('?' + query if query else ''), method, data))
+            if revalidated:
+                requests = [
+                    (url, method, data, {'If-None-Match': etag})
+                    for (url, method, data), etag in zip(requests, self.etags(application, requests))
+                ]
+
+            # The first request warms up, and its queries are counted
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                status = benchmarking.call_wsgi(application, *requests[0])
+            if status >= 400:
+                raise CommandError(f'{name} answered {status} to {requests[0][1]} {requests[0][0]}.')
+            if revalidated and status != 304:
+                raise CommandError(f'{name} answered {status}, not 304, to a revalidation of {requests[0][0]}.')
+            if options['concurrency'] == 1:
+                summary = benchmarking.run_serial(application, requests[1:])
+            else:
+                summary = benchmarking.run_wsgi(application, requests[1:], options['concurrency'], options['concurrency'])
+            results[name] = {'method': requests[0][1], 'queries': queries.count, **summary}
+            self.stdout.write(
+                f"  {name:<32} {summary['requests_per_second']:>9} req/s  p50 {summary['p50_ms']} ms  "
+                f"p95 {summary['p95_ms']} ms  p99 {summary['p99_ms']} ms  queries {results[name]['queries']}  "
+                f"errors {summary['errors']}"
+            )
+        return results
+
+    def etags(self, application, requests):
+        """Return the ETag of a first GET of every request, fetched once per url."""
+        etags = {}
+        for url, method, data in requests:
+            if url not in etags:
+                status, headers = benchmarking.request_wsgi(application, url)
+                if 'ETag' not in headers:
+                    raise CommandError(f'{url} answered {status} without an ETag to revalidate.')
+                etags[url] = headers['ETag']
+        return [etags[url] for url, method, data in requests]
+
+    def compare(self, baseline, results, threshold):
+        """Print the changes from baseline, and return the number of regressions."""
+        regressions = 0
+        self.stdout.write('Changes from the baseline:')
+        for size, endpoints in results['sizes'].items():
+            for name, result in endpoints.items():
+                before = baseline.get('sizes', {}).get(size, {}).get(name)
+                if before is None or not before.get('p50_ms') or result['p50_ms'] is None:
+                    continue
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                regressed = change > threshold or result['queries'] > before['queries']
+                regressions += regressed
+                line = (
+                    f"  {size:>7} {name:<32} p50 {before['p50_ms']} -> {result['p50_ms']} ms ({change:+.0f}%)  "
+                    f"queries {before['queries']} -> {result['queries']}"
+                )
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION') if regressed else line)
+        return regressions
+
+
+class scratch_database:
+    """Context manager running on a new, migrated SQLite database file in place of default."""
+
+    def __enter__(self):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Scratch databases need SQLite, use --in-place with other databases.')
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_name = connection.settings_dict['NAME']
+        self.old_test = connection.settings_dict.get('TEST', {})
+        connection.settings_dict['TEST'] = {**self.old_test, 'NAME': str(Path(self.directory.name) / 'benchmark.sqlite3')}
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+    def __exit__(self, *exc_info):
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
+        connection.settings_dict['TEST'] = self.old_test
+        self.directory.cleanup()
+
+
+@contextmanager
+def keep_connections():
+    """Stop requests from closing the connection, and with it the open transaction (like the test client)."""
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': f'{connection.vendor} {connection.Database.sqlite_version}'
+        if connection.vendor == 'sqlite' else connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def options_summary(options):
+    names = ['sizes', 'users_per_task', 'assignments', 'seed', 'requests', 'export_requests', 'concurrency', 'in_place']
+    return {name: options[name] for name in names}
@@ -0,0 +1,96 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import benchmarking, jobs
+from tasks.management.commands.benchmark_endpoints import environment, scratch_database
+from tasks.management.commands.run_worker import run_processes, run_threads
+from tasks.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the throughput of the background job queue on a scratch SQLite database: jobs/sec enqueued, '
+        'and jobs/sec run by worker pools of several sizes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=1000, help='Jobs queued and run per pool size.')
+        parser.add_argument('--concurrency', default='1,2,4', help='Comma separated worker pool sizes.')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread', help='Worker pool type.')
+        parser.add_argument(
+            '--kind', choices=['noop', 'bulk_create_tasks'], default='noop',
+            help='noop measures the queue itself; bulk_create_tasks jobs write --items tasks each.'
+        )
+        parser.add_argument(
+            '--job-seconds', type=float, default=0, help='Seconds each noop job sleeps, to mimic I/O bound jobs.'
+        )
+        parser.add_argument('--items', type=int, default=10, help='Tasks created per bulk_create_tasks job.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            pool_sizes = [int(size) for size in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma separated list of pool sizes.')
+        if options['jobs'] < 1 or options['items'] < 1 or min(pool_sizes) < 1 or options['job_seconds'] < 0:
+            raise CommandError('--jobs, --items and --concurrency must be positive, --job-seconds not negative.')
+        if options['kind'] == 'noop':
+            payload = {'seconds': options['job_seconds']}
+        else:
+            payload = {'items': [
+                {'title': f'Benchmark job task {i}', 'description': 'Created by benchmark_jobs', 'task_type': 'task'}
+                for i in range(options['items'])
+            ]}
+
+        results = {'environment': environment(), 'options': options_summary(options), 'pools': {}}
+        with scratch_database():
+            for size in pool_sizes:
+                results['pools'][str(size)] = result = self.run(size, options, payload)
+                self.stdout.write(
+                    f"  {options['pool']} x {size:<3} enqueue {result['enqueued_per_second']:>9} jobs/s  "
+                    f"run {result['jobs_per_second']:>9} jobs/s  p50 {result['p50_ms']} ms  "
+                    f"p95 {result['p95_ms']} ms  failed {result['failed']}"
+                )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def run(self, size, options, payload):
+        Job.objects.all().delete()
+        start = time.perf_counter()
+        for _ in range(options['jobs']):
+            jobs.enqueue(options['kind'], payload)
+        enqueue_seconds = time.perf_counter() - start
+
+        work_options = {'kinds': None, 'burst': True, 'max_jobs': None, 'poll_interval': 1.0}
+        start = time.perf_counter()
+        if options['pool'] == 'thread':
+            run_threads(size, work_options)
+        else:
+            run_processes(size, work_options)
+        run_seconds = time.perf_counter() - start
+
+        # Time each job took, from its claim to its result
+        durations = [
+            (finished - started).total_seconds() * 1000
+            for started, finished in Job.objects.filter(status=jobs.SUCCEEDED).values_list('started_at', 'finished_at')
+        ]
+        return {
+            'jobs': options['jobs'],
+            'succeeded': len(durations),
+            'failed': options['jobs'] - len(durations),
+            'enqueue_seconds': round(enqueue_seconds, 3),
+            'enqueued_per_second': round(options['jobs'] / enqueue_seconds, 1),
+            'run_seconds': round(run_seconds, 3),
+            'jobs_per_second': round(len(durations) / run_seconds, 1),
+            'p50_ms': round(benchmarking.percentile(durations, 50), 2) if durations else None,
+            'p95_ms': round(benchmarking.percentile(durations, 95), 2) if durations else None,
+        }
+
+
+def options_summary(options):
+    names = ['jobs', 'concurrency', 'pool', 'kind', 'job_seconds', 'items']
+    return {name: options[name] for name in names}
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from tasks import benchmarking, bulk
+from tasks.fast_serializers import get_values_serializer
+from tasks.models import Task, User
+from tasks.renderers import FastJSONRenderer
+from tasks.serializers import TaskDetailSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare serializing and rendering tasks with TaskDetailSerializer against the values() fast path, '
+        'and check that both produce the same bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', type=int, default=10000,
+            help='Create this many tasks for the run, in a transaction that is rolled back afterwards.'
+        )
+        parser.add_argument('--users-per-task', type=int, default=2, help='Assigned users of each created task.')
+        parser.add_argument('--existing', action='store_true', help='Benchmark the tasks already in the database instead.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path, the fastest one is reported.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not options['existing']:
+                self.create_tasks(options['tasks'], options['users_per_task'])
+            self.run(options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_tasks(self, count, users_per_task):
+        users = User.objects.bulk_create(
+            User(name=f'Benchmark User {i}', email=f'benchmark{i}@example.com', mobile='1234567890')
+            for i in range(max(users_per_task, 1) * 10)
+        )
+        tasks, errors = bulk.create_tasks([
+            {'title': f'Benchmark task {i}', 'description': 'Serializer benchmark', 'task_type': 'task'}
+            for i in range(count)
+        ])
+        if errors:
+            raise CommandError(f'Could not create benchmark tasks: {errors[0]}')
+        Assignment = Task.assigned_users.through
+        Assignment.objects.bulk_create(
+            Assignment(task_id=task.id, user_id=users[(i + j) % len(users)].id)
+            for i, task in enumerate(tasks)
+            for j in range(users_per_task)
+        )
+
+    def run(self, repeat):
+        queryset = Task.objects.order_by('created_at', 'id')
+        values_serializer = get_values_serializer(TaskDetailSerializer)
+
+        def drf():
+            tasks = TaskDetailSerializer.setup_eager_loading(queryset)
+            return JSONRenderer().render(TaskDetailSerializer(tasks, many=True).data)
+
+        def fast():
+            return FastJSONRenderer().render(values_serializer.serialize(list(values_serializer.values(queryset))))
+
+        drf_seconds, drf_content = benchmarking.best_time(drf, repeat)
+        fast_seconds, fast_content = benchmarking.best_time(fast, repeat)
+        if drf_content != fast_content:
+            raise CommandError('The fast path output differs from TaskDetailSerializer.')
+
+        count = queryset.count()
+        self.stdout.write(f'{count} tasks, {len(drf_content)} bytes')
+        self.stdout.write(f'TaskDetailSerializer: {drf_seconds * 1000:.1f} ms')
+        self.stdout.write(f'values() fast path:   {fast_seconds * 1000:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Identical output, {drf_seconds / fast_seconds:.1f}x faster.'))
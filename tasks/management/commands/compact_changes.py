@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks import changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Compact the task change log: drop entries older than --days that a later change of the same task '
+        'supersedes, and all entries older than --expire-days. Clients with older tokens must resync in full.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=float, default=1, help='Compact superseded entries older than this many days.'
+        )
+        parser.add_argument(
+            '--expire-days', type=float, default=30, help='Delete all entries older than this many days.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=changes.COMPACT_BATCH_SIZE, help='Entries deleted per transaction.'
+        )
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['expire_days'] < 0 or options['batch_size'] < 1 or options['pause'] < 0:
+            raise CommandError('--days, --expire-days and --pause must not be negative, and --batch-size must be positive.')
+        now = timezone.now()
+        expired = changes.expire(now - timedelta(days=options['expire_days']), options['batch_size'], options['pause'])
+        compacted = changes.compact(now - timedelta(days=options['days']), options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} and compacted {compacted} change log entries.'))
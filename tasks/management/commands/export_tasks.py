@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import dumps
+
+
+class Command(BaseCommand):
+    help = (
+        'Dump tasks, users (without password hashes) and assignments into a directory, one NDJSON or CSV file '
+        'per table, optionally gzipped. Rows are read in primary key order a chunk at a time; an interrupted dump '
+        'continues from its last checkpoint with --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory to write the files (and the checkpoint) to.')
+        parser.add_argument('--format', choices=dumps.FORMATS, default='ndjson', help='File format.')
+        parser.add_argument('--gzip', action='store_true', help='Compress the files with gzip.')
+        parser.add_argument(
+            '--table', action='append', choices=list(dumps.TABLES),
+            help='Dump only these, can be repeated (default: all).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=dumps.DUMP_CHUNK_SIZE, help='Rows per query and checkpoint.'
+        )
+        parser.add_argument('--resume', action='store_true', help='Continue the unfinished dump in the directory.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        directory = options['directory']
+        checkpoint = dumps.load_checkpoint(directory)
+        if checkpoint is None or not options['resume']:
+            if checkpoint is not None:
+                raise CommandError(f'{directory} holds an unfinished dump, pass --resume to continue it.')
+            tables = [table for table in dumps.TABLES if table in (options['table'] or dumps.TABLES)]
+            checkpoint = dumps.new_checkpoint(tables, options['format'], options['gzip'])
+        elif (checkpoint['format'], checkpoint['gzip']) != (options['format'], options['gzip']):
+            raise CommandError('--format and --gzip must be those of the dump being resumed.')
+
+        started = time.perf_counter()
+        resumed_rows = {table: state['rows'] for table, state in checkpoint['tables'].items()}
+
+        def on_chunk(table, state):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"{table}: {state['rows']} rows")
+
+        try:
+            dumps.dump(directory, checkpoint, options['chunk_size'], on_chunk)
+        except OSError as exc:
+            raise CommandError(f'Dump failed: {exc}')
+
+        seconds = time.perf_counter() - started
+        for table, state in checkpoint['tables'].items():
+            name = dumps.file_name(table, checkpoint['format'], checkpoint['gzip'])
+            self.stdout.write(f"{table}: {state['rows']} rows in {name}")
+        written = sum(state['rows'] - resumed_rows[table] for table, state in checkpoint['tables'].items())
+        rate = written / seconds if seconds else 0
+        self.stdout.write(self.style.SUCCESS(f'Dumped {written} rows in {seconds:.1f}s ({rate:.0f} rows/s).'))
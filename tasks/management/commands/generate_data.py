@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import datagen
+
+
+class Command(BaseCommand):
+    help = 'Add a synthetic dataset of users, tasks and assignments to the database, with bulk inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to create.')
+        parser.add_argument('--tasks', type=int, default=10000, help='Tasks to create.')
+        parser.add_argument('--assignments', type=float, default=2, help='Mean assigned users per task.')
+        parser.add_argument(
+            '--distribution', choices=datagen.DISTRIBUTIONS, default='poisson',
+            help='Distribution of the assigned users per task.'
+        )
+        parser.add_argument(
+            '--user-skew', type=float, default=1.0,
+            help='Zipf exponent of how assignments spread over users, 0 for uniform.'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 0 or options['tasks'] < 0 or options['assignments'] < 0 or options['batch_size'] < 1:
+            raise CommandError('Counts must not be negative, and --batch-size must be positive.')
+        result = datagen.generate(
+            users=options['users'],
+            tasks=options['tasks'],
+            assignments=options['assignments'],
+            distribution=options['distribution'],
+            user_skew=options['user_skew'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(result['users'])} users, {len(result['tasks'])} tasks "
+            f"and {result['assignments']} assignments."
+        ))
@@ -0,0 +1,65 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import imports
+
+
+class Command(BaseCommand):
+    help = (
+        'Import tasks from a CSV or JSONL file (optionally gzipped), with columns title, description, task_type, '
+        'status and assignees (user emails). Rows are validated like the create API and written with bulk inserts, '
+        'one transaction per --batch-size rows; rejected rows are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import; .csv, .jsonl or .ndjson, with an optional .gz suffix.')
+        parser.add_argument('--format', choices=imports.FORMATS, help='File format (default: from the file name).')
+        parser.add_argument(
+            '--batch-size', type=int, default=imports.IMPORT_BATCH_SIZE, help='Rows per chunk and transaction.'
+        )
+        parser.add_argument('--workers', type=int, default=1, help='Processes parsing and validating rows.')
+        parser.add_argument('--rejects', help='Write the rejected rows and their errors to this JSONL file.')
+        parser.add_argument(
+            '--max-errors', type=int, default=10, help='Rejected rows printed, when they are not written to --rejects.'
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or imports.detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name, pass --format.')
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive.')
+
+        rejects = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+        printed = 0
+
+        def on_error(error):
+            nonlocal printed
+            if rejects is not None:
+                rejects.write(json.dumps(error) + '\n')
+            elif printed < options['max_errors']:
+                self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+                printed += 1
+
+        def on_progress(totals):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"{totals['rows']} rows, {totals['rows'] / totals['seconds']:.0f} rows/s")
+
+        try:
+            with imports.open_text(options['path']) as file:
+                totals = imports.import_file(
+                    file, fmt, options['batch_size'], options['workers'], on_error=on_error, on_progress=on_progress
+                )
+        except (OSError, ValueError, csv.Error) as exc:
+            raise CommandError(f'Import failed: {exc}')
+        finally:
+            if rejects is not None:
+                rejects.close()
+
+        rate = totals['rows'] / totals['seconds'] if totals['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['imported']} of {totals['rows']} rows with {totals['assignments']} assignments "
+            f"in {totals['seconds']:.1f}s ({rate:.0f} rows/s), rejected {totals['rejected']}."
+        ))
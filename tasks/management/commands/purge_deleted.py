@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks import deletion
+from tasks.models import Task, User
+
+
+MODELS = {'tasks': Task, 'users': User}
+
+
+class Command(BaseCommand):
+    help = (
+        'Permanently delete tasks and users that were soft deleted more than --days ago, '
+        'in small transactions so that writers are never blocked for long.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=30, help='Keep tombstones younger than this many days.')
+        parser.add_argument(
+            '--batch-size', type=int, default=deletion.PURGE_BATCH_SIZE, help='Rows deleted per transaction.'
+        )
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument(
+            '--model', action='append', choices=sorted(MODELS), help='Purge only these, can be repeated (default: all).'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1 or options['pause'] < 0:
+            raise CommandError('--days and --pause must not be negative, and --batch-size must be positive.')
+        before = timezone.now() - timedelta(days=options['days'])
+        # Tasks first, so purged users' assignments are mostly gone already
+        for name in [name for name in MODELS if name in (options['model'] or MODELS)]:
+            purged = deletion.purge(MODELS[name], before, options['batch_size'], options['pause'])
+            self.stdout.write(self.style.SUCCESS(f'Purged {purged} {name}.'))
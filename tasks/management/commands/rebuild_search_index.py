@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tasks import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over task titles and descriptions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to rebuild the index on.')
+
+    def handle(self, *args, **options):
+        search.rebuild(using=options['database'])
+        self.stdout.write(self.style.SUCCESS('Task search index rebuilt.'))
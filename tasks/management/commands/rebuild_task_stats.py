@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import counters, summaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the task statistics counters and the user task summaries from the Task table, or verify them '
+        'with --verify.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the counters and summaries against the Task table and fail if they have drifted.'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            drift = counters.verify()
+            for (dimension, value), (stored, actual) in sorted(drift.items()):
+                self.stderr.write(f'{dimension}={value}: stored {stored}, actual {actual}')
+            summary_drift = summaries.verify()
+            for user_id, (stored, actual) in sorted(summary_drift.items()):
+                self.stderr.write(f'user {user_id}: stored {stored}, actual {actual}')
+            if drift or summary_drift:
+                raise CommandError(
+                    f'{len(drift)} task counter(s) and {len(summary_drift)} user summary(ies) out of date, '
+                    'run rebuild_task_stats to fix.'
+                )
+            self.stdout.write(self.style.SUCCESS('Task counters and user summaries are up to date.'))
+            return
+
+        counters.rebuild()
+        summaries.rebuild()
+        self.stdout.write(self.style.SUCCESS('Task counters and user summaries rebuilt.'))
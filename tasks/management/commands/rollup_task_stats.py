@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tasks import rollups
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily task rollups behind tasks/stats/timeseries/ from the Task table: the last --days days '
+        '(run it daily from cron), or from --since (or --all days) as a backfill. One transaction per day.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Recompute this many days, up to --until.')
+        parser.add_argument('--since', help='Recompute from this day (YYYY-MM-DD) instead.')
+        parser.add_argument('--until', help='Last day to recompute (YYYY-MM-DD, default: today).')
+        parser.add_argument('--all', action='store_true', help='Recompute from the day of the first task.')
+
+    def parse_day(self, value, name):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'{name} must be a date (YYYY-MM-DD).')
+        return day
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be positive.')
+        until = self.parse_day(options['until'], '--until') if options['until'] else rollups.day_of(timezone.now())
+        if options['all']:
+            first = Task.all_objects.aggregate(first=Min('created_at'))['first']
+            since = rollups.day_of(first) if first else until
+        elif options['since']:
+            since = self.parse_day(options['since'], '--since')
+        else:
+            since = until - timedelta(days=options['days'] - 1)
+        if since > until:
+            raise CommandError('--since must not be after --until.')
+
+        day, rows = since, 0
+        while day <= until:
+            rows += rollups.rebuild(day, day)
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {(until - since).days + 1} day(s) from {since} to {until} into {rows} row(s).'
+        ))
@@ -0,0 +1,123 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tasks import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background jobs from the database queue on a pool of worker threads or processes, until stopped '
+        '(SIGINT/SIGTERM let running jobs finish) or, with --burst, until no job is ready.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Jobs run at once.')
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help='Run jobs on threads of this process, or on forked processes (for CPU bound jobs).'
+        )
+        parser.add_argument('--burst', action='store_true', help='Exit as soon as no job is ready.')
+        parser.add_argument('--max-jobs', type=int, help='Exit after each worker has run this many jobs.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when no job is ready.')
+        parser.add_argument(
+            '--kind', action='append', choices=sorted(jobs.JOB_KINDS),
+            help='Run only jobs of this kind, can be repeated (default: all).'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['poll_interval'] <= 0 or (options['max_jobs'] or 1) < 1:
+            raise CommandError('--concurrency, --poll-interval and --max-jobs must be positive.')
+        work_options = {
+            'kinds': options['kind'], 'burst': options['burst'], 'max_jobs': options['max_jobs'],
+            'poll_interval': options['poll_interval'],
+        }
+        if options['concurrency'] == 1 and options['pool'] == 'thread':
+            # In this thread, on its connection (and inside the caller's transaction, as in tests)
+            stop = threading.Event()
+            with stop_on_signals(stop):
+                done = jobs.work(jobs.worker_name(), stop, **work_options)
+        elif options['pool'] == 'thread':
+            done = run_threads(options['concurrency'], work_options)
+        else:
+            done = run_processes(options['concurrency'], work_options)
+        self.stdout.write(self.style.SUCCESS(f'Ran {done} jobs.'))
+
+
+class stop_on_signals:
+    """Context manager setting stop on SIGINT and SIGTERM (in the main thread only)."""
+
+    def __init__(self, stop):
+        self.stop = stop
+        self.previous = {}
+
+    def __enter__(self):
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                self.previous[signum] = signal.signal(signum, lambda signum, frame: self.stop.set())
+
+    def __exit__(self, *exc_info):
+        for signum, handler in self.previous.items():
+            signal.signal(signum, handler)
+
+
+def run_threads(concurrency, work_options):
+    stop = threading.Event()
+    counts = [0] * concurrency
+
+    def target(index):
+        try:
+            counts[index] = jobs.work(jobs.worker_name(index), stop, **work_options)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=target, args=(index,), name=f'job-worker-{index}') for index in range(concurrency)]
+    with stop_on_signals(stop):
+        for thread in threads:
+            thread.start()
+        # Joined with a timeout, so that signals reach the main thread
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    return sum(counts)
+
+
+def run_process(index, work_options, counter):
+    stop = threading.Event()
+    with stop_on_signals(stop):
+        try:
+            done = jobs.work(jobs.worker_name(index), stop, **work_options)
+        finally:
+            connections.close_all()
+    with counter.get_lock():
+        counter.value += done
+
+
+def run_processes(concurrency, work_options):
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise CommandError('--pool process needs the fork start method, use --pool thread on this platform.')
+    # Children must open their own connections
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    counter = context.Value('i', 0)
+    processes = [
+        context.Process(target=run_process, args=(index, work_options, counter)) for index in range(concurrency)
+    ]
+    for process in processes:
+        process.start()
+    stop = threading.Event()
+    with stop_on_signals(stop):
+        while any(process.is_alive() for process in processes):
+            if stop.is_set():
+                # Children finish their current job
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+                break
+            stop.wait(0.5)
+        for process in processes:
+            process.join()
+    return counter.value
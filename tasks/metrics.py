@@ -0,0 +1,221 @@
+# Request instrumentation.
+#
+# InstrumentationMiddleware (tasks/middleware.py) opens a RequestStats for each
+# request. While it is open, every query on every database connection is timed
+# by record_query (installed on new connections, see tasks/signals.py), and
+# code can time its own phases with timer() (serializers and the JSON renderer
+# do). When the request ends its totals are added to in-process Prometheus
+# histograms, served as text by /metrics, and optionally returned in a
+# Server-Timing header.
+#
+# A query counts as a duplicate when the same SQL with the same parameters
+# already ran in the request. Queries run while a streaming response is being
+# consumed (exports) happen after the middleware returns and are not counted.
+#
+# Like the cache statistics, metrics are per process: scrape every worker, or
+# sum them in Prometheus.
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from . import cache
+
+
+logger = logging.getLogger(__name__)
+
+# RequestStats of the current request, or None outside a request
+_current = ContextVar('request_stats', default=None)
+_lock = threading.Lock()
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # Label values: [count per bucket, ..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0])
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, label_names):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, series in sorted(self.series.items()):
+            label_text = format_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                yield f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+            yield f'{self.name}_sum{{{label_text}}} {series[-1]:.6g}'
+            yield f'{self.name}_count{{{label_text}}} {cumulative}'
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.series = defaultdict(int)
+
+    def inc(self, labels, value=1):
+        self.series[labels] += value
+
+    def render(self, label_names):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self.series.items()):
+            yield f'{self.name}{{{format_labels(label_names, labels)}}} {value}'
+
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+VIEW_LABELS = ('view', 'method')
+requests_total = Counter('http_requests_total', 'Requests handled, by view, method and status.')
+request_seconds = Histogram('http_request_duration_seconds', 'Time spent handling requests.', TIME_BUCKETS)
+db_seconds = Histogram('http_request_db_duration_seconds', 'Time spent in database queries per request.', TIME_BUCKETS)
+queries = Histogram('http_request_queries', 'Database queries per request.', QUERY_BUCKETS)
+serialize_seconds = Histogram(
+    'http_request_serialize_duration_seconds', 'Time spent serializing and rendering responses.', TIME_BUCKETS
+)
+response_bytes = Histogram('http_response_size_bytes', 'Size of non-streaming response bodies.', SIZE_BUCKETS)
+duplicate_queries = Counter('http_request_duplicate_queries_total', 'Queries repeated with the same parameters.')
+budget_exceeded = Counter('http_request_query_budget_exceeded_total', 'Requests over their QUERY_BUDGETS entry.')
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.duplicates = 0
+        self.db_seconds = 0.0
+        self.timings = defaultdict(float)
+        self._seen = set()
+
+    def add_query(self, sql, params, many, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        if not many:
+            key = (sql, repr(params))
+            if key in self._seen:
+                self.duplicates += 1
+            else:
+                self._seen.add(key)
+
+    def server_timing(self, total):
+        parts = [f'total;dur={total * 1000:.1f}']
+        desc = f'{self.queries} queries' + (f', {self.duplicates} duplicate' if self.duplicates else '')
+        parts.append(f'db;dur={self.db_seconds * 1000:.1f};desc="{desc}"')
+        parts.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.timings.items())
+        return ', '.join(parts)
+
+
+def start_request():
+    """Start collecting stats for the current request, returns the token for finish_request."""
+    return _current.set(RequestStats())
+
+
+def finish_request(token, request, response):
+    """Record the stats of the current request, and check its query budget."""
+    stats = _current.get()
+    _current.reset(token)
+    total = time.perf_counter() - stats.start
+    match = request.resolver_match
+    view = (match.url_name or match.view_name) if match else 'unmatched'
+    labels = (view, request.method)
+    size = None if response.streaming else len(response.content)
+    with _lock:
+        requests_total.inc(labels + (str(response.status_code),))
+        request_seconds.observe(labels, total)
+        db_seconds.observe(labels, stats.db_seconds)
+        queries.observe(labels, stats.queries)
+        serialize_seconds.observe(labels, sum(stats.timings.values()))
+        if size is not None:
+            response_bytes.observe(labels, size)
+        if stats.duplicates:
+            duplicate_queries.inc(labels, stats.duplicates)
+    if settings.SERVER_TIMING:
+        response['Server-Timing'] = stats.server_timing(total)
+
+    budget = settings.QUERY_BUDGETS.get(view)
+    if budget is not None and stats.queries > budget:
+        with _lock:
+            budget_exceeded.inc(labels)
+        message = f'{request.method} {request.path} ({view}) ran {stats.queries} queries, its budget is {budget}'
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    return response
+
+
+def discard_request(token):
+    """Stop collecting stats for a request that raised."""
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing the queries of the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, params, many, time.perf_counter() - start)
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request's Server-Timing entry name."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.timings[name] += time.perf_counter() - start
+
+
+def render():
+    """Return all metrics in the Prometheus text format."""
+    lines = []
+    with _lock:
+        lines.extend(requests_total.render(VIEW_LABELS + ('status',)))
+        for metric in (request_seconds, db_seconds, queries, serialize_seconds, response_bytes,
+                       duplicate_queries, budget_exceeded):
+            lines.extend(metric.render(VIEW_LABELS))
+    for name, value in cache.get_stats().items():
+        metric = f'response_cache_{name}_total'
+        lines.extend([f'# HELP {metric} Response cache {name}.', f'# TYPE {metric} counter', f'{metric} {value}'])
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget all recorded metrics."""
+    with _lock:
+        for metric in (requests_total, request_seconds, db_seconds, queries, serialize_seconds, response_bytes,
+                       duplicate_queries, budget_exceeded):
+            metric.series.clear()
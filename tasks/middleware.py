@@ -0,0 +1,86 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+from .routers import get_router
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+# Routes the reads of each request with ReplicaRouter (see tasks/routers.py).
+# Write requests, and every request for REPLICA_PIN_SECONDS after a write
+# (tracked with a cookie), use the primary database.
+class ReplicaPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.router = get_router()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_pinned(self, request):
+        return request.method not in SAFE_METHODS or settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.router is None:
+            return self.get_response(request)
+        token = self.router.begin_request(self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            self.router.end_request(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        if self.router is None:
+            return await self.get_response(request)
+        token = self.router.begin_request(self.is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.router.end_request(token)
+        return self.pin(request, response)
+
+
+# Records the time, queries and response size of every request, see
+# tasks/metrics.py. First in MIDDLEWARE, so it times everything else too.
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            metrics.discard_request(token)
+            raise
+        return metrics.finish_request(token, request, response)
+
+    async def __acall__(self, request):
+        token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            metrics.discard_request(token)
+            raise
+        return metrics.finish_request(token, request, response)
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-18 04:46
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_counters(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskCounter = apps.get_model('tasks', 'TaskCounter')
+    db_alias = schema_editor.connection.alias
+    for name in ('status', 'task_type'):
+        rows = Task.objects.using(db_alias).values(name).annotate(count=Count('id')).values_list(name, 'count')
+        TaskCounter.objects.using(db_alias).bulk_create(
+            TaskCounter(dimension=name, value=value, count=count) for value, count in rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('status', 'Status'), ('task_type', 'Task Type')], max_length=20)),
+                ('value', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='unique_task_counter')],
+            },
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-18 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tasks', '0002_task_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_at', 'id'], name='task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'task_type', 'created_at'], name='task_status_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['task_type', 'created_at'], name='task_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at', 'id'], name='user_created_idx'),
+        ),
+        # Reverse direction of the assignment table, for UserTasksView. The
+        # table is auto-created by Task.assigned_users, so it has no Meta.
+        migrations.RunSQL(
+            'CREATE INDEX task_assigned_users_user_task_idx ON tasks_task_assigned_users (user_id, task_id)',
+            'DROP INDEX task_assigned_users_user_task_idx',
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+# The search index as tasks/search.py defines it, copied so that later changes
+# there do not change what this migration does.
+FTS_TABLE = 'tasks_task_fts'
+PG_INDEX = 'task_search_idx'
+PG_CONFIG = 'english'
+
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content='tasks_task', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update AFTER UPDATE OF title, description ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS tasks_task_fts_insert',
+    'DROP TRIGGER IF EXISTS tasks_task_fts_delete',
+    'DROP TRIGGER IF EXISTS tasks_task_fts_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def install_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+            # Also indexes the tasks created before the index existed
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif connection.vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        Task = apps.get_model('tasks', 'Task')
+        schema_editor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+        schema_editor.add_index(Task, GinIndex(SearchVector('title', 'description', config=PG_CONFIG), name=PG_INDEX))
+
+
+def uninstall_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    statements = SQLITE_DROP if connection.vendor == 'sqlite' else [f'DROP INDEX IF EXISTS {PG_INDEX}']
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.1.15 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+# The search index triggers as tasks/search.py defines them, copied so that
+# later changes there do not change what this migration does.
+SEARCH_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update AFTER UPDATE OF title, description ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tasks_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+
+def reinstall_search_triggers(apps, schema_editor):
+    # SQLite rebuilds tasks_task to add or remove is_deleted, which drops its
+    # triggers; the FTS table itself, and PostgreSQL's index, are kept
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for statement in SEARCH_TRIGGERS:
+                cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tasks', '0005_updated_at_indexes'),
+    ]
+
+    operations = [
+        # Unapplying rebuilds the table again, after the last operation
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_triggers),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_status_type_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_type_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', 'task_type', 'created_at'], name='task_status_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['task_type', 'created_at'], name='task_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['updated_at'], name='task_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='task_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['updated_at'], name='user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='user_deleted_idx'),
+        ),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_task_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taskchange',
+            name='action',
+            field=models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('assigned', 'Assigned'), ('deleted', 'Deleted'), ('restored', 'Restored'), ('expired', 'Expired')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.15 on 2026-10-18 06:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def build_summaries(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    UserTaskSummary = apps.get_model('tasks', 'UserTaskSummary')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        Task.assigned_users.through.objects.using(db_alias).filter(task__is_deleted=False)
+        .values_list('user_id', 'task__status', 'task__task_type')
+        .annotate(count=Count('id'), completed_at=Max('task__completed_at'))
+    )
+    summaries = {}
+    for user_id, status, task_type, count, completed_at in rows.iterator():
+        summary = summaries.setdefault(user_id, UserTaskSummary(user_id=user_id))
+        for column in (f'status_{status}', f'type_{task_type}'):
+            setattr(summary, column, getattr(summary, column) + count)
+        if status == 'completed' and completed_at and (
+            summary.last_completed_at is None or completed_at > summary.last_completed_at
+        ):
+            summary.last_completed_at = completed_at
+    UserTaskSummary.objects.using(db_alias).bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_change_assigned'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaskSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('status_pending', models.IntegerField(default=0)),
+                ('status_in_progress', models.IntegerField(default=0)),
+                ('status_completed', models.IntegerField(default=0)),
+                ('type_bug', models.IntegerField(default=0)),
+                ('type_feature', models.IntegerField(default=0)),
+                ('type_improvement', models.IntegerField(default=0)),
+                ('type_task', models.IntegerField(default=0)),
+                ('last_assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.15 on 2026-10-18 06:20
+
+import math
+from collections import Counter, defaultdict
+from datetime import UTC
+
+from django.db import migrations, models
+
+
+# The completion time sketches as tasks/sketches.py stores them (DDSketch at 1%
+# accuracy), copied so that later changes there do not change this migration.
+SKETCH_ACCURACY = 0.01
+SKETCH_MIN_VALUE = 1.0
+SKETCH_LOG_GAMMA = math.log((1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY))
+
+
+class Sketch:
+    def __init__(self):
+        self.bins = Counter()
+        self.zeros = 0
+
+    def add(self, value):
+        if value < SKETCH_MIN_VALUE:
+            self.zeros += 1
+        else:
+            self.bins[math.ceil(math.log(value) / SKETCH_LOG_GAMMA)] += 1
+
+    def to_dict(self):
+        return {'zeros': self.zeros, 'bins': {str(key): count for key, count in sorted(self.bins.items())}}
+
+
+def build_rollups(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskRollup = apps.get_model('tasks', 'TaskRollup')
+    db_alias = schema_editor.connection.alias
+    created, completed, sketches = defaultdict(int), defaultdict(int), defaultdict(Sketch)
+    rows = Task.objects.using(db_alias).values_list('created_at', 'completed_at', 'task_type')
+    for created_at, completed_at, task_type in rows.iterator():
+        created[created_at.astimezone(UTC).date(), task_type] += 1
+        if completed_at is not None:
+            key = completed_at.astimezone(UTC).date(), task_type
+            completed[key] += 1
+            sketches[key].add(max((completed_at - created_at).total_seconds(), 0))
+    TaskRollup.objects.using(db_alias).bulk_create(
+        (
+            TaskRollup(
+                day=day, task_type=task_type, created=created[day, task_type], completed=completed[day, task_type],
+                completion_times=sketches[day, task_type].to_dict() if (day, task_type) in sketches else {},
+            )
+            for day, task_type in sorted(created.keys() | completed.keys())
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_user_task_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('task_type', models.CharField(choices=[('bug', 'Bug'), ('feature', 'Feature'), ('improvement', 'Improvement'), ('task', 'Task')], max_length=50)),
+                ('created', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('completion_times', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['completed_at'], name='task_completed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'task_type'), name='unique_task_rollup'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
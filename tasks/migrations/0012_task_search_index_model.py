@@ -0,0 +1,26 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_task_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSearchIndex',
+            fields=[
+                ('task', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='tasks.task')),
+                ('document', models.TextField(db_column='tasks_task_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'tasks_task_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,8 +1,22 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
 
-class UserManager(BaseUserManager):
+# Soft deleted rows (is_deleted) are left out of the default managers, and so
+# out of every API; all_objects still sees them. See tasks/deletion.py.
+class LiveManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+# Partial indexes cover live rows only, so tombstones do not slow down the
+# queries of the default managers.
+LIVE = models.Q(is_deleted=False)
+DELETED = models.Q(is_deleted=True)
+
+
+class UserManager(LiveManager, BaseUserManager):
     def create_user(self, name, email, mobile, password=None, **extra_fields):
         if not email:
             raise ValueError("User must have an email address")
@@ -32,12 +46,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     # Auto add the deleted field and active field
     is_active = models.BooleanField(default=True)
     is_deleted = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
     is_staff = models.BooleanField(default=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name', 'mobile']
 
     objects = UserManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see tasks/pagination.py
+            models.Index(fields=['created_at', 'id'], condition=LIVE, name='user_created_idx'),
+            # max(updated_at) validators, see tasks/conditional.py
+            models.Index(fields=['updated_at'], condition=LIVE, name='user_updated_idx'),
+            # Tombstones by age, see purge_deleted
+            models.Index(fields=['deleted_at'], condition=DELETED, name='user_deleted_idx'),
+        ]
 
     def __str__(self):
         return self.email
@@ -65,6 +91,183 @@ class Task(models.Model):
     status = models.CharField(max_length=50, default='pending', choices=TASK_STATUS)
     task_type = models.CharField(max_length=50, default='task', choices=TASK_TYPE)
     completed_at = models.DateTimeField(null=True, blank=True)
+    is_deleted = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see tasks/pagination.py
+            models.Index(fields=['created_at', 'id'], condition=LIVE, name='task_created_idx'),
+            # TaskFilterView: ?status=, ?status=&task_type=, in pagination order
+            models.Index(
+                fields=['status', 'task_type', 'created_at'], condition=LIVE, name='task_status_type_created_idx'
+            ),
+            # TaskFilterView: ?task_type= on its own
+            models.Index(fields=['task_type', 'created_at'], condition=LIVE, name='task_type_created_idx'),
+            # max(updated_at) validators, see tasks/conditional.py
+            models.Index(fields=['updated_at'], condition=LIVE, name='task_updated_idx'),
+            # Tombstones by age, see purge_deleted
+            models.Index(fields=['deleted_at'], condition=DELETED, name='task_deleted_idx'),
+            # Completions by day, see rollup_task_stats
+            models.Index(
+                fields=['completed_at'], condition=models.Q(completed_at__isnull=False), name='task_completed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    def set_status(self, status, now=None):
+        """Change the status, stamping completed_at when the task gets completed."""
+        self.status = status
+        if status == 'completed':
+            self.completed_at = now or timezone.now()
+
+
+# The SQLite full-text index of task titles and descriptions: the FTS5 table
+# created and kept in sync by tasks/search.py, mapped read-only so that a search
+# joins it to Task, matching and ranking every task in one pass.
+class TaskSearchIndex(models.Model):
+    task = models.OneToOneField(
+        Task, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_index'
+    )
+    # The hidden column named after the table, which MATCH queries go against
+    document = models.TextField(db_column='tasks_task_fts')
+    # bm25 of the row for the MATCH of the query: lower is better
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'tasks_task_fts'
+
+
+# Running task counts per status and per task type. Rows are kept in step with
+# the Task table by tasks/counters.py, so stats reads never scan Task itself.
+class TaskCounter(models.Model):
+    DIMENSIONS = (
+        ('status', 'Status'),
+        ('task_type', 'Task Type')
+    )
+    dimension = models.CharField(max_length=20, choices=DIMENSIONS)
+    value = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='unique_task_counter')
+        ]
+
+    def __str__(self):
+        return f'{self.dimension}={self.value}: {self.count}'
+
+
+# Task counts per status and per task type of each user's assigned tasks, and
+# when the user last got a task and last had one completed. Rows are kept in
+# step with the assignments by tasks/summaries.py, so user pages never scan the
+# user's tasks. Users without a row have no tasks.
+class UserTaskSummary(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='task_summary')
+    status_pending = models.IntegerField(default=0)
+    status_in_progress = models.IntegerField(default=0)
+    status_completed = models.IntegerField(default=0)
+    type_bug = models.IntegerField(default=0)
+    type_feature = models.IntegerField(default=0)
+    type_improvement = models.IntegerField(default=0)
+    type_task = models.IntegerField(default=0)
+    last_assigned_at = models.DateTimeField(null=True, blank=True)
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'Task summary of user {self.user_id}'
+
+
+# Tasks created and completed per day (UTC) and task type, with a sketch of
+# their completion times (see tasks/sketches.py). Kept by tasks/rollups.py, so
+# the time series API never reads the Task table.
+class TaskRollup(models.Model):
+    day = models.DateField()
+    task_type = models.CharField(max_length=50, choices=Task.TASK_TYPE)
+    created = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    # Seconds from created_at to completed_at of the tasks completed that day
+    completion_times = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'task_type'], name='unique_task_rollup')
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.task_type}: {self.created} created, {self.completed} completed'
+
+
+# Append-only log of task changes, read by the change feed (tasks/changes.py).
+# The id of an entry is the sync token of clients that have seen it.
+class TaskChange(models.Model):
+    ACTIONS = (
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('assigned', 'Assigned'),
+        ('deleted', 'Deleted'),
+        ('restored', 'Restored'),
+        ('expired', 'Expired')
+    )
+    task_id = models.IntegerField()
+    action = models.CharField(max_length=20, choices=ACTIONS)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Later changes of the same task, see changes.compact()
+            models.Index(fields=['task_id', 'id'], name='task_change_task_idx'),
+            # Entries by age, see compact_changes
+            models.Index(fields=['created_at'], name='task_change_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.id} task {self.task_id} {self.action}'
+
+
+# Background job queue, see tasks/jobs.py. Workers (manage.py run_worker) claim
+# queued jobs whose run_after has passed, and record progress, results and
+# errors on the row.
+class Job(models.Model):
+    JOB_STATUS = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed')
+    )
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=JOB_STATUS, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    progress_done = models.IntegerField(default=0)
+    progress_total = models.IntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim order of queued jobs
+            models.Index(fields=['run_after', 'id'], condition=models.Q(status='queued'), name='job_queued_idx'),
+            # Running jobs by last heartbeat, to requeue those of dead workers
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='job_running_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.id} ({self.status})'
@@ -0,0 +1,165 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# Keyset (cursor) pagination.
+#
+# Rows are ordered on a unique key, ``(created_at, id)`` by default, and every
+# page is fetched with a ``WHERE key > last_seen_key ... LIMIT n`` query, so the
+# cost of a page does not depend on how deep into the result set it is.
+# Cursors are opaque url-safe base64 blobs holding the boundary key and the
+# direction of travel.
+class KeysetPagination(BasePagination):
+    ordering = ('created_at', 'id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE
+        self.max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', self.page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.prepare_page(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async version of paginate_queryset, for the views in tasks/async_views.py."""
+        return self.finish_page([item async for item in self.prepare_page(queryset, request)])
+
+    def prepare_page(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request, queryset.model)
+        return self.get_page_queryset(queryset)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset):
+        """
+        Return the ordering as a list of ``(field_name, descending)`` pairs.
+
+        An explicit ``order_by()`` on the queryset wins over the default, and
+        ``id`` is appended when missing so that the key is always unique.
+        """
+        ordering = queryset.query.order_by or self.ordering
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        fields = [('id', descending) if name == 'pk' else (name, descending) for name, descending in fields]
+        if 'id' not in [name for name, _ in fields]:
+            fields.append(('id', fields[-1][1]))
+        return fields
+
+    def get_page_queryset(self, queryset):
+        order_by = []
+        for name, descending in self.fields:
+            order_by.append('-' + name if descending != self.reverse else name)
+        queryset = queryset.order_by(*order_by)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_position_filter())
+        return queryset[:self.page_size + 1]
+
+    def get_position_filter(self):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, self.position):
+            lookup = 'lt' if descending != self.reverse else 'gt'
+            condition |= Q(**equal, **{'%s__%s' % (name, lookup): value})
+            equal[name] = value
+        return condition
+
+    def finish_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_previous = has_more
+            self.has_next = self.position is not None
+        else:
+            self.has_previous = self.position is not None
+            self.has_next = has_more
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+        # Walked backwards past the first row, so the next page is the first one.
+        return self.encode_cursor(None, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+        return self.encode_cursor(self.position, reverse=True)
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return [item[name] for name, _ in self.fields]
+        return [getattr(item, name) for name, _ in self.fields]
+
+    def encode_cursor(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        if position is None:
+            return remove_query_param(url, self.cursor_query_param)
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        payload = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            values = payload['p']
+            reverse = bool(payload.get('r'))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            position = [self.to_python(model, name, value) for (name, _), value in zip(self.fields, values)]
+        except (binascii.Error, KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def to_python(self, model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) are stored as plain JSON values.
+            return value
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError
+        return value
@@ -0,0 +1,214 @@
+# Daily throughput rollups behind TaskTimeseriesView.
+#
+# A TaskRollup row holds, per day (UTC) and task type, the number of tasks
+# created and completed that day, and a sketch (tasks/sketches.py) of the
+# completion times of the completed ones: completed_at - created_at, in
+# seconds. Reads only add up rollup rows; weeks and months merge the sketches
+# of their days, so their percentiles are as accurate as a single day's.
+#
+# A task counts as completed on the day of its completed_at, i.e. its last
+# completion, and keeps counting after it is soft deleted. Task creation (see
+# tasks/signals.py and tasks/bulk.py), TaskUpdateView, bulk status updates and
+# task type changes (TaskUpdateDetailsView) record their tasks as they go. The rollup_task_stats command recomputes days
+# from the Task table, from cron for the last days and as a backfill for any
+# range; recomputing a day is idempotent, so it also repairs the days of writes
+# that bypass the hooks (the admin, raw SQL) and drops purged tasks.
+from collections import defaultdict
+from datetime import UTC, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task, TaskRollup
+from .sketches import DDSketch
+
+
+BUCKETS = ('day', 'week', 'month')
+# Longest range the time series API reads
+MAX_DAYS = 1830
+# Percentiles of completion times returned by default
+PERCENTILES = (50, 90)
+
+
+def day_of(moment):
+    return timezone.localdate(moment, UTC) if timezone.is_aware(moment) else moment.date()
+
+
+def completion_time(created_at, completed_at):
+    return max((completed_at - created_at).total_seconds(), 0)
+
+
+def record_created(tasks):
+    """Count new tasks on the day of their creation."""
+    created = defaultdict(int)
+    for task in tasks:
+        created[day_of(task.created_at), task.task_type] += 1
+    with transaction.atomic():
+        for (day, task_type), count in sorted(created.items()):
+            rollups = TaskRollup.objects.filter(day=day, task_type=task_type)
+            if not rollups.update(created=F('created') + count, updated_at=timezone.now()):
+                TaskRollup.objects.get_or_create(day=day, task_type=task_type)
+                rollups.update(created=F('created') + count, updated_at=timezone.now())
+
+
+def record_completed(completions):
+    """
+    Count tasks that were just completed. completions is an iterable of
+    ``(task, completed_at_before)`` pairs; a task completed before is moved
+    from the day of its previous completion.
+    """
+    changes = defaultdict(lambda: {'created': 0, 'completed': 0, 'times': []})
+    for task, previous in completions:
+        if previous is not None:
+            change = changes[day_of(previous), task.task_type]
+            change['completed'] -= 1
+            change['times'].append((completion_time(task.created_at, previous), -1))
+        change = changes[day_of(task.completed_at), task.task_type]
+        change['completed'] += 1
+        change['times'].append((completion_time(task.created_at, task.completed_at), 1))
+    apply_changes(changes)
+
+
+def record_type_changed(changes):
+    """
+    Move tasks whose task type changed to their new type. changes is an
+    iterable of ``(task, task_type_before)`` pairs; the creation of a task, and
+    its completion if it has one, leave the rollups of its previous type for
+    those of its new type, on the same days.
+    """
+    moves = defaultdict(lambda: {'created': 0, 'completed': 0, 'times': []})
+    for task, previous in changes:
+        if previous == task.task_type:
+            continue
+        for task_type, count in ((previous, -1), (task.task_type, 1)):
+            moves[day_of(task.created_at), task_type]['created'] += count
+            if task.completed_at is not None:
+                move = moves[day_of(task.completed_at), task_type]
+                move['completed'] += count
+                move['times'].append((completion_time(task.created_at, task.completed_at), count))
+    apply_changes(moves)
+
+
+def apply_changes(changes):
+    """Add changes, by (day, task_type): created and completed counts, and (seconds, count) completion times."""
+    # In (day, task_type) order, so that concurrent writers lock rollup rows in the same order
+    with transaction.atomic():
+        for (day, task_type), change in sorted(changes.items()):
+            rollup, _ = TaskRollup.objects.select_for_update().get_or_create(day=day, task_type=task_type)
+            if change['times']:
+                sketch = DDSketch.from_dict(rollup.completion_times)
+                for seconds, count in change['times']:
+                    sketch.add(seconds, count)
+                rollup.completion_times = sketch.to_dict()
+            rollup.created += change['created']
+            rollup.completed += change['completed']
+            rollup.save(update_fields=['created', 'completed', 'completion_times', 'updated_at'])
+
+
+def day_range(start, end):
+    """Return the datetimes bounding the days start to end, both included."""
+    return (
+        datetime.combine(start, time.min, tzinfo=UTC),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=UTC),
+    )
+
+
+def compute(start, end):
+    """Compute the rollups of the days start to end from the Task table, as unsaved TaskRollup rows."""
+    since, until = day_range(start, end)
+    created, completed, sketches = defaultdict(int), defaultdict(int), defaultdict(DDSketch)
+    # Live tasks through their partial index, then the soft deleted ones
+    for tasks in (Task.objects, Task.all_objects.filter(is_deleted=True)):
+        rows = tasks.filter(created_at__gte=since, created_at__lt=until).values_list('created_at', 'task_type')
+        for created_at, task_type in rows.iterator():
+            created[day_of(created_at), task_type] += 1
+    rows = Task.all_objects.filter(completed_at__gte=since, completed_at__lt=until).values_list(
+        'created_at', 'completed_at', 'task_type'
+    )
+    for created_at, completed_at, task_type in rows.iterator():
+        key = day_of(completed_at), task_type
+        completed[key] += 1
+        sketches[key].add(completion_time(created_at, completed_at))
+    return [
+        TaskRollup(
+            day=day, task_type=task_type, created=created[day, task_type], completed=completed[day, task_type],
+            completion_times=sketches[day, task_type].to_dict() if (day, task_type) in sketches else {},
+        )
+        for day, task_type in sorted(created.keys() | completed.keys())
+    ]
+
+
+def rebuild(start, end):
+    """Recompute the rollups of the days start to end, both included; return how many rows were written."""
+    with transaction.atomic():
+        rows = compute(start, end)
+        TaskRollup.objects.filter(day__gte=start, day__lte=end).delete()
+        TaskRollup.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start + timedelta(days=31)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def summarize(created, completed, sketch, percentiles):
+    return {
+        'created': created,
+        'completed': completed,
+        'completion_seconds': {
+            f'p{percentile:g}': round(sketch.quantile(percentile / 100), 1) for percentile in percentiles
+        } if sketch.count > 0 else None,
+    }
+
+
+def timeseries(start, end, bucket='day', task_type=None, percentiles=PERCENTILES):
+    """
+    Return the throughput of the days start to end per bucket (day, ISO week or
+    month), overall and per task type, from the rollups alone. Buckets are
+    labelled with their first day; the first and last may be partial.
+    """
+    rollups = TaskRollup.objects.filter(day__gte=start, day__lte=end)
+    if task_type is not None:
+        rollups = rollups.filter(task_type=task_type)
+    types = [task_type] if task_type is not None else [value for value, _ in Task.TASK_TYPE]
+
+    buckets, label = {}, bucket_start(start, bucket)
+    while label <= end:
+        buckets[label] = {value: [0, 0, DDSketch()] for value in types}
+        label = next_bucket(label, bucket)
+    rows = rollups.values_list('day', 'task_type', 'created', 'completed', 'completion_times')
+    for day, row_type, created, completed, completion_times in rows:
+        counts = buckets[bucket_start(day, bucket)].get(row_type)
+        if counts is None:
+            # A task type no longer in the choices
+            continue
+        counts[0] += created
+        counts[1] += completed
+        counts[2].merge(DDSketch.from_dict(completion_times))
+
+    series = []
+    for label, by_type in buckets.items():
+        total = [0, 0, DDSketch()]
+        for created, completed, sketch in by_type.values():
+            total[0] += created
+            total[1] += completed
+            total[2].merge(sketch)
+        series.append({
+            'start': label.isoformat(),
+            **summarize(*total, percentiles),
+            'by_type': {value: summarize(*counts, percentiles) for value, counts in by_type.items()},
+        })
+    return series
@@ -0,0 +1,88 @@
+# Read replica routing.
+#
+# Reads of safe (GET/HEAD/OPTIONS) requests go to the replicas in
+# DATABASE_REPLICAS, everything else to default. Each request sticks to the
+# one replica it picked first, so all of its queries see the same snapshot.
+# A client that has just written is pinned to default for REPLICA_PIN_SECONDS
+# (by a cookie, see ReplicaPinningMiddleware), so it reads its own writes even
+# while the replicas lag behind.
+#
+# Code running outside a request (management commands, the shell) and queries
+# inside a transaction on default always use default.
+import itertools
+import threading
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+
+# Routing state of the current request, or None outside a request
+_state = ContextVar('replica_routing_state', default=None)
+
+
+class RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.alias = None
+
+
+class ReplicaRouter:
+    def __init__(self, replicas=None, strategy=None):
+        self.replicas = list(settings.DATABASE_REPLICAS if replicas is None else replicas)
+        self.strategy = strategy or settings.DATABASE_REPLICA_STRATEGY
+        if self.strategy not in ('round_robin', 'least_loaded'):
+            raise ValueError(f'Unknown replica strategy {self.strategy!r}')
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(self.replicas)
+        # Requests currently reading from each replica, in this process
+        self.load = {alias: 0 for alias in self.replicas}
+
+    def choose_replica(self):
+        with self._lock:
+            if self.strategy == 'round_robin':
+                alias = next(self._cycle)
+            else:
+                alias = min(self.replicas, key=lambda alias: self.load[alias])
+            self.load[alias] += 1
+        return alias
+
+    def release(self, alias):
+        with self._lock:
+            self.load[alias] -= 1
+
+    def begin_request(self, pinned):
+        """Start routing a request, returns the token for end_request."""
+        return _state.set(RequestState(pinned or not self.replicas))
+
+    def end_request(self, token):
+        state = _state.get()
+        if state is not None and state.alias is not None:
+            self.release(state.alias)
+        _state.reset(token)
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            state.alias = self.choose_replica()
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as default
+        return True
+
+
+def read_from_replica():
+    """Return whether the current request has read from a replica."""
+    state = _state.get()
+    return state is not None and state.alias is not None
+
+
+def get_router():
+    """Return the ReplicaRouter installed in DATABASE_ROUTERS, or None."""
+    return next((r for r in router.routers if isinstance(r, ReplicaRouter)), None)
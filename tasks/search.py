@@ -0,0 +1,155 @@
+# Task filtering and full-text search over task titles and descriptions.
+#
+# SQLite: an external content FTS5 table, tasks_task_fts, indexes the Task
+# table and is kept in sync by triggers, so bulk writes and raw SQL are covered
+# as well as model saves. Searches join it to Task (as the TaskSearchIndex
+# model), so the MATCH runs once and yields the bm25 rank of every match.
+#
+# PostgreSQL: a GIN expression index over the title and description tsvector,
+# ranked with ts_rank.
+#
+# Every search term is matched as a prefix and all terms must match.
+import re
+
+from django.db import connections
+from django.db.models import F, Lookup
+
+from .models import TaskSearchIndex
+
+
+FTS_TABLE = 'tasks_task_fts'
+PG_INDEX = 'task_search_idx'
+PG_CONFIG = 'english'
+
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content='tasks_task', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update AFTER UPDATE OF title, description ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS tasks_task_fts_insert',
+    'DROP TRIGGER IF EXISTS tasks_task_fts_delete',
+    'DROP TRIGGER IF EXISTS tasks_task_fts_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+class Match(Lookup):
+    """``document MATCH query`` on the FTS5 table."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+TaskSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+def get_terms(search_term):
+    return re.findall(r'\w+', search_term)
+
+
+def pg_search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('title', 'description', config=PG_CONFIG)
+
+
+def install(connection):
+    """
+    Create the search index for the connection's backend.
+
+    Safe to run again, e.g. after SQLite has rebuilt the tasks_task table
+    (which drops its triggers) during a migration.
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+    elif connection.vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from .models import Task
+        with connection.schema_editor() as schema_editor:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+            schema_editor.add_index(Task, GinIndex(pg_search_vector(), name=PG_INDEX))
+
+
+def uninstall(connection):
+    statements = SQLITE_DROP if connection.vendor == 'sqlite' else [f'DROP INDEX IF EXISTS {PG_INDEX}']
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def rebuild(using='default'):
+    """Recreate missing triggers and reindex every task from the Task table."""
+    connection = connections[using]
+    install(connection)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'REINDEX INDEX {PG_INDEX}')
+
+
+def search_tasks(queryset, search_term):
+    """
+    Filter queryset to tasks matching search_term, best match first.
+
+    Matches are annotated with ``search_rank`` and ordered on it, which the
+    keyset paginator picks up as the page order.
+    """
+    terms = get_terms(search_term)
+    if not terms:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Quoted so that FTS5 operators in the input are matched literally.
+        match = ' '.join('"%s"*' % term for term in terms)
+        # One MATCH, joined to the tasks on rowid; bm25: lower is better
+        queryset = queryset.filter(search_index__document__match=match)
+        return queryset.annotate(search_rank=F('search_index__rank')).order_by('search_rank', 'id')
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        query = SearchQuery(' & '.join('%s:*' % term for term in terms), search_type='raw', config=PG_CONFIG)
+        vector = pg_search_vector()
+        # ts_rank: higher is better
+        return queryset.annotate(search_vector=vector).filter(search_vector=query).annotate(
+            search_rank=SearchRank(vector, query)
+        ).order_by('-search_rank', 'id')
+
+    # Other backends fall back to substring matching.
+    for term in terms:
+        queryset = queryset.filter(title__icontains=term) | queryset.filter(description__icontains=term)
+    return queryset
+
+
+def filter_tasks(queryset, params):
+    """Apply the TaskFilterView query parameters (status, task_type, search) to queryset."""
+    status_filter = params.get('status')
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+
+    task_type_filter = params.get('task_type')
+    if task_type_filter:
+        queryset = queryset.filter(task_type=task_type_filter)
+
+    search_term = params.get('search')
+    if search_term:
+        queryset = search_tasks(queryset, search_term)
+    return queryset
@@ -1,12 +1,104 @@
+from django.conf import settings
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Task, User
+from rest_framework.validators import UniqueValidator
+from . import summaries
+from .models import Job, Task, User
 
 
-class UserSerializer(serializers.ModelSerializer):
+# Lets a serializer declare the relations it renders, so that list views can
+# fetch them up front instead of issuing one query per object.
+class EagerLoadingMixin:
+    # Maps a related field name to the nested serializer that renders it.
+    prefetch_related_fields = {}
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=(), extra=()):
+        """
+        Prefetch the relations the serializer renders, and with a sparse
+        fieldset (see SparseFieldsMixin) only load the requested columns plus
+        extra ones (e.g. the ordering keys).
+        """
+        lookups = []
+        for name, serializer_class in cls.prefetch_related_fields.items():
+            if fields is not None and name not in fields:
+                continue
+            meta = serializer_class.Meta
+            if fields is not None and name not in expand:
+                # Rendered as ids
+                lookups.append(Prefetch(name, queryset=meta.model._default_manager.only('id')))
+            else:
+                lookups.append(Prefetch(name, queryset=meta.model._default_manager.only(*meta.fields)))
+        if fields is not None:
+            columns = [name for name in fields if name not in cls.prefetch_related_fields]
+            queryset = queryset.only(*columns, *extra)
+        return queryset.prefetch_related(*lookups) if lookups else queryset
+
+
+# Adds ?fields= and ?expand= support. With fields, only the listed fields are
+# rendered, and relations from prefetch_related_fields are rendered as lists of
+# ids unless they are also listed in expand. Without fields, every field is
+# rendered with relations embedded, as before.
+class SparseFieldsMixin:
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            return
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+        for name in self.prefetch_related_fields:
+            if name in self.fields and name not in expand:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    @classmethod
+    def get_field_options(cls, query_params):
+        """
+        Return the ``fields`` and ``expand`` serializer arguments from the query
+        parameters: a frozenset of field names or None for all fields, and a
+        frozenset of relations to embed. Fields are always rendered in the
+        serializer's own order.
+        """
+        readable = [name for name, field in cls().fields.items() if not field.write_only]
+        fields = [name for name in query_params.get(cls.fields_query_param, '').split(',') if name]
+        expand = frozenset(name for name in query_params.get(cls.expand_query_param, '').split(',') if name)
+        unknown = [name for name in fields if name not in readable]
+        unknown += [name for name in expand if name not in cls.prefetch_related_fields]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown field: {', '.join(sorted(unknown))}")
+        return {'fields': frozenset(fields) if fields else None, 'expand': expand}
+
+
+class UserSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'name', 'email', 'mobile']
-        extra_kwargs = {'password': {'write_only': True}}
+        extra_kwargs = {
+            'password': {'write_only': True},
+            # Soft deleted users keep their email, so that they can be restored
+            'email': {'validators': [UniqueValidator(queryset=User.all_objects.all())]},
+        }
+
+
+# Serializer for a single user, with the summary of their tasks.
+class UserDetailSerializer(UserSerializer):
+    task_summary = serializers.SerializerMethodField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['task_summary']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=(), extra=()):
+        if fields is None or 'task_summary' in fields:
+            queryset = queryset.select_related('task_summary')
+        return super().setup_eager_loading(queryset, fields, expand, extra)
+
+    def get_task_summary(self, user):
+        # Maintained by tasks/summaries.py; users who never had a task have none
+        summary = getattr(user, 'task_summary', None)
+        return summaries.to_representation(vars(summary) if summary else None)
 
 
 # Serializer for creating a Task.
@@ -22,10 +114,116 @@ class TaskAssignSerializer(serializers.Serializer):
     user_ids = serializers.ListField(child=serializers.IntegerField())
 
 
+# Serializer for assigning a user to tasks.
+class UserAssignSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    task_ids = serializers.ListField(child=serializers.IntegerField())
+
+
+class AssignmentPairSerializer(serializers.Serializer):
+    task_id = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+
+
+# Serializer for bulk (un)assignment: either task_ids x user_ids, or explicit pairs.
+class BulkAssignSerializer(serializers.Serializer):
+    task_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    pairs = AssignmentPairSerializer(many=True, required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        cartesian = 'task_ids' in attrs or 'user_ids' in attrs
+        if cartesian == ('pairs' in attrs):
+            raise serializers.ValidationError('Provide either task_ids and user_ids, or pairs.')
+        if cartesian and not ('task_ids' in attrs and 'user_ids' in attrs):
+            raise serializers.ValidationError('task_ids and user_ids must be provided together.')
+        size = len(attrs['pairs']) if 'pairs' in attrs else len(attrs['task_ids']) * len(attrs['user_ids'])
+        # Background jobs pass a higher max_items
+        max_items = self.context.get('max_items', settings.BULK_MAX_ITEMS)
+        if size > max_items:
+            raise serializers.ValidationError(f'At most {max_items} assignments per request.')
+        return attrs
+
+
+# Serializer for the users of the batch summary API.
+class UserIdsSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.BULK_MAX_ITEMS
+    )
+
+
+# Serializer for bulk delete and restore.
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_ids(self, ids):
+        if len(ids) > settings.BULK_MAX_ITEMS:
+            raise serializers.ValidationError(f'At most {settings.BULK_MAX_ITEMS} ids per request.')
+        return ids
+
+
 # Serializer for retrieving task details.
-class TaskDetailSerializer(serializers.ModelSerializer):
+class TaskDetailSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     assigned_users = UserSerializer(many=True, read_only=True)
+    prefetch_related_fields = {'assigned_users': UserSerializer}
 
     class Meta:
         model = Task
         fields = ['id', 'title', 'description', 'created_at', 'task_type', 'completed_at', 'status', 'assigned_users']
+
+
+# Serializer for one item of a bulk status update.
+class TaskStatusUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Task.TASK_STATUS)
+
+
+# Serializer for background jobs and their progress.
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'attempts', 'max_attempts', 'progress_done', 'progress_total', 'result', 'error',
+            'run_after', 'created_at', 'started_at', 'finished_at'
+        ]
+
+
+# Serializer for queueing a job. The payload is validated by the serializer
+# registered for its kind, from the kinds in the context (see tasks/jobs.py).
+class JobCreateSerializer(serializers.Serializer):
+    kind = serializers.CharField(max_length=50)
+    payload = serializers.JSONField(required=False, default=dict)
+    max_attempts = serializers.IntegerField(min_value=1, max_value=10, required=False)
+
+    def validate(self, attrs):
+        kinds = self.context['kinds']
+        if attrs['kind'] not in kinds:
+            raise serializers.ValidationError({'kind': f'Unknown job kind, expected one of {", ".join(sorted(kinds))}.'})
+        payload_serializer_class = kinds[attrs['kind']].serializer
+        if payload_serializer_class is not None:
+            payload = payload_serializer_class(data=attrs['payload'], context={'max_items': settings.JOB_MAX_ITEMS})
+            if not payload.is_valid():
+                raise serializers.ValidationError({'payload': payload.errors})
+            attrs['payload'] = payload.validated_data
+        return attrs
+
+
+# Serializer for the payload of jobs working through a list of bulk API items.
+class JobItemsSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.JSONField(), allow_empty=False)
+
+    def validate_items(self, items):
+        if len(items) > settings.JOB_MAX_ITEMS:
+            raise serializers.ValidationError(f'At most {settings.JOB_MAX_ITEMS} items per job.')
+        return items
+
+
+# Serializer for moving every task of one user to another.
+class ReassignTasksSerializer(serializers.Serializer):
+    from_user_id = serializers.IntegerField()
+    to_user_id = serializers.IntegerField()
+
+    def validate(self, attrs):
+        if attrs['from_user_id'] == attrs['to_user_id']:
+            raise serializers.ValidationError('from_user_id and to_user_id must differ.')
+        return attrs
@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, changes, counters, metrics, rollups, summaries
+from .models import Task, User
+
+
+Assignment = Task.assigned_users.through
+
+# Remember the counted values a task was loaded with, so that a later save
+# can tell which counters to move.
+@receiver(post_init, sender=Task)
+def remember_counted_values(sender, instance, **kwargs):
+    if all(name in instance.__dict__ for name in counters.COUNTED_FIELDS):
+        instance._counted_values = counters.snapshot(instance)
+
+
+@receiver(pre_save, sender=Task)
+def load_counted_values(sender, instance, **kwargs):
+    # Tasks loaded with the counted fields deferred
+    if not instance._state.adding and not hasattr(instance, '_counted_values'):
+        instance._counted_values = Task.objects.filter(pk=instance.pk).values(*counters.COUNTED_FIELDS).first()
+
+
+@receiver(post_save, sender=Task)
+def count_saved_task(sender, instance, created, **kwargs):
+    if created:
+        counters.record_created([instance])
+    elif instance._counted_values is not None:
+        counters.record_changed([(instance._counted_values, instance)])
+        # New tasks have no assigned users yet
+        if not instance.is_deleted:
+            summaries.record_changed([(instance._counted_values, instance)])
+    instance._counted_values = counters.snapshot(instance)
+
+
+# Soft deleted tasks left the counters when they were deleted (see tasks/deletion.py)
+@receiver(post_delete, sender=Task)
+def count_deleted_task(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        counters.record_deleted([instance])
+
+
+# Throughput rollups, see tasks/rollups.py. Completions are recorded by the
+# views that complete tasks, which know when a task was completed before.
+@receiver(post_save, sender=Task)
+def roll_up_created_task(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_created([instance])
+
+
+# Assignment rows go with the task, without m2m_changed
+@receiver(pre_delete, sender=Task)
+def summarize_deleted_task(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        summaries.record_deleted([instance])
+
+
+# Change feed, see tasks/changes.py. Soft deletes and restores are recorded by
+# tasks/deletion.py, and tombstones were recorded as deleted already.
+@receiver(post_save, sender=Task)
+def record_saved_task(sender, instance, created, **kwargs):
+    changes.record([instance.pk], 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Task)
+def record_deleted_task(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        changes.record([instance.pk], 'deleted')
+
+
+# Response cache, see tasks/cache.py
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task(sender, instance, **kwargs):
+    cache.invalidate(task_ids=[instance.pk])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    cache.invalidate(user_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Task.assigned_users.through)
+def summarize_assignments(sender, instance, action, reverse, pk_set, **kwargs):
+    # Set-based senders (tasks/assignments.py) pass tasks_touched=True and
+    # update the summaries themselves
+    if kwargs.get('tasks_touched') or action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    if action == 'post_add':
+        # Only the ids that were not assigned yet
+        pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+        summaries.record_assigned(pairs)
+        return
+    # remove() is sent every id it was given, assigned or not
+    rows = Assignment.objects.filter(**{'user_id' if reverse else 'task_id': instance.pk})
+    if action == 'pre_remove':
+        rows = rows.filter(**{'task_id__in' if reverse else 'user_id__in': pk_set})
+    summaries.record_unassigned(rows.values_list('task_id', 'user_id'))
+
+
+@receiver(m2m_changed, sender=Task.assigned_users.through)
+def assignments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        manager = instance.assigned_tasks if reverse else instance.assigned_users
+        pk_set = set(manager.values_list('id', flat=True))
+    elif action not in ('post_add', 'post_remove'):
+        return
+    task_ids, user_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    cache.invalidate(task_ids=task_ids, user_ids=user_ids)
+
+    # Assignments are part of the task, so they move its updated_at (and with
+    # it the conditional GET validators) and are logged as changes of it.
+    # Senders that already did this for all their tasks at once pass
+    # tasks_touched=True.
+    if task_ids and not kwargs.get('tasks_touched'):
+        now = timezone.now()
+        Task.objects.filter(pk__in=task_ids).update(updated_at=now)
+        changes.record(task_ids, 'assigned')
+        if not reverse:
+            instance.updated_at = now
+
+
+# Deleting a user removes their assignment rows without m2m_changed. Soft
+# deleted users already left their tasks when they were deleted.
+@receiver(pre_delete, sender=User)
+def touch_user_tasks(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        tasks = Task.objects.filter(assigned_users=instance)
+        changes.record(tasks.values_list('id', flat=True), 'assigned')
+        tasks.update(updated_at=timezone.now())
+
+
+# SQLite tuning, see SQLITE_PRAGMAS in settings
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+# Time the queries of instrumented requests, see tasks/metrics.py. Inserted
+# first, so that execute_wrapper() blocks open on the connection still remove
+# their own wrapper.
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, metrics.record_query)
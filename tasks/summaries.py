@@ -0,0 +1,269 @@
+# Per-user task summaries behind UserDetailView and UserSummaryView.
+#
+# A summary counts the live tasks assigned to a user per status and per task
+# type, like the stats counters (tasks/counters.py) do for all tasks, and keeps
+# when the user last got a task and last had one completed. Single saves,
+# deletes and m2m_changed are picked up by the signal receivers in
+# tasks/signals.py; the set-based writers (assignments, bulk, deletion) call the
+# record_* functions themselves, inside the same transaction as the write.
+#
+# Rows are moved with one UPDATE per SUMMARY_BATCH_SIZE users, whatever the mix
+# of deltas, and created on a user's first assignment. rebuild() recomputes the
+# counts and last_completed_at from the tables; assignment times are not kept
+# anywhere else, so last_assigned_at survives rebuilds as it was.
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import cache
+from .counters import COUNTED_FIELDS, snapshot
+from .exports import iter_chunks
+from .models import Task, User, UserTaskSummary
+
+
+Assignment = Task.assigned_users.through
+
+# Users per UPDATE, each adding up to a bound parameter per column
+SUMMARY_BATCH_SIZE = 50
+
+CHOICES = {'status': Task.TASK_STATUS, 'task_type': Task.TASK_TYPE}
+PREFIXES = {'status': 'status', 'task_type': 'type'}
+# The summary column of each counted field value
+COLUMNS = {(name, value): f'{PREFIXES[name]}_{value}' for name in COUNTED_FIELDS for value, _ in CHOICES[name]}
+TIMESTAMPS = ('last_assigned_at', 'last_completed_at')
+
+
+def task_values(task_ids):
+    """Return the counted field values of the live tasks among task_ids, by id."""
+    values = {}
+    for chunk in iter_chunks(sorted(task_ids), SUMMARY_BATCH_SIZE * 10):
+        for row in Task.objects.filter(id__in=chunk).values('id', *COUNTED_FIELDS):
+            values[row.pop('id')] = row
+    return values
+
+
+def assigned_users(task_ids):
+    """Return the ids of the users assigned to each of task_ids."""
+    users = defaultdict(list)
+    for chunk in iter_chunks(sorted(task_ids), SUMMARY_BATCH_SIZE * 10):
+        for task_id, user_id in Assignment.objects.filter(task_id__in=chunk).values_list('task_id', 'user_id'):
+            users[task_id].append(user_id)
+    return users
+
+
+def count(deltas, user_ids, values, sign):
+    for user_id in user_ids:
+        for name in COUNTED_FIELDS:
+            deltas[user_id, COLUMNS[name, values[name]]] += sign
+
+
+def record_assigned(pairs, values=None):
+    """
+    Count the tasks of new ``(task_id, user_id)`` assignments. values holds
+    the counted field values of the tasks by id, when the caller has them.
+    """
+    record_assignments(pairs, values, 1)
+
+
+def record_unassigned(pairs, values=None):
+    """Uncount the tasks of removed ``(task_id, user_id)`` assignments."""
+    record_assignments(pairs, values, -1)
+
+
+def record_assignments(pairs, values, sign):
+    pairs = list(pairs)
+    if values is None:
+        values = task_values({task_id for task_id, _ in pairs})
+    deltas, assigned = Counter(), set()
+    for task_id, user_id in pairs:
+        if task_id in values:
+            count(deltas, [user_id], values[task_id], sign)
+            assigned.add(user_id)
+    apply(deltas, assigned=assigned if sign > 0 else ())
+
+
+def record_changed(changes):
+    """
+    Move the tasks whose counted fields changed between the summaries of their
+    users. changes is an iterable of ``(snapshot_before, task_after)`` pairs.
+    """
+    changed = [
+        (before, task) for before, task in changes
+        if any(before[name] != getattr(task, name) for name in COUNTED_FIELDS)
+    ]
+    if not changed:
+        return
+    users = assigned_users(task.id for _, task in changed)
+    deltas, completed = Counter(), set()
+    for before, task in changed:
+        count(deltas, users[task.id], before, -1)
+        count(deltas, users[task.id], snapshot(task), 1)
+        if task.status == 'completed' and before['status'] != 'completed':
+            completed.update(users[task.id])
+    apply(deltas, completed=completed)
+
+
+def record_deleted(tasks):
+    """Uncount deleted tasks from the summaries of their users."""
+    record_tasks(tasks, -1)
+
+
+def record_restored(tasks):
+    record_tasks(tasks, 1)
+
+
+def record_tasks(tasks, sign):
+    tasks = list(tasks)
+    users = assigned_users(task.id for task in tasks)
+    deltas = Counter()
+    for task in tasks:
+        count(deltas, users[task.id], snapshot(task), sign)
+    apply(deltas)
+
+
+def update_values(user_ids, deltas, stamped, now):
+    """Return the UPDATE values applying deltas ``{user_id: {column: delta}}`` to the given users."""
+    values = {'updated_at': now}
+    columns = sorted({column for user_id in user_ids for column in deltas.get(user_id, ())})
+    for column in columns:
+        users_by_delta = defaultdict(list)
+        for user_id in user_ids:
+            if column in deltas.get(user_id, ()):
+                users_by_delta[deltas[user_id][column]].append(user_id)
+        if len(users_by_delta) == 1 and len(next(iter(users_by_delta.values()))) == len(user_ids):
+            values[column] = F(column) + next(iter(users_by_delta))
+        else:
+            values[column] = F(column) + Case(
+                *[When(user_id__in=ids, then=Value(delta)) for delta, ids in sorted(users_by_delta.items())],
+                default=Value(0),
+            )
+    for column, stamped_ids in stamped.items():
+        ids = [user_id for user_id in user_ids if user_id in stamped_ids]
+        if len(ids) == len(user_ids):
+            values[column] = now
+        elif ids:
+            values[column] = Case(When(user_id__in=ids, then=Value(now)), default=F(column))
+    return values
+
+
+def apply(deltas, assigned=(), completed=()):
+    """
+    Add deltas ``{(user_id, column): delta}`` to the summaries, and stamp
+    last_assigned_at and last_completed_at of the assigned and completed users.
+    """
+    by_user = defaultdict(dict)
+    for (user_id, column), delta in deltas.items():
+        if delta:
+            by_user[user_id][column] = delta
+    stamped = {'last_assigned_at': set(assigned), 'last_completed_at': set(completed)}
+    user_ids = sorted(by_user.keys() | stamped['last_assigned_at'] | stamped['last_completed_at'])
+    if not user_ids:
+        return
+    now = timezone.now()
+    # In user id order, so that concurrent writers lock summary rows in the same order
+    with transaction.atomic():
+        for chunk in iter_chunks(user_ids, SUMMARY_BATCH_SIZE):
+            summaries = UserTaskSummary.objects.filter(user_id__in=chunk)
+            if summaries.update(**update_values(chunk, by_user, stamped, now)) < len(chunk):
+                # First assignments: add empty rows, then count into them
+                existing = set(summaries.values_list('user_id', flat=True))
+                missing = [user_id for user_id in chunk if user_id not in existing]
+                UserTaskSummary.objects.bulk_create(
+                    [UserTaskSummary(user_id=user_id) for user_id in missing], ignore_conflicts=True
+                )
+                UserTaskSummary.objects.filter(user_id__in=missing).update(
+                    **update_values(missing, by_user, stamped, now)
+                )
+        cache.invalidate(user_ids=user_ids)
+
+
+def count_summaries(user_ids=None):
+    """Count the tasks of each user (of user_ids, or all) straight from the assignments."""
+    rows = Assignment.objects.filter(task__is_deleted=False)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    rows = rows.values_list('user_id', 'task__status', 'task__task_type').annotate(
+        count=Count('id'), completed_at=Max('task__completed_at')
+    )
+    summaries = defaultdict(lambda: {**dict.fromkeys(COLUMNS.values(), 0), 'last_completed_at': None})
+    for user_id, status, task_type, task_count, completed_at in rows.iterator():
+        summary = summaries[user_id]
+        summary[COLUMNS['status', status]] += task_count
+        summary[COLUMNS['task_type', task_type]] += task_count
+        if status == 'completed' and completed_at:
+            summary['last_completed_at'] = max(filter(None, [summary['last_completed_at'], completed_at]))
+    return summaries
+
+
+def rebuild(user_ids=None):
+    """Recompute the summaries of user_ids (or of every user) from the assignments."""
+    with transaction.atomic():
+        if user_ids is None:
+            rebuild_users(None)
+        else:
+            for chunk in iter_chunks(sorted(set(user_ids)), SUMMARY_BATCH_SIZE * 10):
+                rebuild_users(chunk)
+
+
+def rebuild_users(user_ids):
+    with transaction.atomic():
+        rows = UserTaskSummary.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        assigned_at = dict(rows.exclude(last_assigned_at=None).values_list('user_id', 'last_assigned_at'))
+        rows.delete()
+        now = timezone.now()
+        counted = count_summaries(user_ids)
+        UserTaskSummary.objects.bulk_create(
+            (
+                UserTaskSummary(
+                    user_id=user_id, last_assigned_at=assigned_at.get(user_id), updated_at=now,
+                    **counted.get(user_id, {}),
+                )
+                for user_id in sorted(counted.keys() | assigned_at.keys())
+            ),
+            batch_size=500,
+        )
+        cache.invalidate(user_ids=counted.keys() | assigned_at.keys())
+
+
+def verify():
+    """Return ``{user_id: (stored, actual)}`` for every summary whose counts have drifted."""
+    columns = list(COLUMNS.values())
+    stored = {row[0]: row[1:] for row in UserTaskSummary.objects.values_list('user_id', *columns)}
+    actual = {
+        user_id: tuple(summary[column] for column in columns) for user_id, summary in count_summaries().items()
+    }
+    empty = (0,) * len(columns)
+    return {
+        user_id: (stored.get(user_id, empty), actual.get(user_id, empty))
+        for user_id in stored.keys() | actual.keys()
+        if stored.get(user_id, empty) != actual.get(user_id, empty)
+    }
+
+
+datetime_field = serializers.DateTimeField()
+
+
+def to_representation(values):
+    """Render a summary, given its column values (None for a user without one)."""
+    values = values or {}
+    summary = {'total': 0, 'by_status': {}, 'by_type': {}}
+    for (name, value), column in COLUMNS.items():
+        task_count = values.get(column) or 0
+        summary['by_status' if name == 'status' else 'by_type'][value] = task_count
+        if name == 'status':
+            summary['total'] += task_count
+    for column in TIMESTAMPS:
+        summary[column] = datetime_field.to_representation(values[column]) if values.get(column) else None
+    return summary
+
+
+def get_many(user_ids):
+    """Return the rendered summaries of the live users among user_ids, by id, in one query."""
+    columns = [*COLUMNS.values(), *TIMESTAMPS]
+    rows = User.objects.filter(id__in=user_ids).values_list('id', *[f'task_summary__{column}' for column in columns])
+    return {row[0]: to_representation(dict(zip(columns, row[1:]))) for row in rows}
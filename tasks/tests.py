@@ -1,12 +1,58 @@
+import asyncio
+import itertools
+import csv
+import gzip
+import importlib
+import json
+import os
+import re
+import tempfile
+import time
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models.signals import m2m_changed
+from django.http import HttpResponse, QueryDict
+from django.utils import timezone
+from django.utils.http import http_date
+from django.test import RequestFactory, SimpleTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 from tasks.models import User
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, APITransactionTestCase
 from rest_framework import status
-from tasks.models import Task
+from rest_framework.renderers import JSONRenderer
+from tasks import (
+    benchmarking, cache, changes, counters, datagen, deletion, dumps, events, jobs, metrics, rollups, summaries
+)
+from tasks import urls as task_urls
+from tasks.management.commands.benchmark_endpoints import BENCHMARKS, ENDPOINTS
+from tasks.fast_serializers import get_values_serializer
+from tasks.middleware import ReplicaPinningMiddleware
+from tasks.renderers import FastJSONRenderer
+from tasks.routers import ReplicaRouter, get_router
+from tasks.serializers import TaskAssignSerializer, TaskDetailSerializer, UserSerializer
+from tasks.sketches import DDSketch
+from tasks.views import TaskUpdateDetailsView
+from tasks.models import Job, Task, TaskChange, TaskCounter, TaskRollup, UserTaskSummary
 
 
+# Requests over their QUERY_BUDGETS entry fail the test
+@override_settings(QUERY_BUDGET_RAISE=True)
 class BaseAPITestCase(APITestCase):
     def setUp(self):
+        # Ids are reused between tests, so responses cached by a previous test must go
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+
         # Create test users
         self.user1 = User.objects.create_user(
             email='testuser1@gmail.com',
@@ -48,7 +94,7 @@ class TaskAPITestCase(BaseAPITestCase):
         url = reverse('all_tasks')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_task_detail(self):
         """Test fetching a specific task"""
@@ -123,22 +169,22 @@ class TaskAPITestCase(BaseAPITestCase):
         url = reverse('filter_tasks') + '?status=pending'
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['status'], 'pending')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['status'], 'pending')
 
         # Filter by task_type
         url = reverse('filter_tasks') + '?task_type=bug'
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['task_type'], 'bug')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['task_type'], 'bug')
 
         # Search by title or description
         url = reverse('filter_tasks') + '?search=test task 1'
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Test Task 1')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Test Task 1')
 
 
 # User API Tests
@@ -148,7 +194,7 @@ class UserAPITestCase(BaseAPITestCase):
         url = reverse('all_users')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_user_detail(self):
         """Test fetching a specific user"""
@@ -222,7 +268,7 @@ class TaskAssignmentTestCase(BaseAPITestCase):
         url = reverse('task_users', kwargs={'task_id': self.task2.id})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
         # Test with invalid task ID
         url = reverse('task_users', kwargs={'task_id': 9999})
@@ -234,7 +280,7 @@ class TaskAssignmentTestCase(BaseAPITestCase):
         url = reverse('user_tasks', kwargs={'user_id': self.user1.id})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
         # Test with invalid user ID
         url = reverse('user_tasks', kwargs={'user_id': 9999})
@@ -256,3 +302,2167 @@ class TaskStatsTestCase(BaseAPITestCase):
         self.assertEqual(response.data['by_status'].get('in_progress', 0), 1)
         self.assertEqual(response.data['by_type'].get('feature', 0), 1)
         self.assertEqual(response.data['by_type'].get('bug', 0), 1)
+
+
+# Keyset Pagination Tests
+class PaginationTestCase(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3, 8):
+            Task.objects.create(title=f'Test Task {i}', description=f'Description for test task {i}')
+
+    def walk(self, url):
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles.extend(task['title'] for task in response.data['results'])
+            url = response.data['next']
+        return titles
+
+    def test_walk_forward(self):
+        """Test that following next links returns every task once, oldest first"""
+        titles = self.walk(reverse('all_tasks') + '?page_size=2')
+        self.assertEqual(titles, [f'Test Task {i}' for i in range(1, 8)])
+
+    def test_walk_backward(self):
+        """Test that previous links lead back to the first page"""
+        url = reverse('all_tasks') + '?page_size=3'
+        first = self.client.get(url).data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        self.assertEqual([t['title'] for t in second['results']], ['Test Task 4', 'Test Task 5', 'Test Task 6'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+        self.assertIsNotNone(back['next'])
+
+    def test_cursor_is_stable_under_inserts(self):
+        """Test that rows created while paging do not shift the remaining pages"""
+        first = self.client.get(reverse('all_tasks') + '?page_size=4').data
+        Task.objects.create(title='Test Task 8', description='Created while paging')
+        second = self.client.get(first['next']).data
+        self.assertEqual(
+            [t['title'] for t in second['results']],
+            ['Test Task 5', 'Test Task 6', 'Test Task 7', 'Test Task 8']
+        )
+
+    def test_page_size_is_capped(self):
+        """Test that page_size is clamped to API_MAX_PAGE_SIZE"""
+        with self.settings(API_MAX_PAGE_SIZE=3):
+            response = self.client.get(reverse('all_tasks') + '?page_size=1000')
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        response = self.client.get(reverse('all_tasks') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filtered_and_related_lists(self):
+        """Test that filter and relation endpoints are paginated too"""
+        url = reverse('filter_tasks') + '?status=pending&page_size=2'
+        self.assertEqual(len(self.walk(url)), 6)
+        url = reverse('user_tasks', kwargs={'user_id': self.user1.id}) + '?page_size=1'
+        self.assertEqual(self.walk(url), ['Test Task 1', 'Test Task 2'])
+        response = self.client.get(reverse('task_users', kwargs={'task_id': self.task2.id}) + '?page_size=1')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(reverse('all_users') + '?page_size=1')
+        self.assertEqual(response.data['results'][0]['email'], 'testuser1@gmail.com')
+
+
+# Query Count Tests
+class QueryCountTestCase(BaseAPITestCase):
+    def assertConstantQueries(self, url, num, grow):
+        """
+        Assert that a GET on url runs exactly num queries, both before and
+        after grow() has added more rows to the result.
+        """
+        for _ in range(2):
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            grow()
+
+    def add_assigned_tasks(self, count=10):
+        for i in range(count):
+            task = Task.objects.create(title=f'Extra Task {i}', description='Extra task')
+            task.assigned_users.add(self.user1, self.user2)
+
+    # Counts include the conditional GET validator queries (tasks/conditional.py)
+    def test_task_list_queries(self):
+        """Test that listing tasks does not run a query per task"""
+        self.assertConstantQueries(reverse('all_tasks') + '?page_size=100', 5, self.add_assigned_tasks)
+
+    def test_task_filter_queries(self):
+        """Test that filtering tasks does not run a query per task"""
+        url = reverse('filter_tasks') + '?status=pending&page_size=100'
+        self.assertConstantQueries(url, 5, self.add_assigned_tasks)
+
+    def test_user_tasks_queries(self):
+        """Test that listing a user's tasks does not run a query per task"""
+        url = reverse('user_tasks', kwargs={'user_id': self.user1.id}) + '?page_size=100'
+        self.assertConstantQueries(url, 7, self.add_assigned_tasks)
+
+    def test_assigned_users_columns(self):
+        """Test that the assigned users prefetch only selects serialized columns"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('all_tasks'))
+        self.assertNotIn('password', ctx.captured_queries[-1]['sql'])
+
+
+# Export API Tests
+class ExportTestCase(BaseAPITestCase):
+    def test_task_export_json(self):
+        """Test that the JSON export matches the detail serializer output"""
+        response = self.client.get(reverse('export_tasks') + '?chunk_size=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        exported = json.loads(b''.join(response.streaming_content))
+        listed = self.client.get(reverse('all_tasks')).json()['results']
+        self.assertEqual(exported, listed)
+
+    def test_task_export_order(self):
+        """Test that exports are in the (created_at, id) order of the list endpoints"""
+        Task.objects.filter(id=self.task1.id).update(created_at=timezone.now() + timedelta(days=1))
+        for query in ['', '?fields=id,title']:
+            exported = json.loads(b''.join(self.client.get(reverse('export_tasks') + query).streaming_content))
+            self.assertEqual([task['id'] for task in exported], [self.task2.id, self.task1.id], query)
+
+    def test_task_export_ndjson(self):
+        """Test exporting tasks as newline delimited JSON"""
+        response = self.client.get(reverse('export_tasks') + '?output=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Test Task 1', 'Test Task 2'])
+        self.assertEqual(len(json.loads(lines[1])['assigned_users']), 2)
+
+    def test_task_export_queries(self):
+        """Test that assigned users are fetched once per chunk"""
+        # One query streaming the tasks, plus one per chunk of one task
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('export_tasks') + '?chunk_size=1')
+            b''.join(response.streaming_content)
+
+    def test_user_export(self):
+        """Test exporting users"""
+        response = self.client.get(reverse('export_users'))
+        exported = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([user['email'] for user in exported], ['testuser1@gmail.com', 'testuser2@gmail.com'])
+
+        response = self.client.get(reverse('export_users') + '?output=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Task Counter Tests
+class TaskCounterTestCase(BaseAPITestCase):
+    def assertCountersInSync(self):
+        self.assertEqual(counters.verify(), {})
+
+    def test_write_apis_keep_counters_in_sync(self):
+        """Test that create, update and delete adjust the counters"""
+        self.client.post(reverse('create_task'), {'title': 'New', 'description': 'New', 'task_type': 'bug'}, format='json')
+        self.assertCountersInSync()
+        self.client.patch(reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': 'completed'}, format='json')
+        self.assertCountersInSync()
+        self.client.delete(reverse('delete_task', kwargs={'task_id': self.task2.id}))
+        self.assertCountersInSync()
+
+        response = self.client.get(reverse('task_stats'))
+        self.assertEqual(response.data, {
+            'total_tasks': 2,
+            'by_status': {'completed': 1, 'pending': 1},
+            'by_type': {'bug': 1, 'feature': 1},
+        })
+
+    def test_stats_do_not_scan_tasks(self):
+        """Test that the stats API only reads the counters table"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('task_stats'))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('"tasks_task"', ctx.captured_queries[0]['sql'])
+
+    def test_orm_writes_keep_counters_in_sync(self):
+        """Test that saves and deletes outside the APIs adjust the counters"""
+        self.assertCountersInSync()
+        task = Task.objects.only('id', 'title').get(id=self.task1.id)
+        task.status = 'completed'
+        task.save()
+        self.assertCountersInSync()
+        Task.objects.filter(task_type='bug').delete()
+        self.assertCountersInSync()
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command detects and repairs drift"""
+        TaskCounter.objects.filter(dimension='status', value='pending').update(count=42)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_task_stats', verify=True, stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_task_stats', stdout=StringIO())
+        self.assertCountersInSync()
+
+
+# Query Plan Tests
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTestCase(BaseAPITestCase):
+    # Tables small enough by construction that scanning them is fine
+    SCANNABLE_TABLES = {'tasks_taskcounter'}
+
+    def capture_plans(self, url, etag=None):
+        """
+        GET url and return (sql, plan lines) for every SELECT it ran, validator
+        queries included. Plan lines are indented two spaces per nesting level.
+        """
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url, **headers)
+        self.assertIn(response.status_code, (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED))
+        plans = []
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                depths, plan = {0: -1}, []
+                for node, parent, _, detail in cursor.fetchall():
+                    depths[node] = depths.get(parent, -1) + 1
+                    plan.append('  ' * depths[node] + detail)
+                plans.append((sql, plan))
+        return plans
+
+    def assertNoFullScans(self, url, etag=None):
+        """
+        Fail on any SCAN that is not bounded: allowed are the small tables, one
+        full-text MATCH, and an index read in order up to the LIMIT of a
+        keyset page. Nothing is scanned once per row of a correlated subquery.
+        """
+        for sql, plan in self.capture_plans(url, etag):
+            # The index gives the page order, so the scan stops at the LIMIT
+            ordered_page = ' LIMIT ' in sql and not any('TEMP B-TREE FOR ORDER BY' in line for line in plan)
+            correlated = None
+            for line in plan:
+                depth, detail = (len(line) - len(line.lstrip())) // 2, line.strip()
+                if correlated is not None and depth <= correlated:
+                    correlated = None
+                if detail.startswith('CORRELATED '):
+                    correlated = depth
+                match = re.fullmatch(r'SCAN (?:TABLE )?(\w+)(.*)', detail)
+                if not match or match.group(1) in self.SCANNABLE_TABLES:
+                    continue
+                if correlated is None and depth == 0:
+                    if re.match(r' VIRTUAL TABLE INDEX \d+:M', match.group(2)):
+                        continue
+                    if ordered_page and re.match(r' USING (?:COVERING )?INDEX ', match.group(2)):
+                        continue
+                self.fail(f'{url} scans {match.group(1)}:\n{sql}\n' + '\n'.join(plan))
+
+    def test_task_list_plan(self):
+        """Test that task list pages are read through an index"""
+        self.assertNoFullScans(reverse('all_tasks'))
+        self.assertNoFullScans(self.client.get(reverse('all_tasks') + '?page_size=1').data['next'])
+
+    def test_task_filter_plans(self):
+        """Test that every filter combination is served by an index"""
+        for query in ['', 'status=pending', 'task_type=bug', 'status=pending&task_type=feature']:
+            self.assertNoFullScans(reverse('filter_tasks') + '?' + query)
+
+    def test_task_search_plan(self):
+        """Test that search goes through the full-text index, matching once per query"""
+        for sql, plan in self.capture_plans(reverse('filter_tasks') + '?search=test'):
+            self.assertFalse([line for line in plan if line.startswith('SCAN tasks_task ')], plan)
+            # A correlated MATCH would run the full-text query again for every match
+            self.assertLessEqual(sql.count(' MATCH '), 1, sql)
+            self.assertFalse([line for line in plan if 'CORRELATED' in line], plan)
+        for query in ['search=test', 'search=test&status=pending&task_type=bug']:
+            self.assertNoFullScans(reverse('filter_tasks') + '?' + query)
+        self.assertNoFullScans(self.client.get(reverse('filter_tasks') + '?search=test&page_size=1').data['next'])
+
+    def test_validator_plans(self):
+        """Test that revalidating a response, answered 304 from the validators alone, reads no more than an index"""
+        for name, kwargs, query in [
+            ('all_tasks', {}, ''),
+            ('filter_tasks', {}, '?status=pending'),
+            ('filter_tasks', {}, '?search=test'),
+            ('all_users', {}, ''),
+            ('user_tasks', {'user_id': self.user1.id}, ''),
+            ('task_detail', {'task_id': self.task1.id}, ''),
+            ('task_users', {'task_id': self.task2.id}, ''),
+        ]:
+            url = reverse(name, kwargs=kwargs) + query
+            self.assertNoFullScans(url, self.client.get(url)['ETag'])
+
+    def test_task_detail_plans(self):
+        """Test detail and assignment lookups"""
+        self.assertNoFullScans(reverse('task_detail', kwargs={'task_id': self.task1.id}))
+        self.assertNoFullScans(reverse('task_users', kwargs={'task_id': self.task2.id}))
+        self.assertNoFullScans(reverse('task_stats'))
+
+    def test_user_plans(self):
+        """Test user list, detail and assigned tasks lookups"""
+        self.assertNoFullScans(reverse('all_users'))
+        self.assertNoFullScans(reverse('user_detail', kwargs={'user_id': self.user1.id}))
+        self.assertNoFullScans(reverse('user_tasks', kwargs={'user_id': self.user1.id}))
+
+    def test_live_row_plans(self):
+        """Test that queries of the default managers use the partial indexes over live rows"""
+        deletion.delete_tasks([self.task2.id])
+        plans = self.capture_plans(reverse('all_tasks'))
+        self.assertTrue([line for _, plan in plans for line in plan if 'task_created_idx' in line], plans)
+        self.assertNoFullScans(reverse('filter_tasks') + '?status=pending&task_type=feature')
+
+
+# Full-text Search Tests
+class SearchTestCase(BaseAPITestCase):
+    def search(self, term, **params):
+        params['search'] = term
+        response = self.client.get(reverse('filter_tasks'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task['title'] for task in response.data['results']]
+
+    def test_prefix_matching(self):
+        """Test that every term is matched as a word prefix"""
+        self.assertEqual(len(self.search('descr')), 2)
+        self.assertEqual(self.search('desc TASK 2'), ['Test Task 2'])
+        self.assertEqual(self.search('scription'), [])
+
+    def test_ranking(self):
+        """Test that better matches are returned first"""
+        Task.objects.create(title='Login page', description='Login fails on the login page after a login timeout')
+        Task.objects.create(title='Dashboard', description='Add a login link')
+        self.assertEqual(self.search('login'), ['Login page', 'Dashboard'])
+        self.assertEqual(self.search('login', page_size=1), ['Login page'])
+
+        first = self.client.get(reverse('filter_tasks'), {'search': 'login', 'page_size': 1}).data
+        second = self.client.get(first['next']).data
+        self.assertEqual([task['title'] for task in second['results']], ['Dashboard'])
+        self.assertIsNone(second['next'])
+
+    def test_index_follows_writes(self):
+        """Test that the index is kept in sync with updates and deletes"""
+        self.task1.title = 'Renamed'
+        self.task1.save()
+        self.assertEqual(self.search('renamed'), ['Renamed'])
+        self.task1.delete()
+        self.assertEqual(self.search('renamed'), [])
+
+    def test_operators_are_literal(self):
+        """Test that FTS syntax in the search term cannot break the query"""
+        self.assertEqual(self.search('"task" OR NOT*'), [])
+        self.assertEqual(self.search('***'), [])
+
+    def test_combined_with_filters(self):
+        """Test search together with the status filter"""
+        self.assertEqual(self.search('test', status='in_progress'), ['Test Task 2'])
+
+    def test_rebuild_command(self):
+        """Test rebuilding the index"""
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('test')), 2)
+
+
+# Bulk Task API Tests
+class BulkTaskTestCase(BaseAPITestCase):
+    def test_bulk_create(self):
+        """Test creating tasks in bulk with per-item errors"""
+        data = [
+            {'title': 'Bulk 1', 'description': 'First', 'task_type': 'bug'},
+            {'title': '', 'description': 'Missing title'},
+            {'title': 'Bulk 2', 'description': 'Second'},
+        ]
+        response = self.client.post(reverse('bulk_create_tasks'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertIn('title', response.data['errors'][0]['errors'])
+        self.assertEqual(
+            list(Task.objects.filter(id__in=response.data['ids']).values_list('title', flat=True)),
+            ['Bulk 1', 'Bulk 2']
+        )
+        self.assertEqual(counters.verify(), {})
+
+        response = self.client.post(reverse('bulk_create_tasks'), {'title': 'Not a list'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(BULK_MAX_ITEMS=1):
+            response = self.client.post(reverse('bulk_create_tasks'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_queries(self):
+        """Test that a bulk create does not run a query per task"""
+        data = [{'title': f'Bulk {i}', 'description': 'Bulk'} for i in range(200)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('bulk_create_tasks'), data, format='json')
+        self.assertEqual(response.data['created'], 200)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "tasks_task" ')]
+        # Batched by the backend's bound parameter limit, not one per task
+        self.assertLessEqual(len(inserts), 2)
+
+    def test_bulk_status_update(self):
+        """Test updating statuses in bulk"""
+        data = [
+            {'id': self.task1.id, 'status': 'completed'},
+            {'id': self.task2.id, 'status': 'invalid'},
+            {'id': 9999, 'status': 'pending'},
+            {'id': self.task2.id, 'status': 'completed'},
+        ]
+        response = self.client.patch(reverse('bulk_update_tasks'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ids'], [self.task1.id, self.task2.id])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.task1.refresh_from_db()
+        self.assertEqual(self.task1.status, 'completed')
+        self.assertIsNotNone(self.task1.completed_at)
+        self.assertEqual(counters.verify(), {})
+
+        # Moving away from completed keeps completed_at, as TaskUpdateView does
+        response = self.client.patch(reverse('bulk_update_tasks'), [{'id': self.task1.id, 'status': 'pending'}], format='json')
+        self.task1.refresh_from_db()
+        self.assertEqual(self.task1.status, 'pending')
+        self.assertIsNotNone(self.task1.completed_at)
+
+
+# Bulk Assignment API Tests
+class BulkAssignmentTestCase(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task3 = Task.objects.create(title='Test Task 3', description='Description for test task 3')
+
+    def assigned(self, task):
+        return set(task.assigned_users.values_list('id', flat=True))
+
+    def test_cartesian_assign(self):
+        """Test assigning every listed user to every listed task"""
+        data = {'task_ids': [self.task1.id, self.task3.id, 9999], 'user_ids': [self.user1.id, self.user2.id]}
+        response = self.client.post(reverse('bulk_assign_tasks'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'missing_task_ids': [9999],
+            'missing_user_ids': [],
+            'assigned': 3,
+            'already_assigned': 1,
+        })
+        self.assertEqual(self.assigned(self.task1), {self.user1.id, self.user2.id})
+        self.assertEqual(self.assigned(self.task3), {self.user1.id, self.user2.id})
+
+    def test_pairs_and_unassign(self):
+        """Test explicit pairs and unassignment"""
+        data = {'pairs': [{'task_id': self.task3.id, 'user_id': self.user2.id}]}
+        response = self.client.post(reverse('bulk_assign_tasks'), data, format='json')
+        self.assertEqual(response.data['assigned'], 1)
+        self.assertEqual(self.assigned(self.task3), {self.user2.id})
+
+        data = {'task_ids': [self.task2.id, self.task3.id], 'user_ids': [self.user2.id]}
+        response = self.client.post(reverse('bulk_unassign_tasks'), data, format='json')
+        self.assertEqual(response.data['unassigned'], 2)
+        self.assertEqual(self.assigned(self.task2), {self.user1.id})
+        self.assertEqual(self.assigned(self.task3), set())
+
+    def test_invalid_payloads(self):
+        """Test that the two input modes cannot be mixed or half given"""
+        for data in [
+            {'task_ids': [self.task1.id]},
+            {'task_ids': [self.task1.id], 'user_ids': [self.user1.id], 'pairs': []},
+            {},
+        ]:
+            response = self.client.post(reverse('bulk_assign_tasks'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
+    def test_assign_queries(self):
+        """Test that the number of queries does not grow with the number of pairs"""
+        users = [User(name=f'User {i}', email=f'user{i}@example.com', mobile='1') for i in range(50)]
+        User.objects.bulk_create(users)
+        tasks = Task.objects.bulk_create(Task(title=f'Task {i}', description='Bulk') for i in range(20))
+        data = {'task_ids': [task.id for task in tasks], 'user_ids': list(User.objects.values_list('id', flat=True))}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('bulk_assign_tasks'), data, format='json')
+        self.assertEqual(response.data['assigned'], 20 * 52)
+        # resolve (2), existing rows, INSERT, updated_at UPDATE, change log INSERT, response, and per 50 users
+        # a summary UPDATE, plus SELECT, INSERT and UPDATE for users without a summary yet
+        self.assertLessEqual(len([q for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]), 8 + 2 * 4)
+
+    def test_m2m_changed_is_sent(self):
+        """Test that bulk assignment notifies m2m_changed receivers like add() does"""
+        received = []
+
+        def receiver(sender, instance, action, pk_set, **kwargs):
+            received.append((action, instance.id, pk_set))
+
+        m2m_changed.connect(receiver, sender=Task.assigned_users.through)
+        try:
+            self.client.post(reverse('bulk_assign_tasks'), {'task_ids': [self.task3.id], 'user_ids': [self.user1.id]}, format='json')
+        finally:
+            m2m_changed.disconnect(receiver, sender=Task.assigned_users.through)
+        self.assertEqual(received, [('pre_add', self.task3.id, {self.user1.id}), ('post_add', self.task3.id, {self.user1.id})])
+
+    def test_user_assign(self):
+        """Test assigning a user to tasks"""
+        data = {'user_id': self.user2.id, 'task_ids': [self.task1.id, self.task3.id]}
+        response = self.client.post(reverse('assign_user'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'testuser2@gmail.com')
+        self.assertEqual(set(self.user2.assigned_tasks.values_list('id', flat=True)), {self.task1.id, self.task2.id, self.task3.id})
+
+        response = self.client.post(reverse('assign_user'), {'user_id': 9999, 'task_ids': [self.task1.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('assign_user'), {'user_id': self.user1.id, 'task_ids': [9999]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# Response Cache Tests
+class ResponseCacheTestCase(BaseAPITestCase):
+    def get(self, name, **kwargs):
+        response = self.client.get(reverse(name, kwargs=kwargs))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_hits_and_misses(self):
+        """Test that a repeated read is served from the cache without queries"""
+        before = cache.get_stats()
+        self.get('task_detail', task_id=self.task2.id)
+        with self.assertNumQueries(0):
+            data = self.get('task_detail', task_id=self.task2.id)
+        self.assertEqual(len(data['assigned_users']), 2)
+        after = cache.get_stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(self.client.get(reverse('cache_stats')).data['hits'], after['hits'])
+
+    def test_task_writes_invalidate(self):
+        """Test that task updates and deletes are visible immediately"""
+        self.get('task_detail', task_id=self.task1.id)
+        self.get('user_tasks', user_id=self.user1.id)
+        self.client.patch(reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': 'completed'}, format='json')
+        self.assertEqual(self.get('task_detail', task_id=self.task1.id)['status'], 'completed')
+        self.assertEqual(self.get('user_tasks', user_id=self.user1.id)['results'][0]['status'], 'completed')
+
+        self.client.patch(reverse('bulk_update_tasks'), [{'id': self.task1.id, 'status': 'in_progress'}], format='json')
+        self.assertEqual(self.get('task_detail', task_id=self.task1.id)['status'], 'in_progress')
+
+        self.client.delete(reverse('delete_task', kwargs={'task_id': self.task1.id}))
+        response = self.client.get(reverse('task_detail', kwargs={'task_id': self.task1.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(self.get('user_tasks', user_id=self.user1.id)['results']), 1)
+
+    def test_user_writes_invalidate_nested_data(self):
+        """Test that a renamed user shows up in the tasks embedding them"""
+        self.get('task_detail', task_id=self.task2.id)
+        self.get('user_tasks', user_id=self.user2.id)
+        self.get('user_detail', user_id=self.user1.id)
+        self.client.put(reverse('update_user', kwargs={'user_id': self.user1.id}), {'name': 'Renamed'}, format='json')
+        self.assertEqual(self.get('user_detail', user_id=self.user1.id)['name'], 'Renamed')
+        names = {user['name'] for user in self.get('task_detail', task_id=self.task2.id)['assigned_users']}
+        self.assertIn('Renamed', names)
+        task = self.get('user_tasks', user_id=self.user2.id)['results'][0]
+        self.assertIn('Renamed', {user['name'] for user in task['assigned_users']})
+
+    def test_assignment_changes_invalidate(self):
+        """Test that assigning and unassigning users is visible from both sides"""
+        self.assertEqual(len(self.get('task_users', task_id=self.task1.id)['results']), 1)
+        self.assertEqual(len(self.get('user_tasks', user_id=self.user2.id)['results']), 1)
+        self.get('user_tasks', user_id=self.user1.id)
+
+        self.client.post(reverse('assign_task'), {'task_id': self.task1.id, 'user_ids': [self.user2.id]}, format='json')
+        self.assertEqual(len(self.get('task_users', task_id=self.task1.id)['results']), 2)
+        self.assertEqual(len(self.get('user_tasks', user_id=self.user2.id)['results']), 2)
+        # user1 did not change, but the users nested in their task did
+        task = self.get('user_tasks', user_id=self.user1.id)['results'][0]
+        self.assertEqual(len(task['assigned_users']), 2)
+
+        self.user2.assigned_tasks.clear()
+        self.assertEqual(len(self.get('user_tasks', user_id=self.user2.id)['results']), 0)
+        self.assertEqual(len(self.get('task_users', task_id=self.task1.id)['results']), 1)
+
+    def test_eviction_counter(self):
+        """Test that evictions from the local memory cache are counted"""
+        lru = cache.LRUCache('test-evictions', {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+        before = cache.get_stats()['evictions']
+        for i in range(5):
+            lru.set(f'key{i}', i)
+        self.assertGreater(cache.get_stats()['evictions'], before)
+
+
+# Conditional GET Tests
+class ConditionalGetTestCase(BaseAPITestCase):
+    def get(self, name, etag=None, **kwargs):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(name, kwargs=kwargs), **headers)
+
+    def assertNotModified(self, name, **kwargs):
+        etag = self.get(name, **kwargs)['ETag']
+        response = self.get(name, etag=etag, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        return etag
+
+    def assertModified(self, name, etag, **kwargs):
+        response = self.get(name, etag=etag, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_validators_are_set(self):
+        """Test that read endpoints return an ETag, and detail endpoints a Last-Modified header"""
+        for name, kwargs, last_modified in [
+            ('task_detail', {'task_id': self.task1.id}, True),
+            ('user_detail', {'user_id': self.user1.id}, True),
+            ('task_users', {'task_id': self.task2.id}, True),
+            ('user_tasks', {'user_id': self.user1.id}, False),
+            ('all_tasks', {}, False),
+            ('all_users', {}, False),
+            ('filter_tasks', {}, False),
+        ]:
+            response = self.get(name, **kwargs)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, name)
+            self.assertTrue(response.has_header('ETag'), name)
+            self.assertEqual(response.has_header('Last-Modified'), last_modified, name)
+
+    def test_list_validated_by_etag_only(self):
+        """Test that lists ignore If-Modified-Since, and that soft deletes change their ETag"""
+        later = http_date(time.time() + 60)
+        response = self.client.get(reverse('all_tasks'), HTTP_IF_MODIFIED_SINCE=later)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        url = reverse('task_detail', kwargs={'task_id': self.task1.id})
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=later).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        listing = self.assertNotModified('all_tasks')
+        self.client.delete(reverse('delete_task', kwargs={'task_id': self.task2.id}))
+        self.assertModified('all_tasks', listing)
+
+    def test_not_modified_skips_serialization(self):
+        """Test that a matching If-None-Match is answered from the validator queries alone"""
+        etag = self.get('all_tasks')['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get('all_tasks', etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(any('tasks_task_assigned_users' in q['sql'] for q in ctx.captured_queries))
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+    def test_list_validators_skip_task_rows(self):
+        """Test that list validators read version values only, whatever the filter"""
+        for name, kwargs, query in [
+            ('filter_tasks', {}, '?search=test&status=pending'),
+            ('user_tasks', {'user_id': self.user1.id}, ''),
+            ('all_users', {}, ''),
+        ]:
+            url = reverse(name, kwargs=kwargs) + query
+            etag = self.client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, name)
+            for captured in ctx.captured_queries:
+                self.assertNotIn('"tasks_task"', captured['sql'], name)
+                self.assertNotIn('COUNT(', captured['sql'], name)
+
+        users = self.assertNotModified('all_users')
+        deletion.delete_users([self.user2.id])
+        self.assertModified('all_users', users)
+
+    def test_not_modified_from_response_cache(self):
+        """Test that cached detail responses answer 304 without queries"""
+        etag = self.get('task_detail', task_id=self.task2.id)['ETag']
+        with self.assertNumQueries(0):
+            response = self.get('task_detail', etag=etag, task_id=self.task2.id)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_task_update_changes_etag(self):
+        """Test that updating a task changes the validators of the views rendering it"""
+        detail = self.assertNotModified('task_detail', task_id=self.task1.id)
+        tasks = self.assertNotModified('user_tasks', user_id=self.user1.id)
+        listing = self.assertNotModified('all_tasks')
+        self.client.patch(reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': 'completed'}, format='json')
+        self.assertModified('task_detail', detail, task_id=self.task1.id)
+        self.assertModified('user_tasks', tasks, user_id=self.user1.id)
+        self.assertModified('all_tasks', listing)
+
+    def test_assignment_changes_etag(self):
+        """Test that assigning and unassigning users changes the task validators"""
+        detail = self.assertNotModified('task_detail', task_id=self.task1.id)
+        users = self.assertNotModified('task_users', task_id=self.task1.id)
+        self.client.post(reverse('assign_task'), {'task_id': self.task1.id, 'user_ids': [self.user2.id]}, format='json')
+        self.assertModified('task_detail', detail, task_id=self.task1.id)
+        self.assertModified('task_users', users, task_id=self.task1.id)
+
+        tasks = self.assertNotModified('user_tasks', user_id=self.user2.id)
+        self.user2.assigned_tasks.remove(self.task1)
+        self.assertModified('user_tasks', tasks, user_id=self.user2.id)
+
+    def test_user_rename_changes_etag(self):
+        """Test that renaming a user changes the validators of the tasks embedding them"""
+        detail = self.assertNotModified('task_detail', task_id=self.task2.id)
+        users = self.assertNotModified('all_users')
+        self.client.put(reverse('update_user', kwargs={'user_id': self.user2.id}), {'name': 'Renamed'}, format='json')
+        self.assertModified('task_detail', detail, task_id=self.task2.id)
+        self.assertModified('all_users', users)
+
+    def test_query_params_change_etag(self):
+        """Test that different filters and pages have different ETags"""
+        etags = {
+            self.client.get(reverse('filter_tasks'), params)['ETag']
+            for params in [{}, {'status': 'pending'}, {'task_type': 'bug'}, {'search': 'task'}]
+        }
+        self.assertEqual(len(etags), 4)
+
+    def test_missing_object(self):
+        """Test that a missing object still returns 404"""
+        response = self.get('task_detail', task_id=9999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# Async API Tests
+class AsyncAPITestCase(BaseAPITestCase):
+    def async_get(self, url, **extra):
+        return async_to_sync(self.async_client.get)(url, **extra)
+
+    def assertSameResponse(self, name, async_name, kwargs=None, query=''):
+        expected = self.client.get(reverse(name, kwargs=kwargs) + query)
+        response = self.async_get(reverse(async_name, kwargs=kwargs) + query)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+        self.assertEqual(response.content.replace(b'/async/', b'/'), expected.content)
+        return response
+
+    def test_same_responses(self):
+        """Test that the async views return the same bodies as the sync views"""
+        for name, kwargs, query in [
+            ('all_tasks', None, ''),
+            ('all_tasks', None, '?page_size=1'),
+            ('all_users', None, ''),
+            ('filter_tasks', None, '?status=pending'),
+            ('filter_tasks', None, '?search=task+2'),
+            ('task_stats', None, ''),
+            ('task_detail', {'task_id': self.task2.id}, ''),
+            ('task_detail', {'task_id': 9999}, ''),
+            ('user_detail', {'user_id': self.user1.id}, ''),
+            ('user_detail', {'user_id': 9999}, ''),
+        ]:
+            with self.subTest(name=name, kwargs=kwargs, query=query):
+                self.assertSameResponse(name, 'async_' + name, kwargs, query)
+
+    def test_pagination(self):
+        """Test that async list pages link to each other like the sync ones"""
+        data = json.loads(self.async_get(reverse('async_all_tasks') + '?page_size=1').content)
+        self.assertEqual([task['id'] for task in data['results']], [self.task1.id])
+        data = json.loads(self.async_get(data['next']).content)
+        self.assertEqual([task['id'] for task in data['results']], [self.task2.id])
+        self.assertIsNone(data['next'])
+
+        response = self.async_get(reverse('async_all_tasks') + '?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_read_only(self):
+        """Test that the async views only accept reads"""
+        response = async_to_sync(self.async_client.post)(reverse('async_all_tasks'))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_benchmark_clients(self):
+        """Test the in-process WSGI and ASGI benchmark clients"""
+        url = reverse('task_stats')
+        self.assertEqual(benchmarking.call_wsgi(get_wsgi_application(), url), 200)
+        self.assertEqual(async_to_sync(benchmarking.call_asgi)(get_asgi_application(), url), 200)
+        self.assertEqual(async_to_sync(benchmarking.call_asgi)(get_asgi_application(), '/api/missing/'), 404)
+
+        summary = benchmarking.summarize([0.001 * i for i in range(1, 101)], 2.0)
+        self.assertEqual(summary['requests_per_second'], 50.0)
+        self.assertEqual(summary['p50_ms'], 50.0)
+        self.assertEqual(summary['p99_ms'], 99.0)
+
+
+# Fast Path Serializer Tests
+class FastSerializerTestCase(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task1.set_status('completed')
+        self.task1.save()
+        Task.objects.create(title='Unassigned \u2028 t\u00e2che', description='Ünïcödé "quoted" \\ text')
+
+    def assertSameOutput(self, serializer_class, queryset):
+        values_serializer = get_values_serializer(serializer_class)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        rows = list(values_serializer.values(queryset))
+        self.assertEqual(FastJSONRenderer().render(values_serializer.serialize(rows)), expected)
+        self.assertEqual(JSONRenderer().render(values_serializer.serialize(rows)), expected)
+
+    def test_same_output(self):
+        """Test that the values() fast path renders the same bytes as the DRF serializers"""
+        self.assertSameOutput(TaskDetailSerializer, Task.objects.order_by('id'))
+        self.assertSameOutput(TaskDetailSerializer, self.user2.assigned_tasks.order_by('id'))
+        self.assertSameOutput(TaskDetailSerializer, Task.objects.none())
+        self.assertSameOutput(UserSerializer, User.objects.order_by('id'))
+
+    def test_views_match_serializers(self):
+        """Test that list views render what the serializers would"""
+        response = self.client.get(reverse('all_tasks'))
+        tasks = TaskDetailSerializer(Task.objects.order_by('created_at', 'id'), many=True).data
+        self.assertEqual(json.loads(response.content)['results'], json.loads(JSONRenderer().render(tasks)))
+
+    def test_unsupported_serializers(self):
+        """Test that serializers the fast path cannot reproduce are not compiled"""
+        self.assertIsNone(get_values_serializer(TaskAssignSerializer))
+        self.assertIsNotNone(get_values_serializer(TaskDetailSerializer))
+
+    def test_renderer(self):
+        """Test that FastJSONRenderer matches JSONRenderer, including indented output"""
+        data = {'text': 'a\u2028b\u2029c \u00e9 "q"', 'list': [1, None, True], 'nested': {'x': []}}
+        for media_type in [None, 'application/json; indent=2']:
+            self.assertEqual(FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+# Sparse Fieldset Tests
+class SparseFieldsTestCase(BaseAPITestCase):
+    def get(self, name, query, kwargs=None):
+        response = self.client.get(reverse(name, kwargs=kwargs) + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_list_fields(self):
+        """Test that only the requested fields are selected and rendered"""
+        with CaptureQueriesContext(connection) as ctx:
+            tasks = self.get('all_tasks', '?fields=id,status')['results']
+        self.assertEqual([list(task) for task in tasks], [['id', 'status'], ['id', 'status']])
+        sql = ctx.captured_queries[-1]['sql']
+        self.assertNotIn('description', sql)
+        self.assertFalse(any('tasks_task_assigned_users' in q['sql'] for q in ctx.captured_queries))
+
+        users = self.get('all_users', '?fields=email')['results']
+        self.assertEqual(users, [{'email': 'testuser1@gmail.com'}, {'email': 'testuser2@gmail.com'}])
+
+    def test_assigned_user_ids(self):
+        """Test that assigned users are rendered as ids unless expanded"""
+        with CaptureQueriesContext(connection) as ctx:
+            task = self.get('task_detail', '?fields=id,assigned_users', {'task_id': self.task2.id})
+        self.assertEqual(task, {'id': self.task2.id, 'assigned_users': [self.user1.id, self.user2.id]})
+        self.assertFalse(any('"tasks_user"."name"' in q['sql'] for q in ctx.captured_queries))
+
+        tasks = self.get('user_tasks', '?fields=title,assigned_users', {'user_id': self.user2.id})['results']
+        self.assertEqual(tasks, [{'title': 'Test Task 2', 'assigned_users': [self.user1.id, self.user2.id]}])
+
+        task = self.get('task_detail', '?fields=assigned_users&expand=assigned_users', {'task_id': self.task1.id})
+        self.assertEqual(task['assigned_users'][0]['email'], 'testuser1@gmail.com')
+
+    def test_default_is_unchanged(self):
+        """Test that without fields every field is rendered with users embedded"""
+        task = self.get('task_detail', '?expand=assigned_users', {'task_id': self.task1.id})
+        self.assertEqual(task, self.get('task_detail', '', {'task_id': self.task1.id}))
+        self.assertEqual(task['assigned_users'][0]['name'], 'Test User 1')
+
+    def test_unknown_fields(self):
+        """Test that unknown fields and relations are rejected"""
+        for query in ['?fields=id,password', '?fields=secret', '?expand=title']:
+            response = self.client.get(reverse('all_tasks') + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+            self.assertIn('message', response.data)
+        response = self.client.get(reverse('user_detail', kwargs={'user_id': self.user1.id}) + '?fields=password')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fast_path_matches_serializer(self):
+        """Test that sparse fieldsets render the same through the values() fast path"""
+        for query in ['?fields=id,status', '?fields=title,assigned_users', '?fields=id,assigned_users&expand=assigned_users']:
+            options = TaskDetailSerializer.get_field_options(QueryDict(query[1:]))
+            queryset = Task.objects.order_by('id')
+            values_serializer = get_values_serializer(TaskDetailSerializer, **options)
+            expected = TaskDetailSerializer(TaskDetailSerializer.setup_eager_loading(queryset, **options), many=True, **options)
+            rows = values_serializer.serialize(list(values_serializer.values(queryset)))
+            self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected.data), query)
+
+    def test_export_and_async_views(self):
+        """Test that exports and async views accept sparse fieldsets too"""
+        response = self.client.get(reverse('export_tasks') + '?output=ndjson&fields=id,assigned_users')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[1]), {'id': self.task2.id, 'assigned_users': [self.user1.id, self.user2.id]})
+
+        query = '?fields=id,assigned_users'
+        expected = self.client.get(reverse('task_detail', kwargs={'task_id': self.task2.id}) + query)
+        response = async_to_sync(self.async_client.get)(reverse('async_task_detail', kwargs={'task_id': self.task2.id}) + query)
+        self.assertEqual(response.content, expected.content)
+
+    def test_cached_ids_are_invalidated(self):
+        """Test that cached responses with assigned user ids see assignment changes"""
+        query = '?fields=assigned_users'
+        self.get('task_detail', query, {'task_id': self.task1.id})
+        self.task1.assigned_users.add(self.user2)
+        task = self.get('task_detail', query, {'task_id': self.task1.id})
+        self.assertEqual(sorted(task['assigned_users']), [self.user1.id, self.user2.id])
+
+
+# Database Settings Tests
+class DatabaseSettingsTestCase(BaseAPITestCase):
+    def test_sqlite_pragmas(self):
+        """Test that new SQLite connections are configured from SQLITE_PRAGMAS"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = connections['default'].__class__(
+                connections.configure_settings({'default': {
+                    'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(directory, 'test.sqlite3')
+                }})['default'],
+                alias='pragma_test'
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['journal_mode'])
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+                    cursor.execute('PRAGMA synchronous')
+                    # NORMAL
+                    self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                wrapper.close()
+
+
+# Read Replica Routing Tests
+# Test cases run inside a transaction, where every read goes to default, so
+# these run without one.
+class ReplicaRouterTestCase(SimpleTestCase):
+    def route(self, router, pinned=False, reads=2):
+        token = router.begin_request(pinned)
+        try:
+            return [router.db_for_read(Task) for _ in range(reads)]
+        finally:
+            router.end_request(token)
+
+    def test_round_robin(self):
+        """Test that requests take turns on the replicas and stick to one"""
+        router = ReplicaRouter(['replica_0', 'replica_1'], 'round_robin')
+        routes = [self.route(router) for _ in range(3)]
+        self.assertEqual(routes, [['replica_0'] * 2, ['replica_1'] * 2, ['replica_0'] * 2])
+        self.assertEqual(router.load, {'replica_0': 0, 'replica_1': 0})
+
+    def test_least_loaded(self):
+        """Test that a request reads from the replica serving the fewest requests"""
+        router = ReplicaRouter(['replica_0', 'replica_1'], 'least_loaded')
+        router.load['replica_0'] = 2
+        self.assertEqual(self.route(router), ['replica_1'] * 2)
+        router.load['replica_1'] = 3
+        self.assertEqual(self.route(router), ['replica_0'] * 2)
+
+    def test_primary_reads(self):
+        """Test that pinned requests, transactions and code outside requests read from default"""
+        router = ReplicaRouter(['replica_0'], 'round_robin')
+        self.assertEqual(router.db_for_read(Task), 'default')
+        self.assertEqual(self.route(router, pinned=True), ['default'] * 2)
+        self.assertEqual(self.route(ReplicaRouter([], 'round_robin')), ['default'] * 2)
+        self.assertEqual(router.db_for_write(Task), 'default')
+        connection.in_atomic_block = True
+        try:
+            self.assertEqual(self.route(router), ['default'] * 2)
+        finally:
+            connection.in_atomic_block = False
+        with self.assertRaises(ValueError):
+            ReplicaRouter(['replica_0'], 'random')
+
+    def test_read_your_writes(self):
+        """Test that a client is pinned to default after a write request"""
+        router = ReplicaRouter(['replica_0'], 'round_robin')
+        middleware = ReplicaPinningMiddleware(lambda request: HttpResponse(router.db_for_read(Task)))
+        middleware.router = router
+        factory = RequestFactory()
+
+        self.assertEqual(middleware(factory.get('/')).content, b'replica_0')
+        response = middleware(factory.post('/'))
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        request = factory.get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = cookie.value
+        response = middleware(request)
+        self.assertEqual(response.content, b'default')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+# Replica Database Tests
+# A second SQLite file serves as the replica alias. It is only written to
+# directly, so it lags behind default by whatever a test does not copy over.
+# Reads only go to a replica outside transactions, hence a transaction test case.
+@override_settings(QUERY_BUDGET_RAISE=True)
+class ReplicaDatabaseTestCase(APITransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Added once the test runner has set up its databases, so that it leaves this one alone
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        router = get_router()
+        patcher = mock.patch.multiple(router, replicas=['replica'], _cycle=itertools.cycle(['replica']),
+                                      load={'replica': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reader = APIClient()
+
+    def replicate(self, *tasks):
+        Task.objects.using('replica').bulk_create([
+            Task(id=task.id, title=task.title, description=task.description, status=task.status,
+                 task_type=task.task_type)
+            for task in tasks
+        ])
+
+    def test_routing(self):
+        """Test that reads go to the replica, writes to default, and a writer reads its own writes"""
+        replica_only = Task(id=9999, title='Replica only', description='Not on default')
+        self.replicate(replica_only)
+        self.assertEqual(self.reader.get(reverse('task_detail', kwargs={'task_id': 9999})).status_code,
+                         status.HTTP_200_OK)
+
+        response = self.client.post(reverse('create_task'), {'title': 'New', 'description': 'Written'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task_id = response.data['id']
+        self.assertTrue(Task.objects.using('default').filter(id=task_id).exists())
+        self.assertFalse(Task.objects.using('replica').filter(id=task_id).exists())
+
+        url = reverse('task_detail', kwargs={'task_id': task_id})
+        # Not on the replica yet, but the writer is pinned to default
+        self.assertEqual(self.reader.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_cache_read_your_writes(self):
+        """Test that a response read from a lagging replica is not cached for a client pinned after a write"""
+        task = Task.objects.create(title='Replicated', description='On both', status='pending')
+        self.replicate(task)
+        url = reverse('task_detail', kwargs={'task_id': task.id})
+
+        self.client.patch(reverse('update_task', kwargs={'task_id': task.id}), {'status': 'completed'}, format='json')
+        self.assertEqual(self.reader.get(url).data['status'], 'pending')
+        self.assertEqual(self.client.get(url).data['status'], 'completed')
+
+
+# Request Instrumentation Tests
+class MetricsTestCase(BaseAPITestCase):
+    def test_server_timing(self):
+        """Test that responses report their query count and timings in Server-Timing"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('all_tasks'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('render;dur=', timing)
+
+    def test_metrics_endpoint(self):
+        """Test that /metrics exposes request histograms and cache counters"""
+        metrics.reset()
+        self.client.get(reverse('all_tasks'))
+        self.client.get(reverse('task_detail', kwargs={'task_id': self.task1.id}))
+        self.client.get(reverse('task_detail', kwargs={'task_id': self.task1.id}))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('http_requests_total{view="all_tasks",method="GET",status="200"} 1', text)
+        self.assertIn('http_requests_total{view="task_detail",method="GET",status="200"} 2', text)
+        self.assertIn('http_request_queries_bucket{view="task_detail",method="GET",le="+Inf"} 2', text)
+        # The second detail request was a cache hit
+        self.assertIn('http_request_queries_bucket{view="task_detail",method="GET",le="0"} 1', text)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_response_size_bytes_count{view="all_tasks",method="GET"} 1', text)
+        self.assertRegex(text, r'response_cache_hits_total [1-9]')
+
+    def test_histogram(self):
+        """Test that histogram buckets are cumulative"""
+        histogram = metrics.Histogram('test_seconds', 'Test.', (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('view', 'GET'), value)
+        lines = list(histogram.render(metrics.VIEW_LABELS))
+        self.assertIn('test_seconds_bucket{view="view",method="GET",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{view="view",method="GET",le="1"} 3', lines)
+        self.assertIn('test_seconds_bucket{view="view",method="GET",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{view="view",method="GET"} 4', lines)
+        self.assertIn('test_seconds_sum{view="view",method="GET"} 3.65', lines)
+
+    def test_duplicate_queries(self):
+        """Test that only queries repeated with the same parameters count as duplicates"""
+        stats = metrics.RequestStats()
+        stats.add_query('SELECT 1 WHERE id = %s', (1,), False, 0.001)
+        stats.add_query('SELECT 1 WHERE id = %s', (2,), False, 0.001)
+        stats.add_query('SELECT 1 WHERE id = %s', (1,), False, 0.001)
+        stats.add_query('INSERT %s', [(1,), (1,)], True, 0.001)
+        stats.add_query('INSERT %s', [(1,), (1,)], True, 0.001)
+        self.assertEqual(stats.queries, 5)
+        self.assertEqual(stats.duplicates, 1)
+        self.assertIn('desc="5 queries, 1 duplicate"', stats.server_timing(0.01))
+
+    def test_query_budget(self):
+        """Test that requests over their query budget raise, or are logged and counted"""
+        metrics.reset()
+        with override_settings(QUERY_BUDGETS={'all_tasks': 1}):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(reverse('all_tasks'))
+            with override_settings(QUERY_BUDGET_RAISE=False), self.assertLogs('tasks.metrics', 'WARNING'):
+                response = self.client.get(reverse('all_tasks'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            'http_request_query_budget_exceeded_total{view="all_tasks",method="GET"} 2', metrics.render()
+        )
+
+
+# Data Generator and Benchmark Suite Tests
+class BenchmarkSuiteTestCase(BaseAPITestCase):
+    def test_generate_data(self):
+        """Test that generated data is complete and the counters stay correct"""
+        out = StringIO()
+        call_command('generate_data', users=5, tasks=30, assignments=2, distribution='fixed', stdout=out)
+        self.assertIn('Created 5 users, 30 tasks and 60 assignments.', out.getvalue())
+        self.assertEqual(Task.objects.count(), 32)
+        self.assertEqual(User.objects.count(), 7)
+        self.assertEqual(counters.verify(), {})
+        self.assertEqual(self.client.get(reverse('task_stats')).data['total_tasks'], 32)
+
+    def test_generate_data_seed(self):
+        """Test that the same seed generates the same tasks and assignment counts"""
+        runs = []
+        for _ in range(2):
+            generated = datagen.generate(users=10, tasks=20, user_skew=1.5, seed=7)
+            tasks = Task.objects.filter(id__in=generated['tasks']).order_by('id')
+            runs.append([(task.title, task.status, task.assigned_users.count()) for task in tasks])
+        self.assertEqual(runs[0], runs[1])
+        with self.assertRaises(ValueError):
+            datagen.generate(distribution='normal')
+
+    def test_endpoints_cover_urls(self):
+        """Test that the benchmark suite has requests for every API endpoint"""
+        self.assertEqual(set(ENDPOINTS), {pattern.name for pattern in task_urls.urlpatterns})
+
+    def test_benchmark_endpoints(self):
+        """Test that every endpoint runs without errors and results are written as JSON"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'benchmark_endpoints', sizes='20', requests=2, export_requests=1, in_place=True, output=output,
+                stdout=StringIO()
+            )
+            with open(output) as f:
+                results = json.load(f)
+            self.assertEqual(set(results['sizes']['20']), set(BENCHMARKS))
+            for name, result in results['sizes']['20'].items():
+                self.assertEqual(result['errors'], 0, name)
+                self.assertGreaterEqual(result['requests'], 1, name)
+            self.assertEqual(results['sizes']['20']['task_stats']['queries'], 1)
+            # Revalidations only run the validator
+            for name in ('filter_tasks', 'filter_tasks_search', 'user_tasks'):
+                self.assertLess(
+                    results['sizes']['20'][f'{name}_revalidated']['queries'], results['sizes']['20'][name]['queries'], name
+                )
+
+            # Comparing with itself finds no query count regressions
+            out = StringIO()
+            call_command(
+                'benchmark_endpoints', sizes='20', requests=2, export_requests=1, in_place=True,
+                endpoint=['task_stats'], compare=output, threshold=1000, stdout=out
+            )
+            self.assertIn('queries 1 -> 1', out.getvalue())
+            self.assertNotIn('REGRESSION', out.getvalue())
+        # The generated data was rolled back
+        self.assertEqual(Task.objects.count(), 2)
+
+
+# Soft Delete Tests
+class SoftDeleteTestCase(BaseAPITestCase):
+    def test_task_soft_delete(self):
+        """Test that a deleted task leaves the APIs and counters but keeps its rows"""
+        response = self.client.delete(reverse('delete_task', kwargs={'task_id': self.task2.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        task = Task.all_objects.get(id=self.task2.id)
+        self.assertTrue(task.is_deleted)
+        self.assertIsNotNone(task.deleted_at)
+        self.assertEqual(task.assigned_users.count(), 2)
+        self.assertFalse(Task.objects.filter(id=self.task2.id).exists())
+        response = self.client.get(reverse('task_detail', kwargs={'task_id': self.task2.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('user_tasks', kwargs={'user_id': self.user1.id}))
+        self.assertEqual([task['id'] for task in response.data['results']], [self.task1.id])
+        self.assertEqual(self.client.get(reverse('task_stats')).data['total_tasks'], 1)
+        self.assertEqual(counters.verify(), {})
+
+        response = self.client.delete(reverse('delete_task', kwargs={'task_id': self.task2.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_soft_delete(self):
+        """Test that a deleted user leaves the assigned users of their tasks"""
+        url = reverse('task_detail', kwargs={'task_id': self.task2.id})
+        self.assertEqual(len(self.client.get(url).data['assigned_users']), 2)
+        response = self.client.delete(reverse('delete_user', kwargs={'user_id': self.user2.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual([user['id'] for user in self.client.get(url).data['assigned_users']], [self.user1.id])
+        response = self.client.get(reverse('user_detail', kwargs={'user_id': self.user2.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(User.all_objects.get(id=self.user2.id).is_deleted)
+
+        # The email stays taken, so that the user can be restored
+        data = {'name': 'New User', 'email': 'testuser2@gmail.com', 'mobile': '1234567890', 'password': 'password123'}
+        response = self.client.post(reverse('create_user'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+
+    def test_bulk_delete_and_restore_tasks(self):
+        """Test deleting and restoring many tasks at once"""
+        response = self.client.post(
+            reverse('bulk_delete_tasks'), {'ids': [self.task1.id, self.task2.id, 9999]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'deleted': 2, 'ids': [self.task1.id, self.task2.id], 'not_found': [9999]})
+        self.assertEqual(self.client.get(reverse('all_tasks')).data['results'], [])
+        self.assertEqual(self.client.get(reverse('task_stats')).data['total_tasks'], 0)
+
+        response = self.client.post(reverse('bulk_restore_tasks'), {'ids': [self.task2.id]}, format='json')
+        self.assertEqual(response.data, {'restored': 1, 'ids': [self.task2.id], 'not_found': []})
+        task = self.client.get(reverse('task_detail', kwargs={'task_id': self.task2.id})).data
+        self.assertEqual(len(task['assigned_users']), 2)
+        self.assertIsNone(Task.objects.get(id=self.task2.id).deleted_at)
+        self.assertEqual(counters.verify(), {})
+
+        response = self.client.post(reverse('bulk_restore_tasks'), {'ids': [self.task2.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('bulk_delete_tasks'), {'ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_and_restore_users(self):
+        """Test deleting and restoring many users at once"""
+        ids = [self.user1.id, self.user2.id]
+        response = self.client.post(reverse('bulk_delete_users'), {'ids': ids}, format='json')
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(self.client.get(reverse('all_users')).data['results'], [])
+        url = reverse('task_users', kwargs={'task_id': self.task2.id})
+        self.assertEqual(self.client.get(url).data['results'], [])
+
+        response = self.client.post(reverse('bulk_restore_users'), {'ids': ids}, format='json')
+        self.assertEqual(response.data['restored'], 2)
+        self.assertEqual(len(self.client.get(url).data['results']), 2)
+
+    def test_purge_deleted(self):
+        """Test that purge_deleted removes old tombstones only, in batches"""
+        task3 = Task.objects.create(title='Test Task 3', description='Third task')
+        task3.assigned_users.add(self.user2)
+        deletion.delete_tasks([self.task2.id, task3.id, self.task1.id])
+        deletion.delete_users([self.user2.id])
+        old = timezone.now() - timedelta(days=31)
+        Task.all_objects.filter(id__in=[self.task2.id, task3.id]).update(deleted_at=old)
+        User.all_objects.filter(id=self.user2.id).update(deleted_at=old)
+
+        out = StringIO()
+        call_command('purge_deleted', days=30, batch_size=1, stdout=out)
+        self.assertIn('Purged 2 tasks.', out.getvalue())
+        self.assertIn('Purged 1 users.', out.getvalue())
+        self.assertEqual(list(Task.all_objects.values_list('id', flat=True)), [self.task1.id])
+        self.assertFalse(User.all_objects.filter(id=self.user2.id).exists())
+        self.assertFalse(Task.assigned_users.through.objects.exclude(task_id=self.task1.id).exists())
+        self.assertEqual(counters.verify(), {})
+
+
+# Background Job Tests
+# run_worker runs jobs in the test's thread (and transaction) with the default
+# --concurrency 1.
+class JobQueueTestCase(BaseAPITestCase):
+    def run_worker(self):
+        call_command('run_worker', burst=True, stdout=StringIO())
+
+    def register(self, name, handler):
+        jobs.register(name)(handler)
+        self.addCleanup(jobs.JOB_KINDS.pop, name)
+
+    @override_settings(JOB_CHUNK_SIZE=2)
+    def test_background_bulk_create(self):
+        """Test that a background bulk create returns 202 and is done by the worker"""
+        items = [{'title': f'Background {i}', 'description': 'd', 'task_type': 'task'} for i in range(4)]
+        items[2] = {'title': 'Missing description'}
+        response = self.client.post(reverse('bulk_create_tasks') + '?background=true', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertTrue(response['Location'].endswith(reverse('job_detail', kwargs={'job_id': response.data['id']})))
+        self.assertEqual(Task.objects.count(), 2)
+
+        self.run_worker()
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertEqual((response.data['progress_done'], response.data['progress_total']), (4, 4))
+        self.assertEqual(response.data['result']['created'], 3)
+        self.assertEqual([error['index'] for error in response.data['result']['errors']], [2])
+        self.assertEqual(Task.objects.count(), 5)
+        self.assertEqual(counters.verify(), {})
+
+    def test_background_bulk_assign(self):
+        """Test that a background bulk assignment is done by the worker"""
+        data = {'task_ids': [self.task1.id], 'user_ids': [self.user2.id]}
+        response = self.client.post(reverse('bulk_assign_tasks') + '?background=1', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.task1.assigned_users.count(), 1)
+        self.run_worker()
+        self.assertEqual(Job.objects.get(id=response.data['id']).result['assigned'], 1)
+        self.assertEqual(self.task1.assigned_users.count(), 2)
+
+    def test_create_job(self):
+        """Test queueing jobs by kind, and validating their payload"""
+        response = self.client.post(
+            reverse('create_job'), {'kind': 'reassign_tasks', 'payload': {'from_user_id': self.user1.id,
+                                                                           'to_user_id': self.user2.id}},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.run_worker()
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual((job.status, job.result), ('succeeded', {'reassigned': 2}))
+        self.assertFalse(Task.objects.filter(assigned_users=self.user1).exists())
+        self.assertEqual(Task.objects.filter(assigned_users=self.user2).count(), 2)
+
+        response = self.client.post(reverse('create_job'), {'kind': 'unknown'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('kind', response.data)
+        response = self.client.post(
+            reverse('create_job'), {'kind': 'reassign_tasks', 'payload': {'from_user_id': 1, 'to_user_id': 1}},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('payload', response.data)
+        response = self.client.get(reverse('job_detail', kwargs={'job_id': 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(JOB_RETRY_DELAY=0)
+    def test_retries(self):
+        """Test that failed jobs are retried up to max_attempts, unless the error is permanent"""
+        calls = []
+
+        def flaky(job):
+            calls.append(job.attempts)
+            if job.attempts < 2:
+                raise RuntimeError('Try again')
+            return {'ok': True}
+
+        def broken(job):
+            raise RuntimeError('Always broken')
+
+        def permanent(job):
+            raise jobs.PermanentJobError('Bad payload')
+
+        self.register('test_flaky', flaky)
+        self.register('test_broken', broken)
+        self.register('test_permanent', permanent)
+        flaky_job = jobs.enqueue('test_flaky')
+        broken_job = jobs.enqueue('test_broken', max_attempts=2)
+        permanent_job = jobs.enqueue('test_permanent')
+        with self.assertLogs('tasks.jobs', 'ERROR'):
+            self.run_worker()
+
+        flaky_job.refresh_from_db()
+        self.assertEqual((flaky_job.status, flaky_job.attempts, flaky_job.error), ('succeeded', 2, ''))
+        self.assertEqual(calls, [1, 2])
+        broken_job.refresh_from_db()
+        self.assertEqual((broken_job.status, broken_job.attempts), ('failed', 2))
+        self.assertEqual(broken_job.error, 'RuntimeError: Always broken')
+        self.assertIsNotNone(broken_job.finished_at)
+        permanent_job.refresh_from_db()
+        self.assertEqual((permanent_job.status, permanent_job.attempts), ('failed', 1))
+
+    def test_retry_delay(self):
+        """Test that a retried job waits for its run_after"""
+        def broken(job):
+            raise RuntimeError('Always broken')
+
+        self.register('test_broken', broken)
+        job = jobs.enqueue('test_broken')
+        with self.assertLogs('tasks.jobs', 'ERROR'):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(jobs.claim('test-worker'))
+
+    @override_settings(JOB_CHUNK_SIZE=2)
+    def test_resume(self):
+        """Test that a retried job resumes after the chunks it already committed"""
+        items = [{'title': f'Resumed {i}', 'description': 'd', 'task_type': 'task'} for i in range(4)]
+        job = jobs.enqueue('bulk_create_tasks', {'items': items})
+        Job.objects.filter(id=job.id).update(
+            progress_done=2, result={'created': 2, 'ids': [self.task1.id, self.task2.id], 'errors': []}
+        )
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.result['created'], 4)
+        self.assertEqual(Task.objects.count(), 4)
+        self.assertEqual(set(Task.objects.filter(title__startswith='Resumed').values_list('title', flat=True)),
+                         {'Resumed 2', 'Resumed 3'})
+
+    def test_requeue_stale(self):
+        """Test that running jobs of dead workers are requeued, or failed when out of attempts"""
+        old = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT + 1)
+        stale = Job.objects.create(kind='noop', status='running', attempts=1, locked_by='dead', locked_at=old)
+        spent = Job.objects.create(
+            kind='noop', status='running', attempts=3, max_attempts=3, locked_by='dead', locked_at=old
+        )
+        alive = Job.objects.create(kind='noop', status='running', attempts=1, locked_by='alive', locked_at=timezone.now())
+        self.assertEqual(jobs.requeue_stale(), (1, 1))
+        self.assertEqual(
+            dict(Job.objects.values_list('id', 'status')),
+            {stale.id: 'queued', spent.id: 'failed', alive.id: 'running'}
+        )
+
+        # A job requeued while its worker still runs it keeps the new owner's state
+        claimed = jobs.claim('new-owner')
+        self.assertEqual((claimed.id, claimed.attempts), (stale.id, 2))
+        stale.refresh_from_db()
+        stale.locked_by = 'dead'
+        jobs.finish(stale, {'status': 'succeeded'})
+        self.assertEqual(Job.objects.get(id=stale.id).locked_by, 'new-owner')
+
+    @override_settings(JOB_TIMEOUT=1)
+    def test_heartbeats(self):
+        """Test that jobs without chunks report progress, and that unmeasurable ones are not requeued as stale"""
+        jobs.enqueue('noop', {'seconds': 0.25})
+        with mock.patch.object(jobs, 'progress', wraps=jobs.progress) as progress:
+            jobs.execute(jobs.claim('test-worker'))
+        self.assertGreaterEqual(progress.call_count, 2)
+
+        job = jobs.enqueue('rebuild_task_stats')
+        with mock.patch.object(jobs, 'progress', wraps=jobs.progress) as progress:
+            jobs.execute(jobs.claim('test-worker'))
+        self.assertEqual([call.args[1:3] for call in progress.call_args_list], [(1, 2), (2, 2)])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+
+        old = timezone.now() - timedelta(seconds=2)
+        rebuild = Job.objects.create(
+            kind='rebuild_search_index', status='running', attempts=1, locked_by='busy', locked_at=old
+        )
+        self.assertEqual(jobs.requeue_stale(), (0, 0))
+        self.assertEqual(Job.objects.get(id=rebuild.id).status, 'running')
+
+    @override_settings(JOB_CHUNK_SIZE=2)
+    def test_lock_lost(self):
+        """Test that a job requeued mid-run stops its handler and rolls back the chunk in hand"""
+        items = [{'title': f'Requeued {i}', 'description': 'd', 'task_type': 'task'} for i in range(6)]
+        job = jobs.enqueue('bulk_create_tasks', {'items': items})
+        chunk_ranges = jobs.chunk_ranges
+
+        def requeue_after_first_chunk(job, total):
+            for index, (start, end) in enumerate(chunk_ranges(job, total)):
+                if index == 1:
+                    # As requeue_stale() does, between two chunks, for a worker that looks dead
+                    Job.objects.filter(id=job.id).update(status='queued', locked_by='', locked_at=None)
+                yield start, end
+
+        with mock.patch.object(jobs, 'chunk_ranges', requeue_after_first_chunk), \
+                self.assertLogs('tasks.jobs', 'WARNING'):
+            jobs.execute(jobs.claim('test-worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.progress_done), ('queued', '', 2))
+        self.assertEqual(job.result['created'], 2)
+        self.assertEqual(Task.objects.filter(title__startswith='Requeued').count(), 2)
+        self.assertEqual(counters.verify(), {})
+
+        # The next owner resumes after the last committed chunk
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result['created']), ('succeeded', 6))
+        self.assertEqual(Task.objects.filter(title__startswith='Requeued').count(), 6)
+
+
+# Change Feed Tests
+class ChangeFeedTestCase(BaseAPITestCase):
+    def get_changes(self, since, **params):
+        response = self.client.get(reverse('task_changes'), {'since': since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def sync(self, since, page_size=50):
+        """Return {task_id: action} after reading every page from since, and the last token."""
+        actions = {}
+        while True:
+            data = self.get_changes(since, page_size=page_size)
+            for change in data['changes']:
+                actions.pop(change['id'], None)
+                actions[change['id']] = change['action']
+            since = data['next']
+            if not data['has_more']:
+                return actions, since
+
+    def test_changes_since_token(self):
+        """Test that a client gets each changed task once, in the order of its last change"""
+        response = self.client.get(reverse('task_changes'))
+        self.assertEqual(response.data['changes'], [])
+        token = response.data['next']
+        self.assertEqual(self.get_changes(token)['changes'], [])
+
+        self.client.patch(reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': 'completed'}, format='json')
+        response = self.client.post(
+            reverse('create_task'), {'title': 'New', 'description': 'New task', 'task_type': 'bug'}, format='json'
+        )
+        task3_id = response.data['id']
+        self.client.patch(reverse('update_task', kwargs={'task_id': task3_id}), {'status': 'in_progress'}, format='json')
+        self.client.post(
+            reverse('assign_task'), {'task_id': self.task1.id, 'user_ids': [self.user2.id]}, format='json'
+        )
+        self.client.delete(reverse('delete_task', kwargs={'task_id': self.task2.id}))
+
+        data = self.get_changes(token)
+        self.assertEqual(
+            [(change['id'], change['action']) for change in data['changes']],
+            [(task3_id, 'created'), (self.task1.id, 'assigned'), (self.task2.id, 'deleted')]
+        )
+        self.assertEqual(data['changes'][0]['task']['status'], 'in_progress')
+        self.assertEqual(len(data['changes'][1]['task']['assigned_users']), 2)
+        self.assertIsNone(data['changes'][2]['task'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.get_changes(data['next'])['changes'], [])
+
+        # Sparse fieldsets, as in the detail API
+        data = self.get_changes(token, fields='title')
+        self.assertEqual(data['changes'][0]['task'], {'title': 'New'})
+
+    def test_set_based_writes(self):
+        """Test that bulk writes, assignments, soft deletes and restores are logged"""
+        token = changes.head()
+        response = self.client.post(reverse('bulk_create_tasks'), [
+            {'title': f'Bulk {i}', 'description': 'Bulk', 'task_type': 'task'} for i in range(3)
+        ], format='json')
+        created = response.data['ids']
+        self.client.patch(reverse('bulk_update_tasks'), [{'id': self.task1.id, 'status': 'completed'}], format='json')
+        self.client.post(
+            reverse('bulk_assign_tasks'), {'task_ids': [self.task2.id], 'user_ids': [self.user2.id]}, format='json'
+        )
+        self.client.post(reverse('bulk_unassign_tasks'), {'pairs': [{'task_id': self.task2.id, 'user_id': self.user2.id}]},
+                         format='json')
+        deletion.delete_tasks([created[0]])
+        deletion.delete_users([self.user1.id])
+
+        actions, _ = self.sync(token, page_size=2)
+        self.assertEqual(actions, {
+            created[1]: 'created', created[2]: 'created', created[0]: 'deleted',
+            self.task1.id: 'assigned', self.task2.id: 'assigned',
+        })
+        deletion.restore_tasks([created[0]])
+        self.assertEqual(self.get_changes(token)['changes'][-1]['id'], created[0])
+        self.assertEqual(self.get_changes(token)['changes'][-1]['action'], 'created')
+
+    def test_compaction(self):
+        """Test that compaction keeps what clients see, and expiry sends old tokens away"""
+        for status_value in ['in_progress', 'completed', 'pending']:
+            self.client.patch(
+                reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': status_value}, format='json'
+            )
+        self.task2.assigned_users.remove(self.user2)
+        before = self.sync(0)
+        entries = TaskChange.objects.count()
+
+        out = StringIO()
+        call_command('compact_changes', days=0, expire_days=365, stdout=out)
+        self.assertIn('Expired 0 and compacted', out.getvalue())
+        # The creations and the last update of each task
+        self.assertEqual(TaskChange.objects.count(), 4)
+        self.assertLess(TaskChange.objects.count(), entries)
+        self.assertEqual(self.sync(0), before)
+
+        token = changes.head()
+        self.task2.assigned_users.add(self.user2)
+        self.assertEqual(changes.expire(timezone.now() + timedelta(seconds=1)), 4)
+        response = self.client.get(reverse('task_changes'), {'since': 0})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        response = self.client.get(reverse('task_changes'), {'since': token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.get_changes(changes.head())['changes'], [])
+
+    def test_invalid_parameters(self):
+        """Test that bad tokens and page sizes are rejected"""
+        for params in [{'since': 'abc'}, {'since': -1}, {'since': 0, 'page_size': 0}, {'since': 0, 'page_size': 10 ** 6}]:
+            response = self.client.get(reverse('task_changes'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+# Push Event Tests
+class TaskEventsTestCase(BaseAPITestCase):
+    def poll(self, **params):
+        return async_to_sync(self.async_client.get)(reverse('events_poll'), params)
+
+    def stream(self, headers=None, published=(), **params):
+        """Return the response of a stream and its body, with published events sent once it is open."""
+        async def read():
+            response = await self.async_client.get(reverse('events_stream'), params, headers=headers)
+            if not response.streaming:
+                return response, response.content.decode()
+            events.get_hub().publish(published)
+            return response, ''.join([chunk.decode() async for chunk in response.streaming_content])
+        return async_to_sync(read)()
+
+    def change_tasks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': 'completed'},
+                              format='json')
+            self.client.post(reverse('assign_task'), {'task_id': self.task1.id, 'user_ids': [self.user2.id]},
+                             format='json')
+            self.client.delete(reverse('delete_task', kwargs={'task_id': self.task2.id}))
+
+    def test_event_filter(self):
+        """Test that filters match on task ids, assigned users and statuses"""
+        event = {'id': 1, 'event': 'task.updated', 'task_id': 5, 'status': 'pending', 'task_type': 'bug', 'user_ids': [7]}
+        self.assertTrue(events.EventFilter().matches(event))
+        self.assertTrue(events.EventFilter.from_query(QueryDict('task_id=4,5&user_id=7&status=pending')).matches(event))
+        self.assertFalse(events.EventFilter(task_ids=[4]).matches(event))
+        self.assertFalse(events.EventFilter(user_ids=[8]).matches(event))
+        self.assertFalse(events.EventFilter(statuses=['completed']).matches(event))
+        for query in ['task_id=x', 'user_id=1,,y', 'status=done']:
+            with self.assertRaises(ValueError):
+                events.EventFilter.from_query(QueryDict(query))
+
+    def test_local_hub(self):
+        """Test that the local hub delivers committed changes to matching subscribers only"""
+        hub = events.LocalHub()
+        self.addCleanup(changes.changes_recorded.disconnect, hub.changes_recorded, sender=TaskChange)
+
+        async def receive():
+            everything = hub.subscribe(events.EventFilter(), 0)
+            completed = hub.subscribe(events.EventFilter(statuses=['completed']), 0)
+            await sync_to_async(self.change_tasks)()
+            received = await everything.get(1), await completed.get(1)
+            everything.close()
+            completed.close()
+            return received
+
+        everything, completed = async_to_sync(receive)()
+        self.assertEqual(
+            [(event['event'], event['task_id']) for event in everything],
+            [('task.updated', self.task1.id), ('task.assigned', self.task1.id), ('task.deleted', self.task2.id)]
+        )
+        self.assertEqual(everything[1]['user_ids'], [self.user1.id, self.user2.id])
+        self.assertEqual([event['event'] for event in completed], ['task.updated', 'task.assigned'])
+        self.assertFalse(hub.subscribers)
+
+    def test_change_log_hub(self):
+        """Test that the change log hub publishes new entries, and skips expired ones"""
+        hub = events.ChangeLogHub()
+        published = []
+        hub.publish = published.extend
+        hub.last_id = changes.head()
+        self.change_tasks()
+        self.assertEqual(hub.poll(), 3)
+        self.assertEqual([event['event'] for event in published], ['task.updated', 'task.assigned', 'task.deleted'])
+        self.assertEqual(hub.poll(), 0)
+
+        hub.last_id = 0
+        changes.expire(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(hub.poll(), 0)
+        self.assertEqual(hub.last_id, changes.head())
+
+    @override_settings(EVENTS_POLL_INTERVAL=0.01)
+    def test_change_log_hub_retries(self):
+        """Test that the change log hub thread outlives failed polls, and resets when it stops"""
+        hub = events.ChangeLogHub()
+        subscriber = object()
+        hub.subscribers.add(subscriber)
+        polls = []
+
+        def poll():
+            polls.append(len(polls))
+            if len(polls) <= 2:
+                raise RuntimeError('Database is restarting')
+            hub.unsubscribe(subscriber)
+            return 0
+
+        hub.poll = poll
+        hub.last_id = changes.head()
+        hub.thread = thread = threading.Thread(target=hub.run)
+        with self.assertLogs('tasks.events', 'ERROR') as logs:
+            thread.start()
+            thread.join(5)
+        self.assertEqual(polls, [0, 1, 2])
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual((hub.thread, hub.last_id), (None, None))
+
+        # A thread stopped by an unexpected error lets the next subscriber start another
+        hub.subscribers.add(subscriber)
+        hub.poll = mock.Mock(side_effect=SystemExit)
+        hub.thread = thread = threading.Thread(target=hub.run)
+        thread.start()
+        thread.join(5)
+        self.assertEqual((hub.thread, hub.last_id), (None, None))
+
+    def test_long_poll_replay(self):
+        """Test that a long poll returns the matching events after a token at once"""
+        token = changes.head()
+        self.change_tasks()
+        response = self.poll(since=token, status='completed')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        # Events carry the current state of their task
+        self.assertEqual(
+            [(event['event'], event['task_id'], event['user_ids']) for event in data['events']],
+            [
+                ('task.updated', self.task1.id, [self.user1.id, self.user2.id]),
+                ('task.assigned', self.task1.id, [self.user1.id, self.user2.id]),
+            ]
+        )
+        self.assertEqual(data['next'], changes.head())
+        self.assertFalse(data['has_more'])
+
+        data = json.loads(self.poll(since=data['next'], timeout=0.05).content)
+        self.assertEqual(data['events'], [])
+        self.assertEqual(data['next'], changes.head())
+
+    def test_long_poll_waits(self):
+        """Test that a long poll with nothing to replay returns live events as they come"""
+        token = changes.head()
+        event = {
+            'id': token + 1, 'event': 'task.updated', 'task_id': self.task1.id, 'status': 'completed',
+            'task_type': 'feature', 'user_ids': [self.user1.id],
+        }
+
+        async def wait():
+            hub = events.get_hub()
+            poll = asyncio.ensure_future(self.async_client.get(reverse('events_poll'), {'since': token, 'timeout': 5}))
+            while not hub.subscribers:
+                await asyncio.sleep(0.01)
+            hub.publish([{**event, 'id': token}, event])
+            return await poll
+
+        data = json.loads(async_to_sync(wait)().content)
+        self.assertEqual(data, {'events': [event], 'next': token + 1, 'has_more': False})
+
+    def test_stream(self):
+        """Test that a stream replays from Last-Event-ID as server-sent events"""
+        token = changes.head()
+        self.change_tasks()
+        response, body = self.stream(headers={'Last-Event-ID': str(token)}, status='completed', timeout=0)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        chunks = body.split('\n\n')
+        self.assertTrue(chunks[0].startswith('retry: '))
+        lines = chunks[1].split('\n')
+        self.assertEqual(lines[:2], [f'id: {token + 1}', 'event: task.updated'])
+        self.assertEqual(json.loads(lines[2][len('data: '):])['status'], 'completed')
+        self.assertEqual([chunk.split('\n')[1] for chunk in chunks[1:-1]], ['event: task.updated', 'event: task.assigned'])
+
+        # Live events and heartbeats
+        event = {**json.loads(lines[2][len('data: '):]), 'id': 10 ** 6}
+        with override_settings(EVENTS_HEARTBEAT=0.1):
+            _, body = self.stream(published=[event], since=changes.head(), timeout=0.5)
+        self.assertIn(f'id: {10 ** 6}\nevent: task.updated', body)
+        self.assertIn(': keepalive', body)
+
+    def test_expired_and_invalid(self):
+        """Test that expired tokens are sent to resync, and bad parameters are rejected"""
+        self.change_tasks()
+        changes.expire(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.poll(since=0).status_code, status.HTTP_410_GONE)
+        _, body = self.stream(since=0, timeout=0)
+        self.assertIn(f'id: {changes.head()}\nevent: reset', body)
+
+        for params in [{'since': 'x'}, {'since': -1}, {'status': 'done'}, {'timeout': -1}, {'timeout': 10 ** 6}]:
+            self.assertEqual(self.poll(**params).status_code, status.HTTP_400_BAD_REQUEST, params)
+        self.assertEqual(self.stream(timeout='x')[0].status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(EVENTS_LONG_POLL_TIMEOUT=1, EVENTS_STREAM_TIMEOUT=1):
+            self.assertEqual(self.poll(timeout=2).status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.stream(timeout=2)[0].status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# User Task Summary Tests
+class UserSummaryTestCase(BaseAPITestCase):
+    def summary(self, user):
+        response = self.client.get(reverse('user_detail', kwargs={'user_id': user.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['task_summary']
+
+    def test_summary_follows_writes(self):
+        """Test that summaries stay in step with assignments, status changes and deletes"""
+        summary = self.summary(self.user1)
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual(summary['by_status'], {'pending': 1, 'completed': 0, 'in_progress': 1})
+        self.assertEqual(summary['by_type'], {'bug': 1, 'feature': 1, 'improvement': 0, 'task': 0})
+        self.assertIsNotNone(summary['last_assigned_at'])
+        self.assertIsNone(summary['last_completed_at'])
+
+        task3 = Task.objects.create(title='Task 3', description='Third', task_type='improvement')
+        self.client.patch(reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': 'completed'}, format='json')
+        self.client.patch(reverse('bulk_update_tasks'), [{'id': self.task2.id, 'status': 'completed'}], format='json')
+        self.client.post(reverse('bulk_assign_tasks'), {'task_ids': [task3.id], 'user_ids': [self.user1.id, self.user2.id]},
+                         format='json')
+        summary = self.summary(self.user1)
+        self.assertEqual(summary['by_status'], {'pending': 1, 'completed': 2, 'in_progress': 0})
+        self.assertIsNotNone(summary['last_completed_at'])
+        self.assertEqual(self.summary(self.user2)['total'], 2)
+        self.assertEqual(summaries.verify(), {})
+
+        self.client.post(reverse('bulk_unassign_tasks'), {'pairs': [{'task_id': task3.id, 'user_id': self.user2.id}]},
+                         format='json')
+        self.user1.assigned_tasks.remove(self.task2, task3)
+        self.user1.assigned_tasks.remove(self.task2)
+        self.assertEqual(self.summary(self.user1)['total'], 1)
+        deletion.delete_tasks([self.task1.id])
+        self.assertEqual(self.summary(self.user1)['total'], 0)
+        deletion.restore_tasks([self.task1.id])
+        self.assertEqual(self.summary(self.user1)['by_status']['completed'], 1)
+        self.task2.assigned_users.clear()
+        self.assertEqual(self.summary(self.user2)['total'], 0)
+        Task.objects.get(id=self.task1.id).delete()
+        self.assertEqual(self.summary(self.user1)['total'], 0)
+        self.assertEqual(summaries.verify(), {})
+
+    def test_batch_summaries(self):
+        """Test that the summaries of many users come from one query"""
+        url = reverse('user_summary')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'user_ids': f'{self.user2.id},9999,{self.user1.id},{self.user2.id}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual([row['user_id'] for row in response.data['results']], [self.user2.id, self.user1.id])
+        self.assertEqual(response.data['results'][1]['total'], 2)
+        self.assertEqual(response.data['missing_user_ids'], [9999])
+
+        # Users who never had a task
+        user3 = User.objects.create_user(name='User 3', email='user3@example.com', mobile='1')
+        response = self.client.post(url, {'user_ids': [user3.id]}, format='json')
+        self.assertEqual(response.data['results'][0]['total'], 0)
+        self.assertIsNone(response.data['results'][0]['last_assigned_at'])
+
+        for response in [
+            self.client.get(url), self.client.get(url, {'user_ids': 'x'}),
+            self.client.post(url, {'user_ids': list(range(settings.BULK_MAX_ITEMS + 1))}, format='json'),
+        ]:
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_validators(self):
+        """Test that a status change of an assigned task refreshes the cached user detail and its ETag"""
+        url = reverse('user_detail', kwargs={'user_id': self.user2.id})
+        etag = self.client.get(url)['ETag']
+        self.client.patch(reverse('update_task', kwargs={'task_id': self.task2.id}), {'status': 'completed'}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['task_summary']['by_status']['completed'], 1)
+
+        # Sparse fieldsets leave the summary out, or read only it
+        self.assertNotIn('task_summary', self.client.get(url, {'fields': 'id,name'}).data)
+        self.assertEqual(self.client.get(url, {'fields': 'task_summary'}).data['task_summary']['total'], 1)
+
+    def test_rebuild(self):
+        """Test that drifted summaries are reported and rebuilt, keeping assignment times"""
+        assigned_at = UserTaskSummary.objects.get(user=self.user1).last_assigned_at
+        UserTaskSummary.objects.filter(user=self.user1).update(status_pending=5)
+        UserTaskSummary.objects.filter(user=self.user2).delete()
+        self.assertEqual(set(summaries.verify()), {self.user1.id, self.user2.id})
+        with self.assertRaises(CommandError):
+            call_command('rebuild_task_stats', verify=True, stdout=StringIO(), stderr=StringIO())
+
+        call_command('rebuild_task_stats', stdout=StringIO())
+        self.assertEqual(summaries.verify(), {})
+        self.assertEqual(UserTaskSummary.objects.get(user=self.user1).last_assigned_at, assigned_at)
+        self.assertEqual(self.summary(self.user2)['by_type']['bug'], 1)
+
+
+# Task Rollup Tests
+class TaskRollupTestCase(BaseAPITestCase):
+    def stored(self):
+        return sorted(TaskRollup.objects.values_list('day', 'task_type', 'created', 'completed', 'completion_times'))
+
+    def computed(self, start, end):
+        return sorted(
+            (row.day, row.task_type, row.created, row.completed, row.completion_times)
+            for row in rollups.compute(start, end)
+        )
+
+    def test_sketch(self):
+        """Test that sketch quantiles stay within the relative accuracy and that sketches merge exactly"""
+        values = list(range(1, 10001))
+        low, high, whole = DDSketch(), DDSketch(), DDSketch()
+        for value in values:
+            (low if value <= 5000 else high).add(value)
+            whole.add(value)
+        for q in (0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertLessEqual(abs(whole.quantile(q) - exact), exact * 0.01)
+        self.assertEqual(low.merge(high).to_dict(), whole.to_dict())
+        self.assertEqual(DDSketch.from_dict(whole.to_dict()).quantile(0.5), whole.quantile(0.5))
+
+        whole.add(10000, -1)
+        whole.add(0.2)
+        self.assertEqual(whole.count, 10000)
+        self.assertEqual(whole.quantile(0), 0.0)
+        self.assertIsNone(DDSketch().quantile(0.5))
+
+    def test_migration_sketch(self):
+        """Test that the backfill migration stores the same sketches as DDSketch"""
+        migration = importlib.import_module('tasks.migrations.0011_task_rollup')
+        copied, sketch = migration.Sketch(), DDSketch()
+        for value in (0, 0.5, 1, 59, 3600, 86400 * 30, 86400 * 365 * 10):
+            copied.add(value)
+            sketch.add(value)
+        self.assertEqual(copied.to_dict(), sketch.to_dict())
+
+    def test_rollups_follow_writes(self):
+        """Test that creations and completions keep the rollups equal to a recomputation"""
+        today = rollups.day_of(timezone.now())
+        self.client.patch(reverse('update_task', kwargs={'task_id': self.task1.id}), {'status': 'completed'}, format='json')
+        self.client.patch(reverse('bulk_update_tasks'), [{'id': self.task2.id, 'status': 'completed'}], format='json')
+        self.client.post(reverse('bulk_create_tasks'), [
+            {'title': 'Bulk 1', 'description': 'One', 'task_type': 'bug'},
+            {'title': 'Bulk 2', 'description': 'Two', 'task_type': 'task'},
+        ], format='json')
+        self.assertEqual(self.stored(), self.computed(today, today))
+
+        response = self.client.get(reverse('task_timeseries'), {'start': today.isoformat(), 'end': today.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        day, = response.data['series']
+        self.assertEqual((day['start'], day['created'], day['completed']), (today.isoformat(), 4, 2))
+        self.assertEqual(set(day['completion_seconds']), {'p50', 'p90'})
+        self.assertEqual(day['by_type']['task']['created'], 1)
+        self.assertIsNone(day['by_type']['task']['completion_seconds'])
+
+        # The default range is the last 30 days
+        response = self.client.get(reverse('task_timeseries'), {'percentiles': '99', 'task_type': 'feature'})
+        self.assertEqual(len(response.data['series']), 30)
+        self.assertEqual(response.data['end'], today.isoformat())
+        self.assertEqual(set(response.data['series'][-1]['completion_seconds']), {'p99'})
+        self.assertEqual(set(response.data['series'][-1]['by_type']), {'feature'})
+
+    def test_recompletion(self):
+        """Test that completing a task again moves it to the day of its last completion"""
+        now = timezone.now()
+        Task.objects.filter(id=self.task1.id).update(
+            status='completed', created_at=now - timedelta(days=10), completed_at=now - timedelta(days=3)
+        )
+        start, today = rollups.day_of(now - timedelta(days=10)), rollups.day_of(now)
+        rollups.rebuild(start, today)
+        self.assertEqual(TaskRollup.objects.get(day=rollups.day_of(now - timedelta(days=3))).completed, 1)
+
+        url = reverse('update_task', kwargs={'task_id': self.task1.id})
+        self.client.patch(url, {'status': 'pending'}, format='json')
+        self.client.patch(url, {'status': 'completed'}, format='json')
+        self.assertEqual(TaskRollup.objects.get(day=rollups.day_of(now - timedelta(days=3))).completed, 0)
+        self.assertEqual(TaskRollup.objects.get(day=today, task_type='feature').completed, 1)
+        self.assertEqual(
+            [row for row in self.stored() if row[2] or row[3]],
+            [row for row in self.computed(start, today) if row[2] or row[3]],
+        )
+
+    def test_task_type_change(self):
+        """Test that changing the task type of a completed task moves its creation and completion to the new type"""
+        now = timezone.now()
+        Task.objects.filter(id=self.task1.id).update(
+            status='completed', created_at=now - timedelta(days=10), completed_at=now - timedelta(days=3)
+        )
+        start, today = rollups.day_of(now - timedelta(days=10)), rollups.day_of(now)
+        rollups.rebuild(start, today)
+
+        request = APIRequestFactory().put('/', {'task_type': 'bug'}, format='json')
+        response = TaskUpdateDetailsView.as_view()(request, task_id=self.task1.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        completed = TaskRollup.objects.get(day=rollups.day_of(now - timedelta(days=3)), task_type='bug')
+        self.assertEqual((completed.completed, DDSketch.from_dict(completed.completion_times).count), (1, 1))
+        previous = TaskRollup.objects.get(day=completed.day, task_type='feature')
+        self.assertEqual((previous.completed, DDSketch.from_dict(previous.completion_times).count), (0, 0))
+        self.assertEqual(TaskRollup.objects.get(day=start, task_type='bug').created, 1)
+        self.assertEqual(TaskRollup.objects.get(day=start, task_type='feature').created, 0)
+        self.assertEqual(
+            [row for row in self.stored() if row[2] or row[3]],
+            [row for row in self.computed(start, today) if row[2] or row[3]],
+        )
+
+    def test_buckets(self):
+        """Test that weeks and months add up their days, labelled with their first day"""
+        now = timezone.now()
+        for days in (0, 1, 40):
+            task = Task.objects.create(title=f'Old {days}', description='Old', task_type='bug')
+            Task.objects.filter(id=task.id).update(created_at=now - timedelta(days=days + 100))
+        start, end = rollups.day_of(now - timedelta(days=140)), rollups.day_of(now - timedelta(days=100))
+        rollups.rebuild(start, end)
+
+        series = rollups.timeseries(start, end, 'month')
+        self.assertEqual(series[0]['start'], start.replace(day=1).isoformat())
+        self.assertEqual(sum(bucket['created'] for bucket in series), 3)
+        weeks = rollups.timeseries(start, end, 'week')
+        self.assertTrue(all(date.fromisoformat(bucket['start']).weekday() == 0 for bucket in weeks))
+        self.assertEqual(sum(bucket['by_type']['bug']['created'] for bucket in weeks), 3)
+
+    def test_timeseries_validation(self):
+        """Test that invalid ranges, buckets, task types and percentiles are rejected"""
+        url = reverse('task_timeseries')
+        for params in [
+            {'start': 'yesterday'}, {'start': '2024-02-01', 'end': '2024-01-01'},
+            {'start': '2015-01-01', 'end': '2024-01-01'}, {'bucket': 'year'}, {'task_type': 'epic'},
+            {'percentiles': '50,x'}, {'percentiles': '101'},
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn('message', response.data)
+
+    def test_rollup_command(self):
+        """Test that rollup_task_stats repairs drifted days and validates its options"""
+        TaskRollup.objects.all().delete()
+        out = StringIO()
+        call_command('rollup_task_stats', days=1, stdout=out)
+        self.assertIn('2 row(s)', out.getvalue())
+        today = rollups.day_of(timezone.now())
+        self.assertEqual(self.stored(), self.computed(today, today))
+        call_command('rollup_task_stats', all=True, stdout=StringIO())
+        self.assertEqual(self.stored(), self.computed(today, today))
+        for options in [{'days': 0}, {'since': 'x'}, {'since': '2099-01-01'}]:
+            with self.assertRaises(CommandError):
+                call_command('rollup_task_stats', stdout=StringIO(), **options)
+
+
+# Task Import Tests
+class ImportTasksTestCase(BaseAPITestCase):
+    def import_file(self, name, content, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with (gzip.open(path, 'wt') if name.endswith('.gz') else open(path, 'w')) as file:
+            file.write(content)
+        out, err = StringIO(), StringIO()
+        call_command('import_tasks', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """Test that valid rows are imported with their assignees and invalid rows are reported"""
+        rows = [
+            {'title': 'Imported 1', 'description': 'One', 'task_type': 'bug', 'assignees': [self.user1.email]},
+            {'title': 'Imported 2', 'description': 'Two', 'status': 'completed',
+             'assignees': f'{self.user1.email}, {self.user2.email}'},
+            {'title': 'Bad type', 'description': 'Three', 'task_type': 'epic'},
+            {'title': '', 'description': 'Four'},
+            {'title': 'Unknown user', 'description': 'Five', 'assignees': ['nobody@example.com']},
+            {'title': 'Bad status', 'description': 'Six', 'status': 'done'},
+        ]
+        content = '\n'.join([json.dumps(row) for row in rows] + ['{not json', '[1, 2]']) + '\n'
+        out, err = self.import_file('tasks.jsonl', content)
+        self.assertIn('Imported 2 of 8 rows with 3 assignments', out)
+        self.assertIn('rejected 6', out)
+        self.assertEqual([line.split(':')[0] for line in err.splitlines()], [f'Row {row}' for row in range(3, 9)])
+
+        task1, task2 = Task.objects.filter(title__startswith='Imported').order_by('id')
+        self.assertEqual((task1.task_type, task1.status), ('bug', 'pending'))
+        self.assertEqual(task2.status, 'completed')
+        self.assertIsNotNone(task2.completed_at)
+        self.assertEqual(set(task2.assigned_users.values_list('id', flat=True)), {self.user1.id, self.user2.id})
+        self.assertEqual(counters.verify(), {})
+        self.assertEqual(summaries.verify(), {})
+        self.assertEqual(TaskChange.objects.filter(task_id__in=[task1.id, task2.id], action='created').count(), 2)
+        today = rollups.day_of(timezone.now())
+        self.assertEqual(
+            sorted(TaskRollup.objects.values_list('day', 'task_type', 'created', 'completed', 'completion_times')),
+            sorted((row.day, row.task_type, row.created, row.completed, row.completion_times)
+                   for row in rollups.compute(today, today)),
+        )
+
+    def test_import_csv_workers(self):
+        """Test that gzipped CSV files import in chunks, parsed by worker processes"""
+        lines = ['title,description,task_type,status,assignees']
+        lines += [f'CSV {i},"Line one\nline two",feature,in_progress,{self.user2.email}' for i in range(7)]
+        lines += ['CSV bad,,task,pending,']
+        with tempfile.TemporaryDirectory() as directory:
+            rejects = os.path.join(directory, 'rejects.jsonl')
+            out, _ = self.import_file('tasks.csv.gz', '\n'.join(lines) + '\n', batch_size=3, workers=2, rejects=rejects)
+            with open(rejects) as file:
+                errors = [json.loads(line) for line in file]
+        self.assertIn('Imported 7 of 8 rows with 7 assignments', out)
+        self.assertEqual(errors, [{'row': 8, 'errors': {'description': ['This field may not be blank.']}}])
+        tasks = list(Task.objects.filter(title__startswith='CSV').order_by('id'))
+        self.assertEqual([task.title for task in tasks], [f'CSV {i}' for i in range(7)])
+        self.assertEqual(tasks[0].description, 'Line one\nline two')
+        self.assertEqual(self.user2.assigned_tasks.count(), 8)
+        self.assertEqual(summaries.verify(), {})
+
+    def test_import_errors(self):
+        """Test that unknown formats, files without a header and invalid options fail the command"""
+        for name, content, options in [
+            ('tasks.txt', '', {}), ('tasks.csv', 'name,description\nA,B\n', {}),
+            ('tasks.jsonl', '', {'batch_size': 0}), ('tasks.jsonl', '', {'workers': 0}),
+        ]:
+            with self.assertRaises(CommandError):
+                self.import_file(name, content, **options)
+
+
+# Table Dump Tests
+class DumpTestCase(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def read(self, name):
+        path = os.path.join(self.directory, name)
+        with (gzip.open(path, 'rt') if name.endswith('.gz') else open(path)) as file:
+            if '.csv' in name:
+                return list(csv.DictReader(file))
+            return [json.loads(line) for line in file]
+
+    def test_dump_formats(self):
+        """Test that every table is dumped with the API's representation, soft deleted rows included"""
+        deletion.delete_tasks([self.task2.id])
+        out = StringIO()
+        call_command('export_tasks', self.directory, stdout=out)
+        self.assertIn('Dumped 7 rows', out.getvalue())
+        self.assertEqual(sorted(os.listdir(self.directory)), ['assignments.ndjson', 'tasks.ndjson', 'users.ndjson'])
+
+        tasks = self.read('tasks.ndjson')
+        self.assertEqual([task['id'] for task in tasks], [self.task1.id, self.task2.id])
+        expected = TaskDetailSerializer(self.task1).data
+        for name in ('title', 'status', 'created_at', 'completed_at'):
+            self.assertEqual(tasks[0][name], expected[name])
+        self.assertEqual((tasks[0]['is_deleted'], tasks[1]['is_deleted']), (False, True))
+        users = self.read('users.ndjson')
+        self.assertEqual(users[0]['email'], self.user1.email)
+        self.assertNotIn('password', users[0])
+        self.assertEqual(len(self.read('assignments.ndjson')), 3)
+
+        call_command('export_tasks', self.directory, format='csv', gzip=True, table=['tasks'], stdout=StringIO())
+        rows = self.read('tasks.csv.gz')
+        self.assertEqual([row['id'] for row in rows], [str(self.task1.id), str(self.task2.id)])
+        self.assertEqual(rows[0]['created_at'], expected['created_at'])
+        self.assertEqual(rows[0]['completed_at'], '')
+
+    def test_resume(self):
+        """Test that an interrupted dump resumes after its last checkpoint, dropping what was written past it"""
+        for i in range(5):
+            Task.objects.create(title=f'Task {i}', description='More', task_type='bug')
+        call_command('export_tasks', self.directory, gzip=True, stdout=StringIO())
+        complete = self.read('tasks.ndjson.gz')
+
+        def interrupt(table, state):
+            if state['rows'] == 4:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            dumps.dump(self.directory, dumps.new_checkpoint(['tasks'], 'ndjson', True), 2, interrupt)
+        # A chunk written after the checkpoint, cut short
+        with open(os.path.join(self.directory, 'tasks.ndjson.gz'), 'ab') as file:
+            file.write(gzip.compress(b'{"id": 999}\n')[:10])
+        self.assertEqual(dumps.load_checkpoint(self.directory)['tables']['tasks']['rows'], 4)
+
+        with self.assertRaises(CommandError):
+            call_command('export_tasks', self.directory, gzip=True, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('export_tasks', self.directory, resume=True, stdout=StringIO())
+        out = StringIO()
+        call_command('export_tasks', self.directory, gzip=True, resume=True, chunk_size=2, stdout=out)
+        self.assertIn('Dumped 3 rows', out.getvalue())
+        self.assertEqual(self.read('tasks.ndjson.gz'), complete)
+        self.assertIsNone(dumps.load_checkpoint(self.directory))
+
+    def test_resume_truncated(self):
+        """Test that a dump whose file is shorter than its checkpoint is not resumed"""
+        def interrupt(table, state):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            dumps.dump(self.directory, dumps.new_checkpoint(['tasks'], 'ndjson', False), 1, interrupt)
+        path = os.path.join(self.directory, 'tasks.ndjson')
+        size = dumps.load_checkpoint(self.directory)['tables']['tasks']['size']
+        self.assertEqual(os.path.getsize(path), size)
+        os.truncate(path, size - 1)
+        with self.assertRaisesMessage(CommandError, 'shorter than its checkpoint'):
+            call_command('export_tasks', self.directory, resume=True, stdout=StringIO())
+        self.assertEqual(os.path.getsize(path), size - 1)
+
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # Task URLs
@@ -10,14 +10,43 @@ urlpatterns = [
     path('tasks/users/<int:task_id>/', views.TaskUsersView.as_view(), name='task_users'),
     path('tasks/filter/', views.TaskFilterView.as_view(), name='filter_tasks'),
     path('tasks/stats/', views.TaskStatsView.as_view(), name='task_stats'),
+    path('tasks/stats/timeseries/', views.TaskTimeseriesView.as_view(), name='task_timeseries'),
+    path('tasks/changes/', views.TaskChangesView.as_view(), name='task_changes'),
     path('tasks/create/', views.TaskCreateView.as_view(), name='create_task'),
     path('tasks/update/<int:task_id>/', views.TaskUpdateView.as_view(), name='update_task'),
     path('tasks/delete/<int:task_id>/', views.TaskDeleteView.as_view(), name='delete_task'),
+    path('tasks/export/', views.TaskExportView.as_view(), name='export_tasks'),
+    path('tasks/bulk/create/', views.TaskBulkCreateView.as_view(), name='bulk_create_tasks'),
+    path('tasks/bulk/update/', views.TaskBulkUpdateView.as_view(), name='bulk_update_tasks'),
+    path('tasks/bulk/assign/', views.BulkAssignView.as_view(), name='bulk_assign_tasks'),
+    path('tasks/bulk/unassign/', views.BulkUnassignView.as_view(), name='bulk_unassign_tasks'),
+    path('tasks/bulk/delete/', views.TaskBulkDeleteView.as_view(), name='bulk_delete_tasks'),
+    path('tasks/bulk/restore/', views.TaskBulkRestoreView.as_view(), name='bulk_restore_tasks'),
     # User URLs
     path('users/get/all/', views.UserListView.as_view(), name='all_users'),
     path('users/get/<int:user_id>/', views.UserDetailView.as_view(), name='user_detail'),
     path('users/tasks/<int:user_id>/', views.UserTasksView.as_view(), name='user_tasks'),
+    path('users/summary/', views.UserSummaryView.as_view(), name='user_summary'),
+    path('users/assign/', views.UserAssignView.as_view(), name='assign_user'),
     path('users/create/', views.UserCreateView.as_view(), name='create_user'),
     path('users/update/<int:user_id>/', views.UserUpdateView.as_view(), name='update_user'),
-    path('users/delete/<int:user_id>/', views.UserDeleteView.as_view(), name='delete_user')
+    path('users/delete/<int:user_id>/', views.UserDeleteView.as_view(), name='delete_user'),
+    path('users/export/', views.UserExportView.as_view(), name='export_users'),
+    path('users/bulk/delete/', views.UserBulkDeleteView.as_view(), name='bulk_delete_users'),
+    path('users/bulk/restore/', views.UserBulkRestoreView.as_view(), name='bulk_restore_users'),
+    # Job URLs
+    path('jobs/create/', views.JobCreateView.as_view(), name='create_job'),
+    path('jobs/get/<int:job_id>/', views.JobDetailView.as_view(), name='job_detail'),
+    # Cache URLs
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache_stats'),
+    # Async read URLs, for ASGI servers
+    path('async/tasks/get/all/', async_views.AsyncTaskListView.as_view(), name='async_all_tasks'),
+    path('async/tasks/get/<int:task_id>/', async_views.AsyncTaskDetailView.as_view(), name='async_task_detail'),
+    path('async/tasks/filter/', async_views.AsyncTaskFilterView.as_view(), name='async_filter_tasks'),
+    path('async/tasks/stats/', async_views.AsyncTaskStatsView.as_view(), name='async_task_stats'),
+    path('async/users/get/all/', async_views.AsyncUserListView.as_view(), name='async_all_users'),
+    path('async/users/get/<int:user_id>/', async_views.AsyncUserDetailView.as_view(), name='async_user_detail'),
+    # Task event URLs, for ASGI servers
+    path('events/poll/', async_views.AsyncTaskEventsPollView.as_view(), name='events_poll'),
+    path('events/stream/', async_views.AsyncTaskEventsStreamView.as_view(), name='events_stream'),
 ]
@@ -1,10 +1,58 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import User, Task
-from .serializers import TaskCreateSerializer, TaskAssignSerializer, TaskDetailSerializer, UserSerializer
+from rest_framework.exceptions import ValidationError
+from . import assignments, bulk, cache, changes, conditional, counters, deletion, jobs, metrics, rollups, summaries
+from .exports import CONTENT_TYPES, export_response
+from .fast_serializers import get_values_serializer
+from .models import Job, User, Task
+from .pagination import KeysetPagination
+from .search import filter_tasks
+from .serializers import (
+    BulkAssignSerializer, BulkIdsSerializer, JobCreateSerializer, JobSerializer, TaskAssignSerializer, TaskCreateSerializer,
+    TaskDetailSerializer, UserAssignSerializer, UserDetailSerializer, UserIdsSerializer, UserSerializer
+)
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Count
+
+
+# Returns the ?fields= and ?expand= options for serializer_class, see SparseFieldsMixin.
+def get_field_options(request, serializer_class):
+    try:
+        return serializer_class.get_field_options(request.query_params), None
+    except ValidationError as exc:
+        return None, Response({'message': exc.detail[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Base class for list APIs, which return one keyset page per request.
+class PaginatedAPIView(APIView):
+    pagination_class = KeysetPagination
+
+    def paginated_response(self, queryset, serializer_class):
+        options, error_response = get_field_options(self.request, serializer_class)
+        if error_response:
+            return error_response
+        paginator = self.pagination_class()
+        ordering = [name for name, _ in paginator.get_ordering(queryset)]
+
+        # values() based fast path, see tasks/fast_serializers.py
+        values_serializer = get_values_serializer(serializer_class, **options)
+        if values_serializer is not None:
+            page = paginator.paginate_queryset(values_serializer.values(queryset, ordering), self.request, view=self)
+            with metrics.timer('serialize'):
+                data = values_serializer.serialize(page)
+            return paginator.get_paginated_response(data)
+
+        queryset = serializer_class.setup_eager_loading(queryset, extra=ordering, **options)
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        with metrics.timer('serialize'):
+            data = serializer_class(page, many=True, **options).data
+        return paginator.get_paginated_response(data)
 
 
 # API to create a new user.
@@ -22,11 +70,69 @@ class TaskCreateView(APIView):
     def post(self, request):
         serializer = TaskCreateSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Whether the request asked for a background job (?background=true), see tasks/jobs.py.
+def in_background(request):
+    return request.query_params.get('background', '').lower() in ('1', 'true', 'yes')
+
+
+# Returns 202 for a queued job, with the URL of its progress in Location.
+def job_accepted(request, job):
+    url = request.build_absolute_uri(reverse('job_detail', kwargs={'job_id': job.id}))
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
+
+# Base class for bulk write APIs, which take a JSON array of items. With
+# ?background=true up to JOB_MAX_ITEMS items are accepted and processed by a
+# job of kind job_kind.
+class BulkAPIView(APIView):
+    job_kind = None
+
+    def get_items(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return None, Response({'message': 'Expected a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        max_items = settings.JOB_MAX_ITEMS if in_background(request) else settings.BULK_MAX_ITEMS
+        if len(request.data) > max_items:
+            message = f'At most {max_items} items per request'
+            return None, Response({'message': message}, status=status.HTTP_400_BAD_REQUEST)
+        return request.data, None
+
+
+# API to create many tasks at once.
+class TaskBulkCreateView(BulkAPIView):
+    job_kind = 'bulk_create_tasks'
+
+    def post(self, request):
+        items, error_response = self.get_items(request)
+        if error_response:
+            return error_response
+        if in_background(request):
+            return job_accepted(request, jobs.enqueue(self.job_kind, {'items': items}))
+        tasks, errors = bulk.create_tasks(items)
+        data = {'created': len(tasks), 'ids': [task.id for task in tasks], 'errors': errors}
+        return Response(data, status=status.HTTP_201_CREATED if tasks else status.HTTP_400_BAD_REQUEST)
+
+
+# API to update the status of many tasks at once.
+class TaskBulkUpdateView(BulkAPIView):
+    job_kind = 'bulk_update_tasks'
+
+    def patch(self, request):
+        items, error_response = self.get_items(request)
+        if error_response:
+            return error_response
+        if in_background(request):
+            return job_accepted(request, jobs.enqueue(self.job_kind, {'items': items}))
+        task_ids, errors = bulk.update_statuses(items)
+        data = {'updated': len(task_ids), 'ids': task_ids, 'errors': errors}
+        return Response(data, status=status.HTTP_200_OK if task_ids else status.HTTP_400_BAD_REQUEST)
+
+
 # API to assign a task to one or more users.
 class TaskAssignView(APIView):
     def post(self, request):
@@ -39,20 +145,21 @@ class TaskAssignView(APIView):
             except Task.DoesNotExist:
                 return Response({'message': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            users = User.objects.filter(id__in=user_ids)
-            if not users.exists():
+            # Assign Users to Task
+            summary = assignments.assign(assignments.expand_pairs([task_id], user_ids))
+            if summary['assigned'] + summary['already_assigned'] == 0:
                 return Response({'message': 'No users found'}, status=status.HTTP_404_NOT_FOUND)
 
-            # Assign Users to Task
-            task.assigned_users.add(*users)
-            task.save()
+            task = TaskDetailSerializer.setup_eager_loading(Task.objects).get(id=task_id)
             serializer = TaskDetailSerializer(task)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 # API to get tasks assigned to a user.
-class UserTasksView(APIView):
+class UserTasksView(PaginatedAPIView):
+    @cache.cached_response('user', 'user_id', item_kind='task')
+    @conditional.conditional(conditional.user_tasks)
     def get(self, request, user_id):
         try:
             user = User.objects.get(id=user_id)
@@ -60,12 +167,13 @@ class UserTasksView(APIView):
             return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
         tasks = user.assigned_tasks.all()  # Reverse relation from ManyToManyField
-        serializer = TaskDetailSerializer(tasks, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(tasks, TaskDetailSerializer)
 
 
 # API to get users assigned to a task.
-class TaskUsersView(APIView):
+class TaskUsersView(PaginatedAPIView):
+    @cache.cached_response('task', 'task_id', item_kind='user')
+    @conditional.conditional(conditional.task_detail)
     def get(self, request, task_id):
         try:
             task = Task.objects.get(id=task_id)
@@ -73,53 +181,88 @@ class TaskUsersView(APIView):
             return Response({'message': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
         users = task.assigned_users.all()  # Reverse relation from ManyToManyField
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(users, UserSerializer)
 
 
 # API to get all tasks.
-class TaskListView(APIView):
+class TaskListView(PaginatedAPIView):
+    @conditional.conditional(conditional.task_list)
     def get(self, request):
         tasks = Task.objects.all()
-        serializer = TaskDetailSerializer(tasks, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(tasks, TaskDetailSerializer)
 
 
 # API to get all users.
-class UserListView(APIView):
+class UserListView(PaginatedAPIView):
+    @conditional.conditional(conditional.user_list)
     def get(self, request):
         users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(users, UserSerializer)
 
 
 # API to get a task by ID.
 class TaskDetailView(APIView):
+    @cache.cached_response('task', 'task_id')
+    @conditional.conditional(conditional.task_detail)
     def get(self, request, task_id):
+        options, error_response = get_field_options(request, TaskDetailSerializer)
+        if error_response:
+            return error_response
         try:
-            task = Task.objects.get(id=task_id)
+            task = TaskDetailSerializer.setup_eager_loading(Task.objects, **options).get(id=task_id)
         except Task.DoesNotExist:
             return Response({'message': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = TaskDetailSerializer(task)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        with metrics.timer('serialize'):
+            data = TaskDetailSerializer(task, **options).data
+        return Response(data, status=status.HTTP_200_OK)
 
 
 # API to get a user by ID.
 class UserDetailView(APIView):
+    @cache.cached_response('user', 'user_id')
+    @conditional.conditional(conditional.user_detail)
     def get(self, request, user_id):
+        options, error_response = get_field_options(request, UserDetailSerializer)
+        if error_response:
+            return error_response
         try:
-            user = User.objects.get(id=user_id)
+            user = UserDetailSerializer.setup_eager_loading(User.objects, **options).get(id=user_id)
         except User.DoesNotExist:
             return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = UserSerializer(user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        with metrics.timer('serialize'):
+            data = UserDetailSerializer(user, **options).data
+        return Response(data, status=status.HTTP_200_OK)
+
+
+# API to get the task summaries of many users at once. POST takes the same
+# user_ids as a JSON array, for lists too long for a URL.
+class UserSummaryView(APIView):
+    def get(self, request):
+        user_ids = [value for value in request.query_params.get('user_ids', '').split(',') if value]
+        return self.summary_response({'user_ids': user_ids})
+
+    def post(self, request):
+        return self.summary_response(request.data)
+
+    def summary_response(self, data):
+        serializer = UserIdsSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = list(dict.fromkeys(serializer.validated_data['user_ids']))
+        # One query, by primary key, however many users
+        found = summaries.get_many(user_ids)
+        return Response({
+            'results': [{'user_id': user_id, **found[user_id]} for user_id in user_ids if user_id in found],
+            'missing_user_ids': [user_id for user_id in user_ids if user_id not in found],
+        }, status=status.HTTP_200_OK)
 
 
 # Update task status by ID.
 class TaskUpdateView(APIView):
+    @transaction.atomic
     def patch(self, request, task_id):
         try:
-            task = Task.objects.get(id=task_id)
+            task = Task.objects.select_for_update().get(id=task_id)
         except Task.DoesNotExist:
             return Response({'message': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -127,13 +270,11 @@ class TaskUpdateView(APIView):
             if request.data['status'] not in dict(Task.TASK_STATUS).keys():
                 return Response({'message': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
 
-            task.status = request.data['status']
-            if request.data['status'] == 'completed':
-                task.completed_at = timezone.now()
-                task.status = 'completed'
-            else:
-                task.status = request.data['status']
+            completed_at = task.completed_at
+            task.set_status(request.data['status'])
             task.save()
+            if task.status == 'completed':
+                rollups.record_completed([(task, completed_at)])
             serializer = TaskDetailSerializer(task)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response({'message': 'Status not provided'}, status=status.HTTP_400_BAD_REQUEST)
@@ -156,76 +297,190 @@ class UserUpdateView(APIView):
 
 # Update task details by ID.
 class TaskUpdateDetailsView(APIView):
+    @transaction.atomic
     def put(self, request, task_id):
         try:
-            task = Task.objects.get(id=task_id)
+            task = Task.objects.select_for_update().get(id=task_id)
         except Task.DoesNotExist:
             return Response({'message': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
+        task_type = task.task_type
         serializer = TaskCreateSerializer(task, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            rollups.record_type_changed([(task, task_type)])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-# Delete task by ID.
+# Delete task by ID (a soft delete, see tasks/deletion.py).
 class TaskDeleteView(APIView):
     def delete(self, request, task_id):
-        try:
-            task = Task.objects.get(id=task_id)
-        except Task.DoesNotExist:
+        if not deletion.delete_tasks([task_id]):
             return Response({'message': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
-        task.delete()
         return Response({'message': 'Task deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
 
-# Delete user by ID.
+# Delete user by ID (a soft delete, see tasks/deletion.py).
 class UserDeleteView(APIView):
     def delete(self, request, user_id):
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        if not deletion.delete_users([user_id]):
             return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-        user.delete()
         return Response({'message': 'User deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
 
-# Filter tasks.
-class TaskFilterView(APIView):
-    def get(self, request):
-        tasks = Task.objects.all()
+# Base class for bulk soft delete and restore APIs, which take {"ids": [...]}.
+class BulkDeletionView(APIView):
+    action = None
+    result_key = None
+
+    def post(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        if serializer.is_valid():
+            ids = serializer.validated_data['ids']
+            changed = self.action(ids)
+            data = {self.result_key: len(changed), 'ids': changed, 'not_found': sorted(set(ids) - set(changed))}
+            return Response(data, status=status.HTTP_200_OK if changed else status.HTTP_404_NOT_FOUND)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# API to delete many tasks at once.
+class TaskBulkDeleteView(BulkDeletionView):
+    action = staticmethod(deletion.delete_tasks)
+    result_key = 'deleted'
+
 
-        status_filter = request.query_params.get('status')
-        if status_filter:
-            tasks = tasks.filter(status=status_filter)
+# API to restore deleted tasks.
+class TaskBulkRestoreView(BulkDeletionView):
+    action = staticmethod(deletion.restore_tasks)
+    result_key = 'restored'
 
-        task_type_filter = request.query_params.get('task_type')
-        if task_type_filter:
-            tasks = tasks.filter(task_type=task_type_filter)
 
-        search_term = request.query_params.get('search')
-        if search_term:
-            tasks = tasks.filter(title__icontains=search_term) | tasks.filter(description__icontains=search_term)
+# API to delete many users at once.
+class UserBulkDeleteView(BulkDeletionView):
+    action = staticmethod(deletion.delete_users)
+    result_key = 'deleted'
 
-        serializer = TaskDetailSerializer(tasks, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+# API to restore deleted users.
+class UserBulkRestoreView(BulkDeletionView):
+    action = staticmethod(deletion.restore_users)
+    result_key = 'restored'
+
+
+# Filter tasks.
+class TaskFilterView(PaginatedAPIView):
+    @conditional.conditional(conditional.task_filter)
+    def get(self, request):
+        # status, task_type and ranked full-text search, see tasks/search.py
+        tasks = filter_tasks(Task.objects.all(), request.query_params)
+        return self.paginated_response(tasks, TaskDetailSerializer)
+
+
+# API to get the tasks changed since a token, for incremental sync (see tasks/changes.py).
+class TaskChangesView(APIView):
+    def get(self, request):
+        options, error_response = get_field_options(request, TaskDetailSerializer)
+        if error_response:
+            return error_response
+        if 'since' not in request.query_params:
+            # The token to sync from after fetching all tasks
+            return Response({'changes': [], 'next': changes.head(), 'has_more': False}, status=status.HTTP_200_OK)
+        try:
+            since = int(request.query_params['since'])
+            page_size = int(request.query_params.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE']))
+        except ValueError:
+            return Response({'message': 'Invalid since token or page size'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or not 1 <= page_size <= settings.API_MAX_PAGE_SIZE:
+            return Response({'message': 'Invalid since token or page size'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            changed, next_token, has_more = changes.read(since, page_size)
+        except changes.TokenExpired:
+            message = 'Changes since this token were compacted away, fetch all tasks again'
+            return Response({'message': message}, status=status.HTTP_410_GONE)
+
+        data = self.serialize_tasks([task_id for task_id, action in changed if action != 'deleted'], options)
+        results = [
+            {'id': task_id, 'action': action, 'task': data[task_id]} if task_id in data
+            else {'id': task_id, 'action': 'deleted', 'task': None}
+            for task_id, action in changed
+        ]
+        return Response({'changes': results, 'next': next_token, 'has_more': has_more}, status=status.HTTP_200_OK)
+
+    def serialize_tasks(self, task_ids, options):
+        """Return ``{id: serialized task}`` of the live tasks among task_ids."""
+        if not task_ids:
+            return {}
+        tasks = Task.objects.filter(id__in=task_ids)
+        # values() based fast path, see tasks/fast_serializers.py
+        values_serializer = get_values_serializer(TaskDetailSerializer, **options)
+        if values_serializer is not None:
+            rows = list(values_serializer.values(tasks, ['id']))
+            with metrics.timer('serialize'):
+                return {row['id']: data for row, data in zip(rows, values_serializer.serialize(rows))}
+        tasks = list(TaskDetailSerializer.setup_eager_loading(tasks, **options))
+        with metrics.timer('serialize'):
+            return {task.id: data for task, data in zip(tasks, TaskDetailSerializer(tasks, many=True, **options).data)}
 
 
 # Get task statistics.
 class TaskStatsView(APIView):
     def get(self, request):
-        stats = {
-            'total_tasks': Task.objects.count(),
-            'by_status': dict(Task.objects.values('status').annotate(count=Count('id')).values_list('status', 'count')),
-            'by_type': dict(Task.objects.values('task_type').annotate(count=Count('id')).values_list('task_type', 'count'))
-        }
+        # Maintained incrementally by the write APIs, see tasks/counters.py
+        stats = counters.get_stats()
         return Response(stats, status=status.HTTP_200_OK)
 
+
+# API to get task throughput over time: tasks created and completed per day,
+# week or month, and percentiles of their completion times, read from the
+# daily rollups (see tasks/rollups.py).
+class TaskTimeseriesView(APIView):
+    def get(self, request):
+        params, error_response = self.get_params(request.query_params)
+        if error_response:
+            return error_response
+        series = rollups.timeseries(**params)
+        return Response({
+            'bucket': params['bucket'],
+            'start': params['start'].isoformat(),
+            'end': params['end'].isoformat(),
+            'series': series,
+        }, status=status.HTTP_200_OK)
+
+    def get_params(self, query_params):
+        end = rollups.day_of(timezone.now())
+        try:
+            end = date.fromisoformat(query_params['end']) if 'end' in query_params else end
+            start = date.fromisoformat(query_params['start']) if 'start' in query_params else end - timedelta(days=29)
+            percentiles = [float(value) for value in query_params.get('percentiles', '').split(',') if value]
+        except ValueError:
+            return None, Response(
+                {'message': 'start and end must be dates (YYYY-MM-DD), percentiles numbers'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if start > end or (end - start).days >= rollups.MAX_DAYS:
+            return None, Response(
+                {'message': f'start must be before end, at most {rollups.MAX_DAYS} days apart'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not all(0 <= percentile <= 100 for percentile in percentiles):
+            return None, Response({'message': 'Percentiles must be between 0 and 100'}, status=status.HTTP_400_BAD_REQUEST)
+        bucket = query_params.get('bucket', 'day')
+        if bucket not in rollups.BUCKETS:
+            message = f'bucket must be one of {", ".join(rollups.BUCKETS)}'
+            return None, Response({'message': message}, status=status.HTTP_400_BAD_REQUEST)
+        task_type = query_params.get('task_type')
+        if task_type is not None and task_type not in dict(Task.TASK_TYPE):
+            return None, Response({'message': 'Invalid task type'}, status=status.HTTP_400_BAD_REQUEST)
+        return {
+            'start': start, 'end': end, 'bucket': bucket, 'task_type': task_type,
+            'percentiles': percentiles or rollups.PERCENTILES,
+        }, None
+
 # API to assign a user to one or more tasks.
 class UserAssignView(APIView):
     def post(self, request):
-        serializer = TaskAssignSerializer(data=request.data)
+        serializer = UserAssignSerializer(data=request.data)
         if serializer.is_valid():
             user_id = serializer.validated_data['user_id']
             task_ids = serializer.validated_data['task_ids']
@@ -234,13 +489,102 @@ class UserAssignView(APIView):
             except User.DoesNotExist:
                 return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            tasks = Task.objects.filter(id__in=task_ids)
-            if not tasks.exists():
+            # Assign Tasks to User
+            summary = assignments.assign(assignments.expand_pairs(task_ids, [user_id]))
+            if summary['assigned'] + summary['already_assigned'] == 0:
                 return Response({'message': 'No tasks found'}, status=status.HTTP_404_NOT_FOUND)
 
-            # Assign Tasks to User
-            user.assigned_tasks.add(*tasks)
-            user.save()
             serializer = UserSerializer(user)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Base class for export APIs, which stream a whole table as JSON or NDJSON.
+class ExportAPIView(APIView):
+    queryset = None
+    serializer_class = None
+    filename = None
+
+    def get(self, request):
+        output = request.query_params.get('output', 'json')
+        if output not in CONTENT_TYPES:
+            return Response({'message': 'Invalid output format'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', settings.EXPORT_CHUNK_SIZE))
+            chunk_size = min(chunk_size, settings.EXPORT_CHUNK_SIZE)
+        except ValueError:
+            return Response({'message': 'Invalid chunk size'}, status=status.HTTP_400_BAD_REQUEST)
+        if chunk_size < 1:
+            return Response({'message': 'Invalid chunk size'}, status=status.HTTP_400_BAD_REQUEST)
+        options, error_response = get_field_options(request, self.serializer_class)
+        if error_response:
+            return error_response
+        return export_response(self.queryset.all(), self.serializer_class, output, chunk_size, self.filename, options)
+
+
+# API to export all tasks.
+class TaskExportView(ExportAPIView):
+    queryset = Task.objects.all()
+    serializer_class = TaskDetailSerializer
+    filename = 'tasks'
+
+
+# API to export all users.
+class UserExportView(ExportAPIView):
+    queryset = User.objects.all()
+    serializer_class = UserSerializer
+    filename = 'users'
+
+
+# API to assign many users to many tasks at once (as a background job with ?background=true).
+class BulkAssignView(APIView):
+    action = staticmethod(assignments.assign)
+    job_kind = 'bulk_assign_tasks'
+
+    def post(self, request):
+        background = in_background(request)
+        max_items = settings.JOB_MAX_ITEMS if background else settings.BULK_MAX_ITEMS
+        serializer = BulkAssignSerializer(data=request.data, context={'max_items': max_items})
+        if serializer.is_valid():
+            if background:
+                return job_accepted(request, jobs.enqueue(self.job_kind, serializer.validated_data))
+            summary = self.action(assignments.expand_pairs(**serializer.validated_data))
+            return Response(summary, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# API to unassign many users from many tasks at once.
+class BulkUnassignView(BulkAssignView):
+    action = staticmethod(assignments.unassign)
+    job_kind = 'bulk_unassign_tasks'
+
+
+# API to queue a background job of any registered kind, see tasks/jobs.py.
+class JobCreateView(APIView):
+    def post(self, request):
+        serializer = JobCreateSerializer(data=request.data, context={'kinds': jobs.JOB_KINDS})
+        if serializer.is_valid():
+            return job_accepted(request, jobs.enqueue(**serializer.validated_data))
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# API to get the status, progress and result of a background job.
+class JobDetailView(APIView):
+    def get(self, request, job_id):
+        try:
+            job = Job.objects.get(id=job_id)
+        except Job.DoesNotExist:
+            return Response({'message': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(JobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+# API to get response cache statistics of this process.
+class CacheStatsView(APIView):
+    def get(self, request):
+        return Response(cache.get_stats(), status=status.HTTP_200_OK)
+
+
+# Prometheus metrics of this process, see tasks/metrics.py.
+class MetricsView(APIView):
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')